@@ -18,6 +18,87 @@ class Settings(BaseSettings):
     # 模型服务配置
     model_base_url: str = "http://localhost:8000"
     model_path: str = "models"  # 模型文件路径
+    feature_dtype: str = "float64"  # 特征矩阵精度：float64 或 float32
+    model_warmup_rows: int = 64  # 启动预热的合成批大小，0表示不预热
+    inference_backend: str = "compiled"  # compiled：CatBoost编译为NumPy对称树评估器；catboost：predict_proba
+    explainer_backend: str = "oblivious"  # oblivious：对称树精确TreeSHAP（加载时预计算叶子贡献）；shap：shap.TreeExplainer
+    compiled_backend_tolerance: float = 1e-6  # 加载时编译后端（概率和SHAP值）与CatBoost的最大允许差
+    
+    # 模型注册表配置（多版本，热切换）
+    model_registry_source: str = "local"  # local：model_path 与 training_output_dir；minio：另含 MinIO models/ 前缀
+    model_default_version: str = ""  # 启动时的默认版本，留空使用 model_path 中的模型
+    model_registry_max_loaded: int = 3  # 同时驻留内存的版本数（默认版本不会被释放）
+    model_cache_dir: str = "models/cache"  # 从MinIO下载的版本的本地缓存目录
+    
+    # 推理执行器配置
+    inference_executor: str = "thread"  # thread 或 process
+    inference_workers: int = 2
+    inference_queue_size: int = 32  # 超出 workers + queue_size 的请求返回429
+    curve_executor: str = "thread"  # 光变曲线使用独立的执行器，融合预测时与表格模型并行
+    curve_workers: int = 2
+    curve_queue_size: int = 16
+    
+    # 微批处理配置（合并并发的小请求）
+    microbatch_enabled: bool = True
+    microbatch_window_ms: float = 2.0
+    microbatch_max_rows: int = 256
+    
+    # 预测结果缓存配置（进程内LRU + Redis）
+    prediction_cache_enabled: bool = True
+    prediction_cache_ttl_seconds: int = 3600
+    prediction_cache_local_entries: int = 10000
+    prediction_cache_redis_entries: int = 200000
+    
+    # 重新设定阈值配置（缓存阈值调整前的原始概率，按prediction_id重算）
+    rethreshold_ttl_seconds: int = 1800
+    rethreshold_max_entries: int = 1000
+    
+    # 流式预测配置（NDJSON输出）
+    stream_chunk_rows: int = 512
+    stream_max_line_bytes: int = 65536
+    stream_max_json_bytes: int = 16 * 2 ** 20  # JSON格式需完整读取后校验，超过上限返回413（大批量请使用NDJSON）
+    
+    # 光变曲线检测配置（去趋势 + 匹配滤波）
+    curve_grid_points: int = 1024
+    curve_fold_bins: int = 512
+    curve_detrend_window_days: float = 1.0
+    curve_sigma_clip: float = 5.0
+    curve_snr_threshold: float = 7.1
+    curve_snr_scale: float = 1.5
+    curve_max_batch: int = 256
+    curve_batch_mb: int = 256  # 补齐后的检测工作数组上限，按长度分批处理，超过时拆成多批
+    curve_store_source: str = "local"  # local：仅本地目录；minio：上传到MinIO并按需下载到本地缓存
+    curve_cache_dir: str = "data/curves"
+    max_curve_upload_bytes: int = 256 * 2 ** 20  # 单条曲线上传（二进制或JSON）的请求体上限，超过返回413
+    
+    # BLS周期搜索配置（workers=0 表示使用全部CPU）
+    bls_min_period: float = 0.5
+    bls_max_period: float = 100.0
+    bls_bin_days: float = 0.01
+    bls_oversample: float = 3.0
+    bls_max_periods: int = 50000
+    bls_chunk_mb: int = 64
+    bls_workers: int = 0  # 检测引擎共享的BLS进程池大小，所有请求共用，不随并发增加
+    
+    # 训练任务配置
+    training_workers: int = 1  # 训练进程数
+    training_output_dir: str = "models/versions"  # 训练产物目录（每个任务一个子目录）
+    job_store_backend: str = "auto"  # auto、redis 或 file
+    job_store_dir: str = "jobs"  # file 模式下的任务记录目录
+    job_ttl_seconds: int = 7 * 24 * 3600
+    
+    # 批量评分配置
+    scoring_chunk_rows: int = 5000  # 从MinIO读取并提交推理的块大小
+    scoring_max_inflight: int = 2  # 同时在推理执行器中的块数
+    
+    # 模型评估配置（每个版本在留出测试集上评估一次，报告和图表缓存到本地/MinIO/Redis）
+    evaluation_dataset_path: str = "../Model/data/Kepler Objects of Interest (KOI).csv"  # 按notebook划分测试集的KOI数据
+    evaluation_store_source: str = "local"  # local：仅本地目录；minio：另存到 minio_bucket_models 的 evaluations/ 前缀
+    evaluation_cache_dir: str = "models/evaluations"
+    evaluation_cache_ttl_seconds: int = 7 * 24 * 3600
+    evaluation_threshold_steps: int = 101  # 阈值网格点数（0到1等间隔）
+    evaluation_calibration_bins: int = 10
+    evaluation_precompute: bool = True  # 模型加载或切换后在后台预先评估
     
     # MinIO 配置
     minio_endpoint: str = "localhost:9000"
@@ -26,8 +107,17 @@ class Settings(BaseSettings):
     minio_bucket_datasets: str = "datasets"
     minio_bucket_reports: str = "reports"
     minio_bucket_feedback: str = "feedback"
+    minio_bucket_curves: str = "curves"
+    minio_bucket_models: str = "artifacts"  # 模型版本存放在该存储桶的 models/<版本>/ 前缀下
     minio_secure: bool = False
     
+    # 数据集元数据索引（SQLite）
+    dataset_catalog_path: str = "data/catalog.db"
+    dataset_index_stride: int = 1000  # 行偏移索引步长（每N行记录一个字节偏移）
+    dataset_page_max_rows: int = 5000  # 分页读取数据集内容时单页最大行数
+    dataset_columnar: bool = True  # 上传时同时生成Parquet列式副本
+    dataset_row_group_rows: int = 65536  # Parquet行组大小
+    
     # Redis 配置
     redis_url: str = "redis://localhost:6379"
     redis_db: int = 0
@@ -43,6 +133,7 @@ class Settings(BaseSettings):
     # 文件上传配置
     max_file_size: int = 100 * 1024 * 1024  # 100MB
     allowed_file_types: List[str] = [".csv", ".json", ".txt"]
+    upload_part_size: int = 10 * 1024 * 1024  # 流式分片上传的分片大小（MinIO要求不小于5MB）
     
     class Config:
         env_file = ".env"
@@ -1,18 +1,39 @@
-from typing import List
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
 from datetime import datetime
+import asyncio
+import json
 import logging
+import re
+from pathlib import Path
 
 from config import settings
 from models import (
-    TabularPredictRequest, CurvePredictRequest, FusePredictRequest,
-    TrainingRequest, FeedbackRequest, PredictionResponse,
-    Dataset, TrainingResponse, TrainingJob, ModelMetrics,
-    FeedbackResponse, HealthResponse, ErrorResponse
+    TabularRow, TabularPredictRequest, CurvePredictRequest, CurveBatchPredictRequest,
+    FusePredictRequest, FuseBatchPredictRequest,
+    TrainingRequest, FeedbackRequest, PredictionResponse, ExoplanetPrediction,
+    Dataset, TrainingResponse, TrainingJob, ModelMetrics, ThresholdCurve,
+    FeedbackResponse, HealthResponse, ErrorResponse, ScoringRequest, ScoringResponse,
+    RethresholdRequest, CurveUploadRequest, StoredCurve
 )
 from model_adapter import get_model_adapter
+from ml.evaluation import EvaluationUnavailableError
+from ml.executor import InferenceQueueFullError
+from ml.model_registry import ModelVersionNotFoundError
+from ml.scoring import ScoringInputError
+from ml.training import TrainingConfigError
+from ml.columnar import (
+    ARROW_STREAM_TYPE, ARROW_TYPES, ID_COLUMNS, ColumnarPayloadError,
+    parse_arrow_columns, parse_json_columns, validate_columns,
+    encode_arrow_result, encode_json_result
+)
+from services.curve_store import (
+    CURVE_CONTENT_TYPE, CurveNotFoundError, get_curve_store, validate_curve_id
+)
 from services.minio_service import minio_service
 
 # 配置日志
@@ -35,6 +56,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Inference-Ms", "Content-Range", "Accept-Ranges"],
 )
 
 # 获取模型适配器
@@ -45,7 +67,8 @@ model_adapter = get_model_adapter()
 async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
-        content=ErrorResponse(detail=str(exc.detail)).model_dump()
+        content=ErrorResponse(detail=str(exc.detail)).model_dump(),
+        headers=getattr(exc, "headers", None)
     )
 
 
@@ -70,6 +93,14 @@ async def health_check():
     )
 
 
+@app.get("/api/ready")
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查接口 - 模型加载完成前返回503（/health 不依赖模型，启动后立即可用）"""
+    state = model_adapter.readiness()
+    return JSONResponse(status_code=200 if state["status"] == "ready" else 503, content=state)
+
+
 # 数据集管理
 @app.post("/api/datasets/upload", response_model=Dataset)
 async def upload_dataset(file: UploadFile = File(...)):
@@ -78,37 +109,104 @@ async def upload_dataset(file: UploadFile = File(...)):
         dataset = await minio_service.upload_dataset(file)
         logger.info(f"Dataset uploaded: {dataset.dataset_id}")
         return dataset
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/datasets", response_model=List[Dataset])
-async def list_datasets():
-    """获取数据集列表"""
-    # TODO: 实现数据集列表功能
-    return []
+async def list_datasets(response: Response, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    """分页获取数据集列表（按上传时间倒序），总数通过 X-Total-Count 响应头返回"""
+    datasets, total = await asyncio.to_thread(minio_service.list_datasets, offset, limit)
+    response.headers["X-Total-Count"] = str(total)
+    return datasets
+
+
+@app.get("/api/datasets/{dataset_id}", response_model=Dataset)
+async def get_dataset(dataset_id: str):
+    """获取数据集元数据（大小、列、行数、校验和）"""
+    dataset = await asyncio.to_thread(minio_service.get_dataset, dataset_id)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset not found: {dataset_id}")
+    return dataset
+
+
+def _parse_byte_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """解析单段 Range 头（bytes=a-b、bytes=a-、bytes=-n），不支持多段"""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", value)
+    if match is None or match.group(1) == match.group(2) == "":
+        raise HTTPException(status_code=416, detail=f"不支持的Range: {value}")
+    start, end = (int(group) if group else None for group in match.groups())
+    return start, end
 
 
 @app.get("/api/datasets/{dataset_id}/content")
-async def get_dataset_content(dataset_id: str):
-    """获取数据集内容"""
+async def get_dataset_content(
+    dataset_id: str,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0, description="起始数据行（不含表头）"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.dataset_page_max_rows, description="返回行数"),
+    columns: Optional[str] = Query(None, description="逗号分隔的列名投影")
+):
+    """获取数据集内容
+    
+    带 Range 头时返回原始字节（206）；带 offset/limit/columns 时按行分页返回
+    {columns, rows, total_rows}；都不带时保持旧的 {content} 整文件响应。
+    """
     try:
+        range_header = request.headers.get("range")
+        if range_header:
+            start, end = _parse_byte_range(range_header)
+            data, start, end, size = await asyncio.to_thread(
+                minio_service.get_dataset_range, dataset_id, start, end
+            )
+            return Response(
+                content=data,
+                status_code=206,
+                media_type="text/csv",
+                headers={"Content-Range": f"bytes {start}-{end}/{size}", "Accept-Ranges": "bytes"}
+            )
+        if offset is not None or limit is not None or columns is not None:
+            projection = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+            return await asyncio.to_thread(
+                minio_service.get_dataset_page, dataset_id, offset or 0, limit or 100, projection
+            )
         # 从MinIO获取文件内容
         content = await minio_service.get_dataset_content(dataset_id)
         return {"content": content}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get dataset content: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/datasets/{dataset_id}/score", response_model=ScoringResponse)
+async def score_dataset(dataset_id: str, request: Optional[ScoringRequest] = None):
+    """对已上传的数据集提交批量评分任务，进度通过 /api/jobs/{job_id}/status 查询"""
+    try:
+        result = await model_adapter.start_scoring(dataset_id, request or ScoringRequest())
+        return ScoringResponse(**result)
+    except ScoringInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        logger.error(f"Scoring start failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/features")
 async def get_features():
     """获取模型特征列表"""
     try:
-        # 从模型服务获取特征列表
+        # 从共享的模型服务获取特征列表（启动时已加载）
         from ml.model_service import get_model_service
-        model_service = get_model_service()
+        model_service = await asyncio.to_thread(get_model_service)
         features = model_service.get_feature_names()
         return {"features": features}
     except Exception as e:
@@ -128,84 +226,265 @@ async def get_features():
         return {"features": default_features}
 
 
-@app.post("/api/train")
-async def start_training(request: TrainingRequest):
-    """开始模型训练"""
+# 预测接口
+@app.post("/api/predict/tabular", response_model=PredictionResponse)
+async def predict_tabular(request: TabularPredictRequest):
+    """表格数据预测"""
     try:
-        # 模拟训练过程，返回训练任务ID
-        import uuid
-        job_id = str(uuid.uuid4())
-        
-        logger.info(f"Training started for dataset {request.dataset_id} with config {request.config}")
-        
-        # 这里应该启动实际的训练过程
-        # 目前返回模拟的训练任务ID
-        return {"job_id": job_id}
+        result = await model_adapter.predict_tabular(request)
+        logger.info(f"Tabular prediction completed for {len(request.rows)} rows")
+        return PredictionResponse(**result)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceQueueFullError as e:
+        logger.warning(f"Tabular prediction rejected: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Training failed: {str(e)}")
+        logger.error(f"Tabular prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/jobs/{job_id}/status")
-async def get_job_status(job_id: str):
-    """获取训练任务状态"""
+@app.post("/api/predict/rethreshold", response_model=PredictionResponse)
+async def rethreshold_prediction(request: RethresholdRequest):
+    """按新阈值重算已缓存的原始概率（阈值滑块），不重新运行模型"""
     try:
-        # 模拟训练状态
-        import random
-        
-        # 模拟训练进度 (0-100)
-        progress = min(100, random.randint(60, 95))
-        
-        if progress >= 100:
-            status = "completed"
-            metrics = {
-                "accuracy": round(random.uniform(0.85, 0.95), 3),
-                "precision": round(random.uniform(0.80, 0.90), 3),
-                "recall": round(random.uniform(0.75, 0.85), 3),
-                "f1_score": round(random.uniform(0.78, 0.88), 3)
-            }
-        else:
-            status = "running"
-            metrics = None
-        
-        return {
-            "job_id": job_id,
-            "status": status,
-            "progress": progress,
-            "metrics": metrics,
-            "started_at": "2024-01-01T10:00:00Z",
-            "completed_at": "2024-01-01T10:45:00Z" if status == "completed" else None
-        }
+        return PredictionResponse(**await model_adapter.rethreshold(request))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持重新设定阈值")
     except Exception as e:
-        logger.error(f"Failed to get job status: {str(e)}")
+        logger.error(f"Rethreshold failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# 预测接口
-@app.post("/api/predict/tabular", response_model=PredictionResponse)
-async def predict_tabular(request: TabularPredictRequest):
-    """表格数据预测"""
+# 列式批量预测的必需列/可选列（与TabularRow的字段定义一致）
+BULK_REQUIRED_COLUMNS = [name for name, field in TabularRow.model_fields.items() if field.is_required()]
+BULK_OPTIONAL_COLUMNS = [name for name, field in TabularRow.model_fields.items() if not field.is_required()]
+
+
+def _parse_bulk_body(body: bytes, content_type: str):
+    """解析并逐列校验列式请求体"""
+    threshold = None
+    if content_type in ARROW_TYPES:
+        columns = parse_arrow_columns(body, content_type)
+    else:
+        columns, threshold = parse_json_columns(body)
+    arrays, object_ids, n_rows = validate_columns(columns, BULK_REQUIRED_COLUMNS, BULK_OPTIONAL_COLUMNS)
+    return arrays, object_ids, n_rows, threshold
+
+
+@app.post("/api/predict/tabular/bulk")
+async def predict_tabular_bulk(request: Request, threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+                               model_version: Optional[str] = Query(None, description="模型版本")):
+    """列式批量预测 - 接受列式JSON或Arrow IPC，按相同格式返回列式结果"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    is_arrow = content_type in ARROW_TYPES
     try:
-        result = await model_adapter.predict_tabular(request)
-        logger.info(f"Tabular prediction completed for {len(request.rows)} rows")
-        return PredictionResponse(**result)
+        body = await request.body()
+        columns, object_ids, n_rows, body_threshold = await asyncio.to_thread(
+            _parse_bulk_body, body, content_type
+        )
+        if threshold is None:
+            threshold = body_threshold if body_threshold is not None else 0.5
+        if not 0.0 <= float(threshold) <= 1.0:
+            raise ColumnarPayloadError("threshold 必须在 [0, 1] 范围内")
+
+        result = await model_adapter.predict_tabular_bulk(columns, float(threshold), object_ids, model_version)
+        encode = encode_arrow_result if is_arrow else encode_json_result
+        content = await asyncio.to_thread(encode, result)
+        logger.info(f"Bulk tabular prediction completed for {n_rows} rows ({'arrow' if is_arrow else 'json'})")
+        return Response(
+            content=content,
+            media_type=ARROW_STREAM_TYPE if is_arrow else "application/json",
+            headers={"X-Inference-Ms": f"{result['timing']['total_ms']:.1f}"}
+        )
+    except ColumnarPayloadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceQueueFullError as e:
+        logger.warning(f"Bulk tabular prediction rejected: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Tabular prediction failed: {str(e)}")
+        logger.error(f"Bulk tabular prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+NDJSON_TYPE = "application/x-ndjson"
+
+
+class StreamPayloadError(ValueError):
+    """流式请求体中的某一行无效"""
+
+    def __init__(self, message: str, line: int):
+        super().__init__(message)
+        self.line = line
+
+
+def _parse_stream_line(line: bytes, line_no: int):
+    """解析并校验NDJSON中的一行，保留目标ID列"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+        row = TabularRow.model_validate(obj).model_dump()
+    except ValueError as e:
+        raise StreamPayloadError(f"第{line_no}行无效: {e}", line_no)
+    for name in ID_COLUMNS:
+        if obj.get(name) is not None:
+            row[name] = obj[name]
+    return row
+
+
+async def _iter_ndjson_rows(chunks: AsyncIterator[bytes]):
+    """从请求体字节流逐行解析NDJSON，只持有一个未结束的行（不超过 stream_max_line_bytes）和当前网络块中的行"""
+    max_line = settings.stream_max_line_bytes
+    pending = b""
+    line_no = 0
+    async for data in chunks:
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            if len(line) >= max_line:
+                raise StreamPayloadError(f"第{line_no}行超过长度上限", line_no)
+            row = _parse_stream_line(line, line_no)
+            if row is not None:
+                yield row
+        if len(pending) >= max_line:
+            raise StreamPayloadError(f"第{line_no + 1}行超过长度上限", line_no + 1)
+    if pending:
+        row = _parse_stream_line(pending, line_no + 1)
+        if row is not None:
+            yield row
+
+
+async def _read_capped_body(request: Request, limit: int) -> bytes:
+    """读取完整请求体，超过 limit 字节时返回413"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    body = bytearray()
+    async for data in request.stream():
+        body += data
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    return bytes(body)
+
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """边读取请求体边输出的流式响应
+
+    StreamingResponse 在输出期间并发监听 receive() 上的断开事件，会吞掉尚未读取的请求体消息；
+    这里请求体由响应生成器自己读取，客户端断开时 request.stream() 抛出 ClientDisconnect。
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_request_rows(rows: List[TabularRow]):
+    for row in rows:
+        yield row.model_dump()
+
+
+@app.post("/api/predict/tabular/stream")
+async def predict_tabular_stream(request: Request, threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+                                 model_version: Optional[str] = Query(None, description="模型版本")):
+    """流式表格预测 - 按块推理并以NDJSON逐条返回 ExoplanetPrediction
+
+    请求体可以是NDJSON（每行一个TabularRow），在推理的同时逐块读取和解析，输入和输出内存都只与块大小有关；
+    也可以是 TabularPredictRequest JSON，需要完整读取后校验，大小受 stream_max_json_bytes 限制。
+    响应开始后出现的错误以 {"error": ..., "line": ...} 记录结束流。
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    response_class = StreamingResponse
+    if content_type == "application/json":
+        body = await _read_capped_body(request, settings.stream_max_json_bytes)
+        try:
+            payload = TabularPredictRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        rows = _iter_request_rows(payload.rows)
+        if threshold is None:
+            threshold = payload.threshold
+        model_version = model_version or payload.model_version
+    else:
+        # 请求体在响应期间随推理进度读取
+        rows = _iter_ndjson_rows(request.stream())
+        response_class = RequestBodyStreamingResponse
+    if threshold is None:
+        threshold = 0.5
+    try:
+        # 版本在响应开始前解析，整个流使用同一个模型版本
+        model_version = await model_adapter.resolve_model_version(model_version)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        predictions = model_adapter.predict_tabular_stream(rows, threshold, version=model_version)
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持流式预测")
+
+    async def generate():
+        count = 0
+        try:
+            async for prediction in predictions:
+                yield ExoplanetPrediction(**prediction).model_dump_json() + "\n"
+                count += 1
+        except ClientDisconnect:
+            logger.info(f"Streaming prediction client disconnected after {count} rows")
+        except Exception as e:
+            logger.error(f"Streaming prediction aborted after {count} rows: {str(e)}")
+            yield json.dumps({"error": str(e), "line": getattr(e, "line", None)}, ensure_ascii=False) + "\n"
+
+    return response_class(generate(), media_type=NDJSON_TYPE)
+
+
 @app.post("/api/predict/curve", response_model=PredictionResponse)
 async def predict_curve(request: CurvePredictRequest):
     """光变曲线预测"""
     try:
         result = await model_adapter.predict_curve(request)
-        logger.info(f"Curve prediction completed for curve length {len(request.curve)}")
+        logger.info(f"Curve prediction completed for {request.curve_id or f'curve length {len(request.curve)}'}")
         return PredictionResponse(**result)
+    except CurveNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持光变曲线预测")
     except Exception as e:
         logger.error(f"Curve prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/predict/curve/batch", response_model=PredictionResponse)
+async def predict_curve_batch(request: CurveBatchPredictRequest):
+    """批量光变曲线预测 - 一次请求处理多条曲线，结果顺序与输入一致"""
+    try:
+        result = await model_adapter.predict_curve_batch(request)
+        logger.info(f"Curve batch prediction completed for {len(request.curves)} curves")
+        return PredictionResponse(**result)
+    except CurveNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持光变曲线预测")
+    except Exception as e:
+        logger.error(f"Curve batch prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/predict/fuse", response_model=PredictionResponse)
 async def predict_fuse(request: FusePredictRequest):
     """融合预测"""
@@ -213,11 +492,117 @@ async def predict_fuse(request: FusePredictRequest):
         result = await model_adapter.predict_fuse(request)
         logger.info("Fuse prediction completed")
         return PredictionResponse(**result)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CurveNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持融合预测")
     except Exception as e:
         logger.error(f"Fuse prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/predict/fuse/batch", response_model=PredictionResponse)
+async def predict_fuse_batch(request: FuseBatchPredictRequest):
+    """批量融合预测 - 表格模型与光变曲线并行推理后按 alpha 混合"""
+    try:
+        result = await model_adapter.predict_fuse_batch(request)
+        logger.info(f"Fuse batch prediction completed for {len(request.pairs)} pairs")
+        return PredictionResponse(**result)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CurveNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InferenceQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持融合预测")
+    except Exception as e:
+        logger.error(f"Fuse batch prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# 光变曲线存储接口
+@app.post("/api/curves", response_model=StoredCurve, status_code=201)
+async def upload_curve(request: Request, curve_id: Optional[str] = Query(None, description="二进制上传时的曲线ID")):
+    """上传光变曲线 - JSON（CurveUploadRequest）或二进制曲线文件（application/x-exoquest-curve）"""
+    store = get_curve_store()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type == CURVE_CONTENT_TYPE:
+            if not curve_id:
+                raise HTTPException(status_code=422, detail="二进制上传需要 curve_id 查询参数")
+            validate_curve_id(curve_id)
+            path = await _stream_curve_upload(request, store, curve_id, settings.max_curve_upload_bytes)
+            try:
+                await asyncio.to_thread(store.put_file, curve_id, path)
+            finally:
+                Path(path).unlink(missing_ok=True)
+        else:
+            body = await _read_capped_body(request, settings.max_curve_upload_bytes)
+            try:
+                payload = CurveUploadRequest.model_validate_json(body)
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            curve_id = validate_curve_id(payload.curve_id)
+            await asyncio.to_thread(
+                store.put_arrays, curve_id, payload.time, payload.flux, payload.flux_err, payload.metadata
+            )
+        return await asyncio.to_thread(_describe_curve, store, curve_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _stream_curve_upload(request: Request, store, curve_id: str, limit: int) -> str:
+    """把二进制曲线请求体边接收边写入缓存目录中的临时文件，超过 limit 字节时删除文件并返回413"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    fd, path = await asyncio.to_thread(store.staging_file, curve_id)
+    try:
+        with open(fd, "wb") as f:
+            received = 0
+            async for data in request.stream():
+                received += len(data)
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+                await asyncio.to_thread(f.write, data)
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def _describe_curve(store, curve_id: str) -> StoredCurve:
+    header = store.header(curve_id)
+    return StoredCurve(
+        curve_id=curve_id,
+        n_points=header["n_points"],
+        time_offset=header["time_offset"],
+        columns=list(header["columns"]),
+        size=store.ensure_local(curve_id).stat().st_size,
+        metadata=header["metadata"]
+    )
+
+
+@app.get("/api/curves/{curve_id}", response_model=StoredCurve)
+async def get_curve(curve_id: str):
+    """已存储光变曲线的头部信息"""
+    try:
+        return await asyncio.to_thread(_describe_curve, get_curve_store(), curve_id)
+    except CurveNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 # 训练接口
 @app.post("/api/train", response_model=TrainingResponse)
 async def start_training(request: TrainingRequest):
@@ -226,6 +611,10 @@ async def start_training(request: TrainingRequest):
         result = await model_adapter.start_training(request)
         logger.info(f"Training started: {result['job_id']}")
         return TrainingResponse(**result)
+    except TrainingConfigError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Training start failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -233,7 +622,7 @@ async def start_training(request: TrainingRequest):
 
 @app.get("/api/jobs/{job_id}/status", response_model=TrainingJob)
 async def get_job_status(job_id: str):
-    """获取训练任务状态"""
+    """获取训练或评分任务状态"""
     try:
         job = await model_adapter.get_job_status(job_id)
         return job
@@ -244,19 +633,90 @@ async def get_job_status(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/models")
+async def list_models():
+    """模型注册表：默认版本、已加载版本和可加载版本"""
+    try:
+        return await model_adapter.list_models()
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持模型注册表")
+    except Exception as e:
+        logger.error(f"List models failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/models/{version}/activate", status_code=202)
+async def activate_model(version: str):
+    """在后台加载并预热指定版本，完成后切换为默认版本（进行中的请求继续使用旧版本）"""
+    try:
+        result = await model_adapter.activate_model(version)
+        logger.info(f"Model activation requested: {version}")
+        return result
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持模型热切换")
+    except Exception as e:
+        logger.error(f"Model activation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/models/{model_id}/metrics", response_model=ModelMetrics)
-async def get_model_metrics(model_id: str):
-    """获取模型性能指标"""
+async def get_model_metrics(model_id: str, threshold: float = Query(0.5, ge=0.0, le=1.0)):
+    """获取模型在留出测试集上的性能指标（model_id 可为 latest；每个版本只评估一次）"""
     try:
-        metrics = await model_adapter.get_model_metrics(model_id)
+        metrics = await model_adapter.get_model_metrics(model_id, threshold)
         return metrics
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except EvaluationUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Get model metrics failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/models/{model_id}/metrics/thresholds", response_model=ThresholdCurve)
+async def get_threshold_curve(model_id: str):
+    """各阈值下的混淆矩阵和指标（预先计算），阈值滑块直接查表"""
+    try:
+        return await model_adapter.get_threshold_curve(model_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except EvaluationUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持阈值曲线")
+    except Exception as e:
+        logger.error(f"Get threshold curve failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/models/{model_id}/plots/{name}.png")
+async def get_model_plot(model_id: str, name: str):
+    """评估图表（PR曲线、校准曲线）"""
+    try:
+        path = await model_adapter.get_model_plot(model_id, name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except EvaluationUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="当前模型适配器不支持评估图表")
+    except Exception as e:
+        logger.error(f"Get model plot failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    # 具体版本的图表不会变化，可长期缓存；latest 随默认版本切换
+    cache_control = "no-cache" if model_id == "latest" else "public, max-age=86400"
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": cache_control})
+
+
+@app.get("/api/inference/stats")
+async def get_inference_stats():
+    """获取推理运行时统计（队列等待、计算耗时等）"""
+    return model_adapter.get_inference_stats()
+
+
 # 反馈接口
 @app.post("/api/feedback", response_model=FeedbackResponse)
 async def submit_feedback(request: FeedbackRequest):
@@ -283,12 +743,19 @@ async def startup_event():
         logger.info("Model adapter initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize model adapter: {str(e)}")
+    
+    # 模型加载和存储桶检查在后台进行，不阻塞 /health
+    app.state.startup_tasks = [
+        asyncio.create_task(model_adapter.load_model()),
+        asyncio.create_task(asyncio.to_thread(minio_service.ensure_buckets))
+    ]
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理"""
     logger.info("Shutting down ExoQuest Platform API")
+    await model_adapter.close()
 
 
 if __name__ == "__main__":
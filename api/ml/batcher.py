@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ml.executor import InferenceExecutor, LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingRequest:
+    rows: List[Dict[str, Any]]
+    threshold: float
+    future: asyncio.Future
+    enqueued_at: float
+    version: Optional[str] = None
+
+
+class MicroBatcher:
+    """动态微批处理 - 将时间窗口内到达的并发小请求合并为一次模型调用（只合并同一模型版本的请求）"""
+
+    def __init__(self, executor: InferenceExecutor, predict_many: Callable,
+                 window_ms: float = 2.0, max_rows: int = 256):
+        self.executor = executor
+        self.predict_many = predict_many
+        self.window = window_ms / 1000.0
+        self.max_rows = max(1, max_rows)
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._carry: Optional[_PendingRequest] = None
+        self._inflight = set()
+        self._batches = 0
+        self._requests = 0
+        self._batch_rows = Counter()
+        self.added_latency = LatencyWindow()
+
+    def _ensure_collector(self):
+        """在当前事件循环中启动收集任务（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._collector is None or self._collector.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._collector = loop.create_task(self._collect())
+
+    async def submit(self, rows: List[Dict[str, Any]], threshold: float,
+                     version: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """提交一个请求，等待所在批次完成后返回 (结果, 耗时信息)"""
+        self._ensure_collector()
+        future = self._loop.create_future()
+        self._queue.put_nowait(_PendingRequest(rows, threshold, future, time.perf_counter(), version))
+        return await future
+
+    async def _collect(self):
+        """收集循环：首个请求到达后，在窗口期内或达到行数上限前持续合并"""
+        while True:
+            if self._carry is not None:
+                first, self._carry = self._carry, None
+            else:
+                first = await self._queue.get()
+            batch = [first]
+            n_rows = len(first.rows)
+            deadline = self._loop.time() + self.window
+
+            while n_rows < self.max_rows:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if n_rows + len(item.rows) > self.max_rows or item.version != first.version:
+                    # 放到下一批，保证单批不超过上限且只使用一个模型版本
+                    self._carry = item
+                    break
+                batch.append(item)
+                n_rows += len(item.rows)
+
+            task = self._loop.create_task(self._dispatch(batch, n_rows))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[_PendingRequest], n_rows: int):
+        """执行合并后的批次并把结果分发给各个调用方"""
+        dispatched_at = time.perf_counter()
+        self._batches += 1
+        self._requests += len(batch)
+        self._batch_rows[self._bucket(n_rows)] += 1
+        for item in batch:
+            self.added_latency.add((dispatched_at - item.enqueued_at) * 1000)
+
+        try:
+            results, timing = await self.executor.run(
+                self.predict_many, [(item.rows, item.threshold) for item in batch], batch[0].version
+            )
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            if item.future.done():
+                continue
+            item_timing = dict(timing)
+            item_timing["batch_wait_ms"] = round((dispatched_at - item.enqueued_at) * 1000, 3)
+            item_timing["batch_rows"] = n_rows
+            item_timing["batch_requests"] = len(batch)
+            item.future.set_result((result, item_timing))
+
+    def _bucket(self, n_rows: int) -> int:
+        """批大小直方图的桶上界（2的幂）"""
+        bound = 1
+        while bound < n_rows:
+            bound *= 2
+        return bound
+
+    def stats(self) -> Dict[str, Any]:
+        """批大小直方图与新增延迟分位数"""
+        return {
+            "window_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "batches": self._batches,
+            "requests": self._requests,
+            "batch_rows_histogram": {f"le_{k}": v for k, v in sorted(self._batch_rows.items())},
+            "added_latency": self.added_latency.summary(),
+        }
+
+    async def close(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
@@ -0,0 +1,246 @@
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from ml.lightcurve import detrend, robust_sigma
+
+logger = logging.getLogger(__name__)
+
+# 默认搜索的凌星持续时间（小时）
+DEFAULT_DURATIONS_HR = (1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 10.0, 12.0)
+
+
+def prepare(time: Sequence[float], flux: Sequence[float], flux_err: Optional[Sequence[float]] = None,
+            bin_days: float = 0.01, detrend_window_days: float = 1.0, sigma_clip: float = 5.0) -> Dict[str, Any]:
+    """去趋势后按 bin_days 在时间上分箱，得到BLS使用的加权残差
+
+    分箱后的点数只与观测跨度/相位分辨率有关（27天、0.01天约2700个），与原始采样点数（10⁵–10⁶）无关，
+    之后每个试验周期的折叠只需处理这些箱。返回的 s/r 是各箱的 Σw·y 和 Σw（w归一化为总和1，y加权均值为0）。
+    """
+    time = np.asarray(time, dtype=np.float64)[None, :]
+    flux = np.asarray(flux, dtype=np.float64)[None, :]
+    valid = np.isfinite(time) & np.isfinite(flux)
+    residual, valid = detrend(time, flux, valid, detrend_window_days, sigma_clip)
+    time, residual, valid = time[0], residual[0], valid[0]
+    if flux_err is not None:
+        err = np.asarray(flux_err, dtype=np.float64)
+        valid &= np.isfinite(err) & (err > 0)
+        err = np.where(valid, err, 1.0)
+    else:
+        sigma = float(robust_sigma(residual[None, :], valid[None, :])[0])
+        err = np.full(time.shape, sigma if math.isfinite(sigma) and sigma > 0 else 1.0)
+    if valid.sum() < 3:
+        raise ValueError("Light curve has fewer than 3 valid points")
+
+    t, y, ivar = time[valid], residual[valid], 1.0 / err[valid] ** 2
+    t_ref = float(t.min())
+    baseline = float(t.max()) - t_ref
+    n_bins = int(baseline / bin_days) + 1
+    idx = np.minimum(((t - t_ref) / bin_days).astype(np.intp), n_bins - 1)
+    weight = np.bincount(idx, weights=ivar, minlength=n_bins)
+    total_ivar = weight.sum()
+    mean = np.bincount(idx, weights=ivar * y, minlength=n_bins).sum() / total_ivar
+    wy = np.bincount(idx, weights=ivar * (y - mean), minlength=n_bins)
+    keep = weight > 0
+    return {
+        "t_ref": t_ref,
+        "baseline": baseline,
+        "bin_days": bin_days,
+        "offset": (np.flatnonzero(keep) + 0.5) * bin_days,  # 各箱中心相对 t_ref 的时间
+        "s": wy[keep] / total_ivar,
+        "r": weight[keep] / total_ivar,
+        "total_ivar": total_ivar,
+        "n_points": int(valid.sum())
+    }
+
+
+def period_grid(baseline: float, min_period: float, max_period: float, min_duration: float,
+                oversample: float = 3.0, max_periods: int = 50000) -> np.ndarray:
+    """频率等间隔的试验周期网格：Δf = q_min / (oversample · 跨度²)，点数超过上限时放宽间隔"""
+    max_period = min(max_period, baseline / 2) if baseline > 0 else max_period
+    if max_period <= min_period:
+        raise ValueError(f"Baseline {baseline:.2f}d is too short for periods >= {min_period}d")
+    f_min, f_max = 1.0 / max_period, 1.0 / min_period
+    df = max(min_duration / (oversample * baseline ** 2), (f_max - f_min) / max_periods)
+    return 1.0 / np.arange(f_max, f_min, -df)
+
+
+def _duration_bins(durations_days: Sequence[float], bin_days: float) -> np.ndarray:
+    return np.unique(np.maximum(np.round(np.asarray(durations_days) / bin_days).astype(np.intp), 1))
+
+
+def evaluate_periods(state: Dict[str, Any], periods: np.ndarray, duration_bins: np.ndarray) -> Dict[str, np.ndarray]:
+    """对一组周期向量化计算BLS功率：折叠分箱 -> 环形前缀和 -> 所有 (相位, 持续时间) 窗口
+
+    功率 SR = s² / (r(1-r))（Kovács 2002），只考虑变暗（s<0）的窗口。
+    内存为 O(len(periods) · (周期最大箱数 + 最长持续时间))。
+    """
+    bin_days = state["bin_days"]
+    n_periods = len(periods)
+    n_phase = np.ceil(periods / bin_days).astype(np.intp)  # 每个周期的相位箱数
+    width = int(n_phase.max())
+    max_m = int(duration_bins.max())
+
+    phase_bin = np.minimum((np.mod(state["offset"][None, :], periods[:, None]) / bin_days).astype(np.intp),
+                           n_phase[:, None] - 1)
+    flat = (np.arange(n_periods)[:, None] * width + phase_bin).ravel()
+    size = n_periods * width
+    s = np.bincount(flat, weights=np.tile(state["s"], n_periods), minlength=size).reshape(n_periods, width)
+    r = np.bincount(flat, weights=np.tile(state["r"], n_periods), minlength=size).reshape(n_periods, width)
+
+    # 每行按自身的相位箱数首尾相接，窗口可以跨过相位0
+    ext = np.arange(width + max_m)[None, :] % n_phase[:, None]
+    zeros = np.zeros((n_periods, 1))
+    cs = np.concatenate([zeros, np.cumsum(np.take_along_axis(s, ext, axis=1), axis=1)], axis=1)
+    cr = np.concatenate([zeros, np.cumsum(np.take_along_axis(r, ext, axis=1), axis=1)], axis=1)
+    in_range = np.arange(width)[None, :] < n_phase[:, None]
+
+    rows = np.arange(n_periods)
+    best = {
+        "power": np.zeros(n_periods),
+        "depth": np.zeros(n_periods),
+        "snr": np.zeros(n_periods),
+        "duration_bins": np.zeros(n_periods, dtype=np.intp),
+        "start_bin": np.zeros(n_periods, dtype=np.intp),
+    }
+    for m in duration_bins:
+        s_in = cs[:, m:m + width] - cs[:, :width]
+        r_in = cr[:, m:m + width] - cr[:, :width]
+        ok = in_range & (s_in < 0) & (r_in > 0) & (r_in < 1)
+        with np.errstate(all="ignore"):
+            power = np.where(ok, s_in ** 2 / (r_in * (1 - r_in)), 0.0)
+        start = np.argmax(power, axis=1)
+        peak = power[rows, start]
+        better = peak > best["power"]
+        s_best, r_best = s_in[rows, start], r_in[rows, start]
+        with np.errstate(all="ignore"):
+            depth = np.where(better, -s_best / (r_best * (1 - r_best)), 0.0)
+            snr = depth * np.sqrt(state["total_ivar"] * r_best * (1 - r_best))
+        best["power"] = np.where(better, peak, best["power"])
+        best["depth"] = np.where(better, depth, best["depth"])
+        best["snr"] = np.where(better, snr, best["snr"])
+        best["duration_bins"] = np.where(better, m, best["duration_bins"])
+        best["start_bin"] = np.where(better, start, best["start_bin"])
+    return best
+
+
+# 进程池工作进程持有的分箱光变曲线（初始化时传入一次，之后每个任务只传周期块）
+_worker_state: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(state: Dict[str, Any]):
+    global _worker_state
+    _worker_state = state
+
+
+def _evaluate_chunk(periods: np.ndarray, duration_bins: np.ndarray) -> Dict[str, np.ndarray]:
+    return evaluate_periods(_worker_state, periods, duration_bins)
+
+
+def create_bls_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """长期复用的BLS进程池（workers<=1 时返回None，在调用线程中计算）
+
+    池中的进程不持有曲线，每个周期块连同分箱后的曲线（几千个箱）一起提交，多个请求可以共用同一个池。
+    """
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def bls_search(time: Sequence[float], flux: Sequence[float], flux_err: Optional[Sequence[float]] = None,
+               periods: Optional[Sequence[float]] = None, durations_hr: Sequence[float] = DEFAULT_DURATIONS_HR,
+               min_period: float = 0.5, max_period: float = 100.0, bin_days: float = 0.01,
+               oversample: float = 3.0, max_periods: int = 50000, chunk_bytes: int = 64 * 2 ** 20,
+               workers: int = 1, detrend_window_days: float = 1.0, pool: Optional[Executor] = None) -> Dict[str, Any]:
+    """BLS周期搜索：按周期块向量化计算功率谱，周期块可在进程池中并行
+
+    传入 pool 时提交到该共享进程池（API路径，进程数不随并发请求增加）；
+    否则 workers>1 时为本次搜索临时创建进程池（离线/基准路径）。
+    每个块的周期数由 chunk_bytes 决定，峰值内存与曲线长度和周期网格大小无关。
+    返回功率谱（periods/power）和最佳候选的周期、历元、持续时间、深度、SNR。
+    """
+    durations_days = np.asarray(durations_hr, dtype=np.float64) / 24
+    state = prepare(time, flux, flux_err, bin_days, detrend_window_days)
+    if periods is None:
+        periods = period_grid(state["baseline"], min_period, max_period, float(durations_days.min()),
+                              oversample, max_periods)
+    periods = np.asarray(periods, dtype=np.float64)
+    # 持续时间不超过最短周期的一半
+    usable = durations_days[durations_days < periods.min() / 2]
+    duration_bins = _duration_bins(usable if usable.size else durations_days[:1], bin_days)
+
+    # 每个周期约占 (分箱点数 + 相位箱数 + 持续时间) 个float64的若干份临时数组
+    per_period = 8 * 6 * (len(state["s"]) + int(np.ceil(periods.max() / bin_days)) + int(duration_bins.max()))
+    chunk = max(1, int(chunk_bytes // per_period))
+    chunks = [periods[i:i + chunk] for i in range(0, len(periods), chunk)]
+
+    workers = min(max(1, workers), len(chunks))
+    if pool is not None and len(chunks) > 1:
+        mode = "shared pool"
+        parts = list(pool.map(evaluate_periods, [state] * len(chunks), chunks, [duration_bins] * len(chunks)))
+    elif workers > 1:
+        mode = f"{workers} workers"
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(state,)) as search_pool:
+            parts = list(search_pool.map(_evaluate_chunk, chunks, [duration_bins] * len(chunks)))
+    else:
+        mode = "1 worker"
+        parts = [evaluate_periods(state, part, duration_bins) for part in chunks]
+    spectrum = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    k = int(np.argmax(spectrum["power"]))
+    m, start = int(spectrum["duration_bins"][k]), int(spectrum["start_bin"][k])
+    period = float(periods[k])
+    epoch = state["t_ref"] + math.fmod((start + m / 2) * bin_days, period)
+    logger.info(
+        f"BLS searched {len(periods)} periods x {len(duration_bins)} durations over {state['n_points']} points "
+        f"in {len(chunks)} chunks ({mode}): best P={period:.5f}d SNR={spectrum['snr'][k]:.1f}"
+    )
+    return {
+        "periods": periods,
+        "power": spectrum["power"],
+        "period": period,
+        "epoch": epoch,
+        "duration": m * bin_days,
+        "depth": float(spectrum["depth"][k]),
+        "snr": float(spectrum["snr"][k]),
+        "power_max": float(spectrum["power"][k]),
+        "n_points": state["n_points"]
+    }
+
+
+def bls_naive(state: Dict[str, Any], periods: Sequence[float], duration_bins: Sequence[int]) -> np.ndarray:
+    """朴素BLS（基准和测试用）：逐周期、逐持续时间、逐相位起点直接求和，与 evaluate_periods 的窗口定义相同"""
+    bin_days = state["bin_days"]
+    power = np.zeros(len(periods))
+    for k, period in enumerate(periods):
+        n_phase = int(np.ceil(period / bin_days))
+        phase_bin = np.minimum((np.mod(state["offset"], period) / bin_days).astype(np.intp), n_phase - 1)
+        for m in duration_bins:
+            for start in range(n_phase):
+                in_transit = np.mod(phase_bin - start, n_phase) < m
+                s_in, r_in = state["s"][in_transit].sum(), state["r"][in_transit].sum()
+                if s_in < 0 and 0 < r_in < 1:
+                    power[k] = max(power[k], s_in ** 2 / (r_in * (1 - r_in)))
+    return power
+
+
+def candidate_features(result: Dict[str, Any]) -> Dict[str, float]:
+    """把BLS最佳候选转换为KOI风格的表格特征（周期/天、持续时间/小时、深度/ppm）"""
+    return {
+        "koi_period": result["period"],
+        "koi_time0bk": result["epoch"],
+        "koi_duration": result["duration"] * 24,
+        "koi_depth": result["depth"] * 1e6,
+        "koi_model_snr": result["snr"]
+    }
+
+
+def default_workers(setting: int) -> int:
+    """0表示使用全部CPU"""
+    return setting if setting > 0 else (os.cpu_count() or 1)
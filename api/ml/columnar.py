@@ -0,0 +1,125 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_TYPE = "application/vnd.apache.arrow.file"
+ARROW_TYPES = (ARROW_STREAM_TYPE, ARROW_FILE_TYPE)
+
+# 只用于标识目标、不参与模型计算的列
+ID_COLUMNS = ("kepoi_name", "object_id", "target_name")
+
+
+class ColumnarPayloadError(ValueError):
+    """列式请求体无效"""
+
+
+def parse_json_columns(body: bytes) -> Tuple[Dict[str, Any], Optional[float]]:
+    """解析列式JSON请求体 {"columns": {name: [...]}, "threshold": 0.5}"""
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise ColumnarPayloadError(f"请求体不是有效的JSON: {e}")
+
+    columns = payload.get("columns") if isinstance(payload, dict) else None
+    if not isinstance(columns, dict):
+        raise ColumnarPayloadError("请求体需要包含 columns 对象（列名 -> 数值数组）")
+    return columns, payload.get("threshold")
+
+
+def parse_arrow_columns(body: bytes, content_type: str) -> Dict[str, Any]:
+    """解析Arrow IPC（stream或file格式）请求体"""
+    if not PYARROW_AVAILABLE:
+        raise ColumnarPayloadError("服务端未安装pyarrow，无法解析Arrow请求体")
+    try:
+        if content_type == ARROW_FILE_TYPE:
+            table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ColumnarPayloadError(f"无效的Arrow IPC数据: {e}")
+    return {name: table.column(name) for name in table.column_names}
+
+
+def _to_float_array(name: str, column: Any) -> np.ndarray:
+    """将单列转换为float64数组（null/None转为NaN）"""
+    try:
+        if PYARROW_AVAILABLE and isinstance(column, (pa.ChunkedArray, pa.Array)):
+            return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+        return np.asarray(column, dtype=np.float64)
+    except (TypeError, ValueError, NotImplementedError) as e:
+        raise ColumnarPayloadError(f"列 {name} 包含非数值数据: {e}")
+
+
+def validate_columns(columns: Dict[str, Any], required: Sequence[str],
+                     optional: Sequence[str]) -> Tuple[Dict[str, np.ndarray], Optional[List[str]], int]:
+    """逐列（而非逐行）校验列式输入，返回 (数值列, 目标ID列表, 行数)"""
+    missing = [name for name in required if name not in columns]
+    if missing:
+        raise ColumnarPayloadError(f"缺少必需的列: {', '.join(missing)}")
+
+    arrays = {}
+    for name in list(required) + [n for n in optional if n in columns]:
+        array = _to_float_array(name, columns[name])
+        if array.ndim != 1:
+            raise ColumnarPayloadError(f"列 {name} 必须是一维数组")
+        arrays[name] = array
+
+    lengths = {len(array) for array in arrays.values()}
+    if len(lengths) > 1:
+        raise ColumnarPayloadError(f"各列长度不一致: {sorted(lengths)}")
+    n_rows = lengths.pop() if lengths else 0
+
+    object_ids = None
+    for name in ID_COLUMNS:
+        if name in columns:
+            ids = columns[name]
+            ids = ids.to_pylist() if PYARROW_AVAILABLE and isinstance(ids, (pa.ChunkedArray, pa.Array)) else list(ids)
+            if len(ids) != n_rows:
+                raise ColumnarPayloadError(f"列 {name} 的长度与特征列不一致")
+            object_ids = [str(v) if v is not None else f"TARGET-{i+1}" for i, v in enumerate(ids)]
+            break
+
+    return arrays, object_ids, n_rows
+
+
+def encode_json_result(result: Dict[str, Any]) -> bytes:
+    """将列式预测结果编码为JSON（列式）"""
+    return json.dumps({
+        "object_id": list(result["object_id"]),
+        "version": result["version"],
+        "probs": {name: column.tolist() for name, column in result["probs"].items()},
+        "conf": result["conf"].tolist(),
+        "shap": {
+            "features": result["shap_features"].tolist(),
+            "values": result["shap_values"].tolist()
+        }
+    }).encode("utf-8")
+
+
+def encode_arrow_result(result: Dict[str, Any]) -> bytes:
+    """将列式预测结果编码为Arrow IPC stream"""
+    top_k = result["shap_values"].shape[1]
+    arrays = {
+        "object_id": pa.array(result["object_id"], type=pa.string()),
+        **{f"prob_{name}": pa.array(column, type=pa.float64()) for name, column in result["probs"].items()},
+        "conf": pa.array(result["conf"], type=pa.float64()),
+        "shap_features": pa.FixedSizeListArray.from_arrays(
+            pa.array(result["shap_features"].ravel().tolist(), type=pa.string()), top_k),
+        "shap_values": pa.FixedSizeListArray.from_arrays(
+            pa.array(result["shap_values"].ravel(), type=pa.float64()), top_k),
+    }
+    table = pa.table(arrays).replace_schema_metadata({"version": result["version"]})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,228 @@
+import io
+import json
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.imports import lazy_import
+from ml.postprocess import POSITIVE_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# 预先渲染的图表（文件名为 <名称>.png）
+PLOT_NAMES = ("pr_curve", "calibration")
+# PR曲线最多保留的点数（报告和图表用，PR-AUC按全部点计算）
+PR_CURVE_POINTS = 200
+
+
+class EvaluationUnavailableError(RuntimeError):
+    """没有可用于评估的数据集"""
+
+
+def threshold_grid(steps: int = 101) -> np.ndarray:
+    """[0, 1] 上等间隔的阈值网格"""
+    return np.round(np.linspace(0.0, 1.0, max(2, steps)), 6)
+
+
+def threshold_sweep(y_true: Sequence[int], scores: Sequence[float], thresholds: Sequence[float]) -> Dict[str, np.ndarray]:
+    """一次计算所有阈值下的混淆矩阵和指标（score >= 阈值 判为正类）
+
+    正/负样本的分数各排序一次，每个阈值的 TP/FP 由 searchsorted 直接得到，复杂度 O((n + k) log n)。
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    pos = np.sort(scores[y_true])
+    neg = np.sort(scores[~y_true])
+
+    tp = len(pos) - np.searchsorted(pos, thresholds, side="left")
+    fp = len(neg) - np.searchsorted(neg, thresholds, side="left")
+    fn = len(pos) - tp
+    tn = len(neg) - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        denominator = np.sqrt((tp + fp).astype(np.float64) * (tp + fn) * (tn + fp) * (tn + fn))
+        mcc = np.where(denominator > 0, (tp.astype(np.float64) * tn - fp.astype(np.float64) * fn) / denominator, 0.0)
+    return {
+        "threshold": thresholds,
+        "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+        "precision": precision, "recall": recall, "f1": f1, "mcc": mcc
+    }
+
+
+def precision_recall_curve(y_true: Sequence[int], scores: Sequence[float]) -> Dict[str, np.ndarray]:
+    """以每个不同的分数为阈值的PR曲线（分数从高到低），与 sklearn 的定义一致"""
+    y_true = np.asarray(y_true).astype(bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    scores, y_sorted = scores[order], y_true[order]
+    # 相同分数只在最后一个位置取累计值
+    last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tp = np.cumsum(y_sorted)[last]
+    fp = (last + 1) - tp
+    n_pos = max(int(y_true.sum()), 1)
+    return {"threshold": scores[last], "precision": tp / (tp + fp), "recall": tp / n_pos}
+
+
+def average_precision(curve: Dict[str, np.ndarray]) -> float:
+    """PR-AUC（平均精确率）：Σ (R_i - R_{i-1}) · P_i"""
+    recall = np.r_[0.0, curve["recall"]]
+    return float(np.sum(np.diff(recall) * curve["precision"]))
+
+
+def calibration(y_true: Sequence[int], scores: Sequence[float], n_bins: int = 10) -> Dict[str, Any]:
+    """等宽分箱的可靠性曲线和期望校准误差 ECE = Σ n_b/N · |acc_b - conf_b|"""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    bins = np.minimum((scores * n_bins).astype(np.intp), n_bins - 1)
+    count = np.bincount(bins, minlength=n_bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        confidence = np.bincount(bins, weights=scores, minlength=n_bins) / count
+        accuracy = np.bincount(bins, weights=y_true, minlength=n_bins) / count
+    used = count > 0
+    ece = float(np.sum(count[used] * np.abs(accuracy[used] - confidence[used])) / max(len(scores), 1))
+    return {
+        "ece": ece,
+        "bin_edges": np.linspace(0.0, 1.0, n_bins + 1),
+        "confidence": np.where(used, confidence, np.nan),
+        "accuracy": np.where(used, accuracy, np.nan),
+        "count": count
+    }
+
+
+def _downsample(curve: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+    n = len(curve["recall"])
+    if n <= max_points:
+        return curve
+    keep = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.intp))
+    return {key: values[keep] for key, values in curve.items()}
+
+
+def _to_list(values: np.ndarray):
+    """JSON中用 None 表示NaN（空箱）"""
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in np.asarray(values).tolist()]
+
+
+def evaluate_scores(y_true: Sequence[int], scores: Sequence[float], thresholds: Optional[Sequence[float]] = None,
+                    n_bins: int = 10) -> Dict[str, Any]:
+    """由标签和正类概率计算完整的评估报告（可JSON序列化）：PR-AUC、ECE、各阈值下的混淆矩阵和指标、PR/校准曲线"""
+    y_true = np.asarray(y_true).astype(bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    if thresholds is None:
+        thresholds = threshold_grid()
+    sweep = threshold_sweep(y_true, scores, thresholds)
+    curve = precision_recall_curve(y_true, scores)
+    calib = calibration(y_true, scores, n_bins)
+    return {
+        "n_samples": int(len(y_true)),
+        "n_positive": int(y_true.sum()),
+        "pr_auc": average_precision(curve),
+        "ece": calib["ece"],
+        "thresholds": {key: _to_list(values) for key, values in sweep.items()},
+        "pr_curve": {key: _to_list(values) for key, values in _downsample(curve, PR_CURVE_POINTS).items()},
+        "calibration": {key: _to_list(values) for key, values in calib.items() if key != "ece"}
+    }
+
+
+def at_threshold(report: Dict[str, Any], threshold: float) -> Dict[str, Any]:
+    """从预先计算的阈值网格中取最接近的阈值的混淆矩阵和指标"""
+    sweep = report["thresholds"]
+    i = int(np.argmin(np.abs(np.asarray(sweep["threshold"]) - threshold)))
+    return {key: values[i] for key, values in sweep.items()}
+
+
+def render_plots(report: Dict[str, Any]) -> Dict[str, bytes]:
+    """渲染PR曲线和校准曲线（PNG）；使用 Figure 对象而不是 pyplot，可在线程中并发调用"""
+    Figure = lazy_import("matplotlib.figure").Figure
+    title = f"{report.get('version', '')} (n={report['n_samples']})".strip()
+    plots = {}
+
+    fig = Figure(figsize=(5, 4), dpi=100)
+    ax = fig.add_subplot()
+    pr = report["pr_curve"]
+    ax.step(pr["recall"], pr["precision"], where="post", color="#1677ff")
+    base_rate = report["n_positive"] / max(report["n_samples"], 1)
+    ax.axhline(base_rate, color="gray", linestyle="--", linewidth=1, label=f"Base rate {base_rate:.2f}")
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1.02)
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.set_title(f"PR curve, AUC={report['pr_auc']:.3f} {title}", fontsize=9)
+    ax.legend(loc="lower left", fontsize=8)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plots["pr_curve"] = buffer.getvalue()
+
+    fig = Figure(figsize=(5, 4), dpi=100)
+    ax = fig.add_subplot()
+    calib = report["calibration"]
+    points = [(c, a) for c, a in zip(calib["confidence"], calib["accuracy"]) if c is not None]
+    ax.plot([0, 1], [0, 1], color="gray", linestyle="--", linewidth=1, label="Perfectly calibrated")
+    if points:
+        ax.plot(*zip(*points), marker="o", color="#1677ff", label="Model")
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.set_xlabel("Mean predicted probability")
+    ax.set_ylabel("Fraction of positives")
+    ax.set_title(f"Calibration, ECE={report['ece']:.3f} {title}", fontsize=9)
+    ax.legend(loc="upper left", fontsize=8)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plots["calibration"] = buffer.getvalue()
+    return plots
+
+
+def _random_seed(models_dir: Path) -> int:
+    """训练产物的 metadata.json 记录了划分用的随机种子，随镜像发布的模型与notebook一致（42）"""
+    metadata_file = Path(models_dir) / "metadata.json"
+    if metadata_file.exists():
+        with open(metadata_file, "r") as f:
+            seed = json.load(f).get("params", {}).get("random_seed")
+        if seed is not None:
+            return int(seed)
+    return 42
+
+
+def holdout_scores(service, dataset_path: str) -> Tuple[np.ndarray, np.ndarray, int]:
+    """在notebook的留出测试集上运行模型，返回 (标签, 正类概率, 随机种子)
+
+    测试集由训练时相同的清洗和随机种子划分得到；特征以原始值输入，由模型自身的标准化参数处理。
+    正类与预测接口的阈值一致：概率列 POSITIVE_COLUMN（POSITIVE，即KOI的 CONFIRMED）。
+    """
+    from ml.training import clean_koi, read_koi_table, split_koi
+
+    if not dataset_path or not Path(dataset_path).exists():
+        raise EvaluationUnavailableError(f"Evaluation dataset not found: {dataset_path}")
+    seed = _random_seed(service.models_dir)
+    X, y = clean_koi(read_koi_table(dataset_path))
+    X_test, y_test = split_koi(X, y, random_state=seed)[2::3]
+    columns = {feature: X_test[feature].to_numpy() for feature in service.features if feature in X_test.columns}
+    probs_array = service._predict_probabilities(service._prepare_columns(columns, len(X_test)))
+    return y_test.to_numpy() == POSITIVE_COLUMN, probs_array[:, POSITIVE_COLUMN], seed
+
+
+def evaluate_model(service, dataset_path: str, threshold_steps: int = 101, n_bins: int = 10) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """评估一个模型版本：留出测试集推理 -> 一次性计算所有阈值的指标 -> 渲染图表"""
+    started = time.perf_counter()
+    y_true, scores, seed = holdout_scores(service, dataset_path)
+    report = evaluate_scores(y_true, scores, threshold_grid(threshold_steps), n_bins)
+    report.update({
+        "version": service.version,
+        "dataset": Path(dataset_path).name,
+        "random_seed": seed,
+        "evaluated_at": time.time()
+    })
+    plots = render_plots(report)
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        f"Evaluated model {service.version} on {report['n_samples']} hold-out rows in {report['elapsed_ms']:.0f}ms: "
+        f"PR-AUC={report['pr_auc']:.3f} ECE={report['ece']:.3f}"
+    )
+    return report, plots
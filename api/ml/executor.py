@@ -0,0 +1,136 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(Exception):
+    """推理队列已满（调用方应返回429）"""
+
+
+class LatencyWindow:
+    """滑动窗口延迟统计（毫秒）"""
+
+    def __init__(self, maxlen: int = 2048):
+        self._values = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, value_ms: float):
+        with self._lock:
+            self._values.append(value_ms)
+
+    def summary(self) -> Dict[str, float]:
+        """返回窗口内的样本数、均值和分位数"""
+        with self._lock:
+            values = np.fromiter(self._values, dtype=float)
+        if values.size == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "count": int(values.size),
+            "mean_ms": round(float(values.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(values.max()), 3),
+        }
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict) -> Tuple[Any, float, float]:
+    """在工作线程/进程中执行并记录开始、结束时间"""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.time()
+
+
+class InferenceExecutor:
+    """推理执行器 - 在线程池/进程池中运行模型调用，带有界队列和背压"""
+
+    def __init__(self, kind: str = "thread", max_workers: int = 2, queue_size: int = 32,
+                 initializer: Optional[Callable] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported inference executor: {kind}")
+        self.kind = kind
+        self.initializer = initializer  # 进程池工作进程启动时调用（加载并预热模型）
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(0, queue_size)
+        self._pool = None
+        self._pending = 0
+        self._rejected = 0
+        self.queue_wait = LatencyWindow()
+        self.compute = LatencyWindow()
+
+    @property
+    def capacity(self) -> int:
+        """同时允许的最大任务数（运行中 + 排队中）"""
+        return self.max_workers + self.queue_size
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn避免fork事件循环和模型运行时线程
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+            logger.info(f"Inference executor started: {self.kind} x {self.max_workers}, queue={self.queue_size}")
+        return self._pool
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+        """提交推理任务，返回 (结果, 耗时信息)；队列满时抛出 InferenceQueueFullError"""
+        if self._pending >= self.capacity:
+            self._rejected += 1
+            raise InferenceQueueFullError(
+                f"推理队列已满 ({self._pending}/{self.capacity})，请稍后重试"
+            )
+
+        self._pending += 1
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(
+                self._get_pool(), functools.partial(_timed_call, fn, args, kwargs)
+            )
+        finally:
+            self._pending -= 1
+
+        timing = {
+            "queue_wait_ms": round(max(0.0, started_at - submitted_at) * 1000, 3),
+            "compute_ms": round((finished_at - started_at) * 1000, 3),
+            "total_ms": round((time.time() - submitted_at) * 1000, 3),
+        }
+        self.queue_wait.add(timing["queue_wait_ms"])
+        self.compute.add(timing["compute_ms"])
+        return result, timing
+
+    def stats(self) -> Dict[str, Any]:
+        """执行器状态与延迟统计"""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "pending": self._pending,
+            "rejected": self._rejected,
+            "queue_wait": self.queue_wait.summary(),
+            "compute": self.compute.summary(),
+        }
+
+    def shutdown(self, wait: bool = False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,108 @@
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.imports import lazy_import, module_available
+
+# shap 会连带导入 numba 等，耗时数秒；只检查是否安装，首次解释时再导入
+SHAP_AVAILABLE = module_available("shap")
+
+logger = logging.getLogger(__name__)
+
+
+class BatchExplainer:
+    """批量SHAP解释引擎 - 每个已加载模型只构建一次解释器，每个请求只计算一次SHAP矩阵
+
+    tree_shap 为对称树精确TreeSHAP（ml.oblivious.ObliviousTreeShap）时不再需要 shap 库，
+    并且 top-k 按行块计算，不会为整个批次生成稠密SHAP矩阵。
+    """
+
+    def __init__(self, model, model_type: str, feature_names: Sequence[str], tree_shap=None):
+        self.model = model
+        self.model_type = model_type
+        self.feature_names = list(feature_names)
+        self.tree_shap = tree_shap
+        self._explainer = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """当前模型是否支持SHAP解释"""
+        return self.tree_shap is not None or (SHAP_AVAILABLE and self.model_type in ("catboost", "lightgbm"))
+
+    def _get_explainer(self):
+        """获取（必要时构建）TreeExplainer，构建过程只发生一次"""
+        if self._explainer is None:
+            with self._lock:
+                if self._explainer is None:
+                    logger.info(f"Building SHAP TreeExplainer for {self.model_type} model")
+                    shap = lazy_import("shap")
+                    self._explainer = shap.TreeExplainer(self.model)
+        return self._explainer
+
+    def shap_matrix(self, feature_data: np.ndarray) -> Optional[np.ndarray]:
+        """计算整个批次的SHAP矩阵 [n_samples, n_features]，不可用时返回None"""
+        if not self.available:
+            return None
+        if self.tree_shap is not None:
+            return self.tree_shap.shap_values(feature_data)[:, :, 0]
+
+        shap_values = self._get_explainer().shap_values(feature_data)
+
+        # 如果是多分类，取第一个类别的SHAP值
+        if isinstance(shap_values, list):
+            shap_values = shap_values[0]
+        shap_values = np.asarray(shap_values)
+        if shap_values.ndim == 3:
+            shap_values = shap_values[:, :, 0]
+        return shap_values
+
+    @staticmethod
+    def top_k_indices(shap_matrix: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """按绝对值向量化选出每行前top_k个特征，返回 (特征索引, SHAP值)，均按绝对值降序"""
+        n_features = shap_matrix.shape[1]
+        k = min(top_k, n_features)
+        abs_values = np.abs(shap_matrix)
+
+        if k < n_features:
+            idx = np.argpartition(-abs_values, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(n_features), shap_matrix.shape).copy()
+
+        # argpartition结果无序，只对选中的k列排序
+        order = np.argsort(-np.take_along_axis(abs_values, idx, axis=1), axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+        return idx, np.take_along_axis(shap_matrix, idx, axis=1)
+
+    def top_k_for(self, feature_data: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """直接从特征矩阵计算每行前top_k个特征；对称树路径按行块计算，只保留 [n_rows, k] 的结果"""
+        if self.tree_shap is None:
+            return self.top_k_indices(self.shap_matrix(feature_data), top_k)
+        n_rows, block = feature_data.shape[0], self.tree_shap.block_rows
+        k = min(top_k, len(self.feature_names))
+        idx = np.empty((n_rows, k), dtype=np.intp)
+        values = np.empty((n_rows, k))
+        for start in range(0, n_rows, block):
+            stop = start + block
+            idx[start:stop], values[start:stop] = self.top_k_indices(self.shap_matrix(feature_data[start:stop]), k)
+        return idx, values
+
+    def top_k(self, shap_matrix: np.ndarray, top_k: int = 5) -> List[List[List]]:
+        """每个样本的前top_k个 [feature, shap] 对"""
+        return self.format_top_k(*self.top_k_indices(shap_matrix, top_k))
+
+    def format_top_k(self, idx: np.ndarray, values: np.ndarray) -> List[List[List]]:
+        """(特征索引, SHAP值) -> 每个样本的 [feature, shap] 对列表"""
+        names = self.feature_names
+        return [
+            [[names[j], float(v)] for j, v in zip(row_idx, row_values)]
+            for row_idx, row_values in zip(idx.tolist(), values.tolist())
+        ]
+
+    def global_importance(self, shap_matrix: np.ndarray, top_k: int = 5) -> List[List]:
+        """基于平均绝对SHAP值的全局特征重要性"""
+        mean_shap = np.mean(np.abs(shap_matrix), axis=0)
+        order = np.argsort(-mean_shap, kind="stable")[:top_k]
+        return [[self.feature_names[j], float(mean_shap[j])] for j in order]
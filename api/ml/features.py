@@ -0,0 +1,71 @@
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+class FeatureLayout:
+    """预编译的特征布局 - 模型加载时构建一次，直接填充预分配的特征矩阵"""
+
+    def __init__(self, features: Sequence[str], mean: Optional[np.ndarray] = None,
+                 scale: Optional[np.ndarray] = None, defaults: Optional[np.ndarray] = None,
+                 dtype: str = "float64"):
+        self.features = list(features)
+        self.dtype = np.dtype(dtype)
+        self.index: Dict[str, int] = {f: j for j, f in enumerate(self.features)}
+        n_features = len(self.features)
+
+        # 缺失值默认填充0，与旧的DataFrame路径保持一致
+        self.defaults = np.zeros(n_features, dtype=self.dtype) if defaults is None \
+            else np.asarray(defaults, dtype=self.dtype)
+
+        self.mean = None
+        self.scale = None
+        if mean is not None and scale is not None:
+            mean = np.asarray(mean, dtype=self.dtype)
+            scale = np.asarray(scale, dtype=self.dtype)
+            if mean.shape != (n_features,) or scale.shape != (n_features,):
+                raise ValueError(
+                    f"Scaler shape {mean.shape}/{scale.shape} does not match {n_features} features"
+                )
+            self.mean = mean
+            self.scale = scale
+
+    @property
+    def n_features(self) -> int:
+        return len(self.features)
+
+    def from_rows(self, rows: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """从行字典列表填充特征矩阵 [n_rows, n_features]"""
+        features = self.features
+        out = np.empty((len(rows), len(features)), dtype=self.dtype)
+        for i, row in enumerate(rows):
+            # 缺失键和None都会变成NaN，随后统一填充默认值
+            out[i] = [row.get(f) for f in features]
+        return self._finalize(out)
+
+    def from_columns(self, columns: Mapping[str, Sequence], n_rows: Optional[int] = None) -> np.ndarray:
+        """从列式数据（特征名 -> 列）填充特征矩阵，缺失的特征列使用默认值"""
+        if n_rows is None:
+            lengths = {len(columns[f]) for f in self.features if f in columns}
+            if len(lengths) > 1:
+                raise ValueError(f"Columns have inconsistent lengths: {sorted(lengths)}")
+            n_rows = lengths.pop() if lengths else 0
+
+        out = np.empty((n_rows, self.n_features), dtype=self.dtype)
+        for j, feature in enumerate(self.features):
+            column = columns.get(feature)
+            if column is None:
+                out[:, j] = self.defaults[j]
+            else:
+                out[:, j] = np.asarray(column, dtype=self.dtype)
+        return self._finalize(out)
+
+    def _finalize(self, out: np.ndarray) -> np.ndarray:
+        """原地填充缺失值并应用标准化"""
+        missing = np.isnan(out)
+        if missing.any():
+            np.copyto(out, np.broadcast_to(self.defaults, out.shape), where=missing)
+        if self.mean is not None:
+            out -= self.mean
+            out /= self.scale
+        return out
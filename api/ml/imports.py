@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+import logging
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# 本进程中按需导入的重量级模块及其首次导入耗时（毫秒）
+_import_ms: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def module_available(name: str) -> bool:
+    """只查找模块规格、不执行导入，判断可选依赖是否已安装"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(name: str) -> ModuleType:
+    """首次使用时导入模块，并记录导入耗时"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if name not in _import_ms:
+            _import_ms[name] = round(elapsed_ms, 1)
+            logger.info(f"Imported {name} in {elapsed_ms:.0f}ms")
+    return module
+
+
+def import_timings() -> Dict[str, float]:
+    """已按需导入的模块 -> 首次导入耗时（毫秒）"""
+    with _lock:
+        return dict(_import_ms)
@@ -0,0 +1,391 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import settings
+from ml.postprocess import apply_threshold, confidence, to_predictions
+
+logger = logging.getLogger(__name__)
+
+# 匹配滤波使用的箱形凌星宽度（网格点数）
+BOX_WIDTHS = (1, 2, 3, 5, 8, 13, 21)
+
+# MAD -> 高斯标准差
+MAD_SCALE = 1.4826
+
+# 补齐后每个 [B, L] 点在去趋势和检测中同时存在的工作数组（约12个float64）
+BYTES_PER_POINT = 8 * 12
+
+
+def pad_curves(curves: Sequence[Sequence[float]], times: Optional[Sequence[Optional[Sequence[float]]]] = None):
+    """把长度不一的曲线补齐为 [B, L] 数组，返回 (time, flux, valid)；缺少时间时按点序号计"""
+    n_curves = len(curves)
+    length = max((len(curve) for curve in curves), default=0)
+    flux = np.full((n_curves, length), np.nan)
+    time = np.tile(np.arange(length, dtype=np.float64), (n_curves, 1))
+    for i, curve in enumerate(curves):
+        flux[i, :len(curve)] = np.asarray(curve, dtype=np.float64)
+        if times is not None and times[i] is not None:
+            if len(times[i]) != len(curve):
+                raise ValueError(f"Curve {i}: time and flux lengths differ ({len(times[i])} != {len(curve)})")
+            time[i, :len(curve)] = np.asarray(times[i], dtype=np.float64)
+    valid = np.isfinite(flux) & np.isfinite(time)
+    return time, flux, valid
+
+
+def robust_sigma(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """逐行的MAD噪声估计 [B]，无有效点的行为NaN"""
+    masked = np.where(valid, values, np.nan)
+    with np.errstate(all="ignore"):
+        center = np.nanmedian(masked, axis=1, keepdims=True)
+        return MAD_SCALE * np.nanmedian(np.abs(masked - center), axis=1)
+
+
+def _moving_mean(values: np.ndarray, weights: np.ndarray, half_window: np.ndarray) -> np.ndarray:
+    """逐行半宽不同的加权滑动平均，前缀和实现，O(B·L)"""
+    n_curves, length = values.shape
+    zeros = np.zeros((n_curves, 1))
+    sums = np.concatenate([zeros, np.cumsum(values * weights, axis=1)], axis=1)
+    counts = np.concatenate([zeros, np.cumsum(weights, axis=1)], axis=1)
+    idx = np.arange(length)
+    lo = np.clip(idx - half_window[:, None], 0, length)
+    hi = np.clip(idx + half_window[:, None] + 1, 0, length)
+    total = np.take_along_axis(sums, hi, axis=1) - np.take_along_axis(sums, lo, axis=1)
+    count = np.take_along_axis(counts, hi, axis=1) - np.take_along_axis(counts, lo, axis=1)
+    with np.errstate(all="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def detrend(time: np.ndarray, flux: np.ndarray, valid: np.ndarray, window_days: float,
+            n_sigma: float = 5.0, iterations: int = 2):
+    """去趋势并做sigma裁剪，返回 (相对通量残差, 更新后的valid)
+
+    趋势为按点数计的滑动平均（窗口按每条曲线的中位采样间隔换算），第二轮起排除偏离
+    超过3σ的点（凌星不参与趋势估计）。只裁剪向上的离群点（耀斑、宇宙线），凌星变暗保留。
+    """
+    n_curves, length = flux.shape
+    with np.errstate(all="ignore"):
+        cadence = np.nanmedian(np.where(valid[:, 1:] & valid[:, :-1], np.diff(time, axis=1), np.nan), axis=1)
+    cadence = np.where(np.isfinite(cadence) & (cadence > 0), cadence, 1.0)
+    half_window = np.clip(np.round(window_days / cadence / 2).astype(np.intp), 1, max(length, 1))
+
+    values = np.where(valid, flux, 0.0)
+    weights = valid.astype(np.float64)
+    for _ in range(iterations):
+        trend = _moving_mean(values, weights, half_window)
+        residual = np.where(valid, flux / trend - 1.0, 0.0)
+        sigma = robust_sigma(residual, valid)[:, None]
+        weights = (valid & (np.abs(residual) < 3 * sigma)).astype(np.float64)
+    keep = valid & np.isfinite(residual) & (residual < n_sigma * sigma)
+    return np.where(keep, residual, 0.0), keep
+
+
+def bin_curves(coord: np.ndarray, values: np.ndarray, valid: np.ndarray, n_bins: int):
+    """把坐标已归一化到 [0, 1) 的点按等宽网格取均值，返回 (binned [B, n_bins], 点数 [B, n_bins], 点所在格子)"""
+    n_curves = values.shape[0]
+    bins = np.clip((coord * n_bins).astype(np.intp), 0, n_bins - 1)
+    flat = (np.arange(n_curves)[:, None] * n_bins + bins)[valid]
+    counts = np.bincount(flat, minlength=n_curves * n_bins).reshape(n_curves, n_bins)
+    sums = np.bincount(flat, weights=values[valid], minlength=n_curves * n_bins).reshape(n_curves, n_bins)
+    with np.errstate(all="ignore"):
+        binned = np.where(counts > 0, sums / counts, 0.0)
+    return binned, counts, bins
+
+
+def resample(time: np.ndarray, values: np.ndarray, valid: np.ndarray, n_bins: int):
+    """重采样到每条曲线自身时间跨度上的固定网格"""
+    masked = np.where(valid, time, np.nan)
+    with np.errstate(all="ignore"):
+        start = np.nanmin(masked, axis=1, keepdims=True)
+        span = np.nanmax(masked, axis=1, keepdims=True) - start
+    span = np.where(np.isfinite(span) & (span > 0), span, 1.0)
+    coord = np.where(valid, (time - np.nan_to_num(start)) / span, 0.0)
+    return bin_curves(np.minimum(coord, np.nextafter(1.0, 0.0)), values, valid, n_bins)
+
+
+def phase_fold(time: np.ndarray, values: np.ndarray, valid: np.ndarray, period: np.ndarray,
+               epoch: np.ndarray, n_bins: int):
+    """按周期折叠到 [-0.5, 0.5) 相位网格，凌星中心位于网格中央"""
+    phase = np.mod((time - epoch[:, None]) / period[:, None] + 0.5, 1.0)
+    return bin_curves(np.where(valid, phase, 0.0), values, valid, n_bins)
+
+
+def matched_filter(binned: np.ndarray, counts: np.ndarray, sigma: np.ndarray,
+                   widths: Sequence[int] = BOX_WIDTHS) -> Dict[str, np.ndarray]:
+    """箱形匹配滤波 - 对每个位置和宽度计算凌星信噪比 SNR = -Σflux / (σ·√n)
+
+    返回逐行最佳 snr/depth/width/center，以及逐网格点重要性（以该点为中心的最大SNR，按行归一化）。
+    """
+    n_curves, n_bins = binned.shape
+    zeros = np.zeros((n_curves, 1))
+    sums = np.concatenate([zeros, np.cumsum(binned * counts, axis=1)], axis=1)
+    points = np.concatenate([zeros, np.cumsum(counts, axis=1)], axis=1)
+    sigma = np.where(np.isfinite(sigma) & (sigma > 0), sigma, np.inf)[:, None]
+
+    best = np.full(n_curves, -np.inf)
+    best_depth = np.zeros(n_curves)
+    best_width = np.ones(n_curves, dtype=np.intp)
+    best_center = np.zeros(n_curves, dtype=np.intp)
+    importance = np.zeros((n_curves, n_bins))
+    rows = np.arange(n_curves)
+    for width in widths:
+        if width > n_bins:
+            break
+        total = sums[:, width:] - sums[:, :-width]
+        n_in = points[:, width:] - points[:, :-width]
+        with np.errstate(all="ignore"):
+            snr = np.where(n_in > 0, -total / (sigma * np.sqrt(n_in)), 0.0)
+        start = np.argmax(snr, axis=1)
+        peak = snr[rows, start]
+        better = peak > best
+        best = np.where(better, peak, best)
+        best_depth = np.where(better, -total[rows, start] / np.maximum(n_in[rows, start], 1), best_depth)
+        best_width = np.where(better, width, best_width)
+        best_center = np.where(better, start + width // 2, best_center)
+        # 窗口起点 = 中心 - width//2，把窗口SNR记到其中心网格点
+        offset = width // 2
+        importance[:, offset:offset + snr.shape[1]] = np.maximum(importance[:, offset:offset + snr.shape[1]], snr)
+
+    peak = importance.max(axis=1, keepdims=True)
+    with np.errstate(all="ignore"):
+        importance = np.where(peak > 0, importance / peak, 0.0)
+    return {
+        "snr": np.maximum(best, 0.0),
+        "depth": best_depth,
+        "width": best_width,
+        "center": best_center,
+        "importance": importance
+    }
+
+
+class CurvePipeline:
+    """光变曲线检测引擎 - 去趋势、sigma裁剪、重采样/相位折叠后做箱形匹配滤波，整批向量化
+
+    仓库中没有训练好的一维CNN权重，检测统计量使用匹配滤波SNR，
+    概率为 sigmoid((SNR - snr_threshold) / snr_scale)。已知周期的曲线在折叠网格上检测。
+    bls_workers>1 时引擎持有一个长期复用的BLS进程池，所有请求的周期搜索都提交到该池。
+    """
+
+    version = "curve-mf-v1"
+
+    def __init__(self, grid_points: int = 1024, fold_bins: int = 512, detrend_window_days: float = 1.0,
+                 sigma_clip: float = 5.0, snr_threshold: float = 7.1, snr_scale: float = 1.5,
+                 bls_workers: int = 1, batch_bytes: int = 256 * 2 ** 20):
+        from ml.bls import create_bls_pool
+
+        self.grid_points = grid_points
+        self.fold_bins = fold_bins
+        self.detrend_window_days = detrend_window_days
+        self.sigma_clip = sigma_clip
+        self.snr_threshold = snr_threshold
+        self.snr_scale = snr_scale
+        self.batch_bytes = batch_bytes
+        # 进程在首次提交周期块时才启动
+        self.bls_pool = create_bls_pool(bls_workers)
+
+    def close(self):
+        """关闭BLS进程池"""
+        if self.bls_pool is not None:
+            self.bls_pool.shutdown(wait=False, cancel_futures=True)
+            self.bls_pool = None
+
+    def _detect(self, time: np.ndarray, residual: np.ndarray, valid: np.ndarray, sigma: np.ndarray,
+                n_bins: int, period: Optional[np.ndarray] = None, epoch: Optional[np.ndarray] = None):
+        if period is None:
+            binned, counts, point_bins = resample(time, residual, valid, n_bins)
+        else:
+            binned, counts, point_bins = phase_fold(time, residual, valid, period, epoch, n_bins)
+        result = matched_filter(binned, counts, sigma)
+        # 网格重要性映射回原始时间点
+        result["point_importance"] = np.where(valid, np.take_along_axis(result["importance"], point_bins, axis=1), 0.0)
+        return result
+
+    def search_periods(self, curves, times, periods, epochs, search) -> List[Optional[Dict[str, float]]]:
+        """对需要搜索且未提供周期的曲线运行BLS，用找到的周期/历元替换折叠参数，返回各曲线的候选特征"""
+        from ml.bls import bls_search, candidate_features
+
+        candidates: List[Optional[Dict[str, float]]] = [None] * len(curves)
+        for i in range(len(curves)):
+            if not search[i] or periods[i]:
+                continue
+            time = times[i] if times is not None and times[i] is not None else np.arange(len(curves[i]))
+            try:
+                result = bls_search(
+                    time, curves[i],
+                    min_period=settings.bls_min_period,
+                    max_period=settings.bls_max_period,
+                    bin_days=settings.bls_bin_days,
+                    oversample=settings.bls_oversample,
+                    max_periods=settings.bls_max_periods,
+                    chunk_bytes=settings.bls_chunk_mb * 2 ** 20,
+                    pool=self.bls_pool,
+                    detrend_window_days=self.detrend_window_days
+                )
+            except ValueError as e:
+                # 曲线太短等情况下不做折叠，仍按全局视图检测
+                logger.warning(f"Period search skipped for curve {i}: {e}")
+                continue
+            periods[i], epochs[i] = result["period"], result["epoch"]
+            candidates[i] = candidate_features(result)
+        return candidates
+    
+    def run(self, curves: Sequence[Sequence[float]], times: Optional[Sequence[Optional[Sequence[float]]]] = None,
+            periods: Optional[Sequence[Optional[float]]] = None,
+            epochs: Optional[Sequence[Optional[float]]] = None,
+            search: Optional[Sequence[bool]] = None,
+            time_offsets: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """整批处理曲线，返回列式结果：probs_array [B, 2]、检测参数和逐点重要性
+
+        search[i] 为真且未提供周期时，先用BLS搜索周期，再在折叠网格上检测。
+        time_offsets[i] 非零时 times[i] 是相对该基准的时间（曲线存储中的 float32 列），
+        历元在内部换算为相对时间，返回的候选历元仍为绝对时间。
+        """
+        n_curves = len(curves)
+        offsets = np.zeros(n_curves) if time_offsets is None else np.asarray(time_offsets, dtype=np.float64)
+        periods = list(periods or [None] * n_curves)
+        epochs = [None if e is None else e - offsets[i] for i, e in enumerate(epochs or [None] * n_curves)]
+        candidates = self.search_periods(curves, times, periods, epochs, search) if search and any(search) \
+            else [None] * n_curves
+        for i, candidate in enumerate(candidates):
+            if candidate is not None:
+                candidate["koi_time0bk"] += offsets[i]
+        period = np.array([p if p else np.nan for p in periods], dtype=np.float64)
+        epoch = np.array([e or 0.0 for e in epochs], dtype=np.float64)
+        folded = np.isfinite(period) & (period > 0)
+        snr, depth = np.zeros(n_curves), np.zeros(n_curves)
+        importance: List[Optional[np.ndarray]] = [None] * n_curves
+        for rows in self._batches([len(curve) for curve in curves]):
+            detection = self._detect_rows([curves[i] for i in rows],
+                                          None if times is None else [times[i] for i in rows],
+                                          period[rows], epoch[rows], folded[rows])
+            snr[rows], depth[rows] = detection["snr"], detection["depth"]
+            for j, i in enumerate(rows):
+                importance[i] = detection["point_importance"][j, :len(curves[i])]
+
+        with np.errstate(over="ignore"):
+            planet = 1.0 / (1.0 + np.exp(-(snr - self.snr_threshold) / self.snr_scale))
+        return {
+            "probs_array": np.column_stack([planet, 1.0 - planet]),
+            "snr": snr,
+            "depth": depth,
+            "folded": folded,
+            "candidates": candidates,
+            "importance": importance
+        }
+
+    def _batches(self, lengths: Sequence[int]) -> List[np.ndarray]:
+        """按长度排序后把曲线分成若干批，每批补齐后的 [B, L] 工作数组不超过 batch_bytes
+
+        补齐到批内最长曲线，长短混合的整批会按最长曲线分配内存；排序后长度相近的曲线同批，
+        峰值内存由 batch_bytes 决定（单条曲线超过预算时单独成批）。
+        """
+        order = np.argsort(lengths, kind="stable")
+        batches, start = [], 0
+        for end in range(1, len(order) + 1):
+            # order 按长度升序，批内最长的是最后一条
+            if end - start > 1 and (end - start) * max(lengths[order[end - 1]], 1) * BYTES_PER_POINT > self.batch_bytes:
+                batches.append(order[start:end - 1])
+                start = end - 1
+        if start < len(order):
+            batches.append(order[start:])
+        return batches
+
+    def _detect_rows(self, curves, times, period: np.ndarray, epoch: np.ndarray, folded: np.ndarray):
+        """一批曲线的去趋势和检测；folded 的行在相位折叠网格上检测，其余在全局重采样网格上检测"""
+        time, flux, valid = pad_curves(curves, times)
+        residual, valid = detrend(time, flux, valid, self.detrend_window_days, self.sigma_clip)
+        sigma = robust_sigma(residual, valid)
+
+        detection = self._detect(time, residual, valid, sigma, self.grid_points)
+        folded_rows = np.flatnonzero(folded)
+        if folded_rows.size:
+            result = self._detect(time[folded_rows], residual[folded_rows], valid[folded_rows], sigma[folded_rows],
+                                  self.fold_bins, period[folded_rows], epoch[folded_rows])
+            for key in ("snr", "depth", "width", "center", "point_importance"):
+                detection[key][folded_rows] = result[key]
+        return detection
+
+    def predict(self, curves: Sequence[Sequence[float]], thresholds, times=None, periods=None, epochs=None,
+                object_ids: Optional[Sequence[str]] = None, search=None, time_offsets=None) -> List[Dict[str, Any]]:
+        """整批预测并转换为 ExoplanetPrediction 字典（带逐点 importance 和检测参数）"""
+        result = self.run(curves, times, periods, epochs, search, time_offsets)
+        probs_array = result["probs_array"]
+        if object_ids is None:
+            object_ids = [f"CURVE-{i+1}" for i in range(len(curves))]
+        predictions = to_predictions(object_ids, apply_threshold(probs_array, thresholds),
+                                     confidence(probs_array), self.version, raw_probs=probs_array)
+        for i, prediction in enumerate(predictions):
+            prediction["importance"] = np.round(result["importance"][i], 4).tolist()
+            prediction["detection"] = {
+                "snr": float(result["snr"][i]),
+                "depth": float(result["depth"][i]),
+                "folded": bool(result["folded"][i]),
+                **(result["candidates"][i] or {})
+            }
+        return predictions
+
+
+# 进程级曲线引擎（无模型文件，按配置创建）
+_pipeline: Optional[CurvePipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_curve_pipeline() -> CurvePipeline:
+    """获取本进程的光变曲线检测引擎"""
+    global _pipeline
+    if _pipeline is None:
+        from ml.bls import default_workers
+
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = CurvePipeline(
+                    grid_points=settings.curve_grid_points,
+                    fold_bins=settings.curve_fold_bins,
+                    detrend_window_days=settings.curve_detrend_window_days,
+                    sigma_clip=settings.curve_sigma_clip,
+                    snr_threshold=settings.curve_snr_threshold,
+                    snr_scale=settings.curve_snr_scale,
+                    bls_workers=default_workers(settings.bls_workers),
+                    batch_bytes=settings.curve_batch_mb * 2 ** 20
+                )
+    return _pipeline
+
+
+def shutdown_curve_pipeline():
+    """释放本进程的光变曲线检测引擎（关闭BLS进程池）"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.close()
+            _pipeline = None
+
+
+def load_stored_curves(curves, times, curve_ids):
+    """把 curve_id 引用替换为曲线存储中的 np.memmap 列（不经过JSON解析），返回 (curves, times, time_offsets)
+
+    时间列保持文件中的 float32 相对时间，基准单独返回，由检测引擎换算历元；
+    各列在补齐为批数组时才读取并转换一次。
+    """
+    if not curve_ids or not any(curve_ids):
+        return curves, times, None
+    from services.curve_store import get_curve_store
+
+    store = get_curve_store()
+    curves, times = list(curves), list(times or [None] * len(curves))
+    time_offsets = [0.0] * len(curves)
+    for i, curve_id in enumerate(curve_ids):
+        if curve_id:
+            stored = store.open(curve_id)
+            curves[i] = stored["flux"]
+            times[i] = stored["time"]
+            time_offsets[i] = stored["time_offset"]
+    return curves, times, time_offsets
+
+
+def predict_curves(curves, thresholds, times=None, periods=None, epochs=None, object_ids=None,
+                   search=None, curve_ids=None) -> List[Dict[str, Any]]:
+    """批量曲线预测的便捷函数（可在推理进程池中调用；curve_ids 中的曲线在工作进程内映射读取）"""
+    curves, times, time_offsets = load_stored_curves(curves, times, curve_ids)
+    return get_curve_pipeline().predict(curves, thresholds, times, periods, epochs, object_ids, search, time_offsets)
@@ -0,0 +1,241 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+from ml.model_service import ModelService
+
+logger = logging.getLogger(__name__)
+
+# MinIO中每个模型版本占用 models/<版本>/ 前缀，目录内文件与本地模型目录相同
+MODELS_PREFIX = "models/"
+
+
+class ModelVersionNotFoundError(ValueError):
+    """请求的模型版本不存在"""
+
+
+def create_minio_client():
+    """按配置创建MinIO客户端（注册表和训练进程共用）"""
+    from minio import Minio
+
+    return Minio(
+        settings.minio_endpoint,
+        access_key=settings.minio_access_key,
+        secret_key=settings.minio_secret_key,
+        secure=settings.minio_secure
+    )
+
+
+def publish_model_version(client, bucket: str, local_dir: str, version: str) -> int:
+    """把本地模型目录上传到 models/<版本>/，返回上传的文件数"""
+    uploaded = 0
+    for path in sorted(Path(local_dir).iterdir()):
+        if path.is_file():
+            client.fput_object(bucket, f"{MODELS_PREFIX}{version}/{path.name}", str(path))
+            uploaded += 1
+    logger.info(f"Published model version {version} ({uploaded} files) to {bucket}/{MODELS_PREFIX}{version}/")
+    return uploaded
+
+
+def _has_model(path: Path) -> bool:
+    return path.is_dir() and any(path.glob("best_model.*"))
+
+
+class ModelRegistry:
+    """多版本模型注册表 - 同时持有多个已加载的模型，新版本在后台加载预热后原子切换为默认版本
+
+    版本来源：model_path 下随镜像发布的模型、training_output_dir 下训练产出的 <job_id> 目录，
+    以及（source="minio" 时）MinIO models/ 前缀下的各版本（首次使用时下载到本地缓存目录）。
+    正在执行的请求持有旧的 ModelService 引用，切换默认版本不会影响它们。
+    """
+
+    def __init__(self, base_dir: str, versions_dir: Optional[str] = None, source: str = "local",
+                 client=None, bucket: Optional[str] = None, cache_dir: Optional[str] = None,
+                 max_loaded: int = 3, default_version: Optional[str] = None):
+        if source not in ("local", "minio"):
+            raise ValueError(f"Unsupported model registry source: {source}")
+        self.base_dir = Path(base_dir)
+        self.versions_dir = Path(versions_dir) if versions_dir else None
+        self.source = source
+        self.client = client
+        self.bucket = bucket
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_loaded = max(1, max_loaded)
+        self.base_version = ModelService.read_version(self.base_dir) if _has_model(self.base_dir) else None
+        self._default = default_version or self.base_version
+        self._models: Dict[str, ModelService] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def default_version(self) -> Optional[str]:
+        return self._default
+
+    def available(self) -> Dict[str, str]:
+        """可加载的版本 -> 来源位置（本地目录或MinIO前缀）"""
+        versions = {}
+        if self.base_version is not None:
+            versions[self.base_version] = str(self.base_dir)
+        if self.versions_dir is not None and self.versions_dir.is_dir():
+            for path in sorted(self.versions_dir.iterdir()):
+                if _has_model(path):
+                    versions[path.name] = str(path)
+        if self.source == "minio":
+            for obj in self.client.list_objects(self.bucket, prefix=MODELS_PREFIX):
+                if obj.is_dir:
+                    version = obj.object_name[len(MODELS_PREFIX):].strip("/")
+                    versions.setdefault(version, f"{self.bucket}/{obj.object_name}")
+        return versions
+
+    def resolve(self, version: Optional[str] = None) -> str:
+        """把请求中的版本（None表示默认版本）解析为具体版本号，不存在时抛出 ModelVersionNotFoundError"""
+        version = version or self._default
+        if version is None:
+            raise ModelVersionNotFoundError("No model version available")
+        if version not in self._models and version not in self.available():
+            raise ModelVersionNotFoundError(f"Model version not found: {version}")
+        return version
+
+    def _local_dir(self, version: str) -> Path:
+        """版本对应的本地模型目录，MinIO中的版本先完整下载到缓存目录再原子改名"""
+        if version == self.base_version:
+            return self.base_dir
+        if self.versions_dir is not None and _has_model(self.versions_dir / version):
+            return self.versions_dir / version
+        if self.source != "minio":
+            raise ModelVersionNotFoundError(f"Model version not found: {version}")
+
+        target = self.cache_dir / version
+        if _has_model(target):
+            return target
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        prefix = f"{MODELS_PREFIX}{version}/"
+        staging = Path(tempfile.mkdtemp(prefix=f".{version}-", dir=self.cache_dir))
+        try:
+            for obj in self.client.list_objects(self.bucket, prefix=prefix):
+                if not obj.is_dir:
+                    self.client.fget_object(self.bucket, obj.object_name, str(staging / obj.object_name[len(prefix):]))
+            if not _has_model(staging):
+                raise ModelVersionNotFoundError(f"Model version not found: {version}")
+            try:
+                os.replace(staging, target)
+            except OSError:
+                # 其他进程已下载同一版本
+                if not _has_model(target):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Downloaded model version {version} to {target}")
+        return target
+
+    def load(self, version: str, warm_up_rows: int = 0) -> ModelService:
+        """加载（并可选预热）一个版本；已加载时直接返回，同一版本的并发加载只执行一次"""
+        with self._lock:
+            service = self._models.get(version)
+            if service is not None:
+                self._last_used[version] = time.monotonic()
+                return service
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+
+        with load_lock:
+            service = self._models.get(version)
+            if service is not None:
+                return service
+            started = time.perf_counter()
+            service = ModelService(str(self._local_dir(version)), version=version)
+            if warm_up_rows > 0:
+                service.warm_up(warm_up_rows)
+            logger.info(f"Model version {version} loaded in {(time.perf_counter() - started) * 1000:.0f}ms")
+            with self._lock:
+                self._models[version] = service
+                self._loaded_at[version] = time.time()
+                self._last_used[version] = time.monotonic()
+                self._evict()
+        return service
+
+    def _evict(self):
+        """超出 max_loaded 时释放最久未使用的非默认版本（调用方持有锁）"""
+        while len(self._models) > self.max_loaded:
+            candidates = [v for v in self._models if v != self._default]
+            if not candidates:
+                return
+            oldest = min(candidates, key=lambda v: self._last_used.get(v, 0.0))
+            del self._models[oldest]
+            self._loaded_at.pop(oldest, None)
+            self._last_used.pop(oldest, None)
+            logger.info(f"Unloaded model version {oldest}")
+
+    def get(self, version: Optional[str] = None) -> ModelService:
+        """获取指定版本（默认版本）的模型服务，未加载的版本按需加载"""
+        version = version or self._default
+        if version is None:
+            raise ModelVersionNotFoundError("No model version available")
+        with self._lock:
+            service = self._models.get(version)
+            if service is not None:
+                self._last_used[version] = time.monotonic()
+                return service
+        return self.load(self.resolve(version))
+
+    def activate(self, version: str, warm_up_rows: int = 0) -> ModelService:
+        """后台加载并预热新版本，完成后原子切换默认版本；加载失败时默认版本保持不变"""
+        service = self.load(self.resolve(version), warm_up_rows)
+        with self._lock:
+            previous, self._default = self._default, version
+            self._last_used[version] = time.monotonic()
+            self._evict()
+        logger.info(f"Default model version switched: {previous} -> {version}")
+        return service
+
+    def describe(self) -> Dict[str, Any]:
+        """注册表状态：默认版本、已加载版本和可加载版本"""
+        available = self.available()
+        with self._lock:
+            loaded = {
+                version: {
+                    "model_type": service.model_type,
+                    "backend": service.backend,
+                    "n_features": len(service.features or []),
+                    "loaded_at": self._loaded_at.get(version)
+                }
+                for version, service in self._models.items()
+            }
+        return {
+            "default": self._default,
+            "source": self.source,
+            "loaded": loaded,
+            "available": sorted(set(available) | set(loaded))
+        }
+
+
+# 进程级注册表 - 所有接口、推理工作线程和评分任务共享
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """获取本进程的模型注册表（单例，按配置创建）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                minio = settings.model_registry_source == "minio"
+                _registry = ModelRegistry(
+                    settings.model_path,
+                    versions_dir=settings.training_output_dir,
+                    source=settings.model_registry_source,
+                    client=create_minio_client() if minio else None,
+                    bucket=settings.minio_bucket_models,
+                    cache_dir=settings.model_cache_dir,
+                    max_loaded=settings.model_registry_max_loaded,
+                    default_version=settings.model_default_version or None
+                )
+    return _registry
@@ -1,44 +1,61 @@
-import os
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
-# 尝试导入机器学习库
-try:
-    import catboost as cb
-    CATBOOST_AVAILABLE = True
-except ImportError:
-    CATBOOST_AVAILABLE = False
+from config import settings
+from ml.explainer import BatchExplainer
+from ml.features import FeatureLayout
+from ml.imports import lazy_import, module_available
+from ml.oblivious import ObliviousTreeEnsemble, ObliviousTreeShap
+from ml.postprocess import apply_threshold, confidence, to_predictions
 
-try:
-    import lightgbm as lgb
-    LIGHTGBM_AVAILABLE = True
-except ImportError:
-    LIGHTGBM_AVAILABLE = False
-
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
+# 机器学习库只在加载对应格式的模型时导入
+CATBOOST_AVAILABLE = module_available("catboost")
+LIGHTGBM_AVAILABLE = module_available("lightgbm")
 
 logger = logging.getLogger(__name__)
 
 
+def resolve_object_id(row: Dict[str, Any], index: int) -> str:
+    """从原始输入数据中获取object_id或kepoi_name（这些字段不参与模型训练）"""
+    return (row.get('kepoi_name') or
+            row.get('object_id') or
+            row.get('target_name') or
+            f"TARGET-{index+1}")
+
+
 class ModelService:
     """模型服务类 - 加载和管理训练好的模型"""
     
-    def __init__(self, models_dir: str = "models"):
+    def __init__(self, models_dir: str = "models", version: Optional[str] = None):
         self.models_dir = Path(models_dir)
         self.model = None
         self.features = None
         self.scaler_params = None
         self.model_type = None
+        self.version = version or self.read_version(self.models_dir)
+        self.explainer = None
+        self.layout = None
+        self.predictor = None  # 概率预测后端：编译后的对称树评估器或模型本身
+        self.backend = None
         self._load_model()
     
+    @staticmethod
+    def read_version(models_dir: Path) -> str:
+        """模型目录的版本号：训练产物的 metadata.json 记录了任务ID，随镜像发布的模型为 v1.0.0"""
+        metadata_file = Path(models_dir) / "metadata.json"
+        if metadata_file.exists():
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+            version = metadata.get("version") or metadata.get("job_id")
+            if version:
+                return str(version)
+        return "v1.0.0"
+    
     def _load_model(self):
         """加载模型和相关配置文件"""
         try:
@@ -54,6 +71,7 @@ class ModelService:
             if model_file.suffix == '.cbm':
                 if not CATBOOST_AVAILABLE:
                     raise ImportError("CatBoost not available. Please install: pip install catboost")
+                cb = lazy_import("catboost")
                 self.model = cb.CatBoostClassifier()
                 self.model.load_model(str(model_file))
                 self.model_type = "catboost"
@@ -62,12 +80,16 @@ class ModelService:
             elif model_file.suffix in ['.txt', '.model']:
                 if not LIGHTGBM_AVAILABLE:
                     raise ImportError("LightGBM not available. Please install: pip install lightgbm")
+                lgb = lazy_import("lightgbm")
                 self.model = lgb.Booster(model_file=str(model_file))
                 self.model_type = "lightgbm"
                 logger.info("Loaded LightGBM model")
             else:
                 raise ValueError(f"Unsupported model format: {model_file.suffix}")
             
+            # 批量SHAP解释引擎（解释器随模型只构建一次）
+            self.explainer = BatchExplainer(self.model, self.model_type, self._get_model_feature_names())
+            
             # 加载特征列表
             features_file = self.models_dir / "features.json"
             if features_file.exists():
@@ -110,11 +132,74 @@ class ModelService:
             else:
                 logger.warning("scaler_params.json not found, using identity scaling")
                 self.scaler_params = None
+            
+            # 预编译特征布局：特征索引、默认值和标准化参数只计算一次
+            self.layout = FeatureLayout(
+                self.features,
+                mean=self.scaler_params['mean'] if self.scaler_params else None,
+                scale=self.scaler_params['scale'] if self.scaler_params else None,
+                dtype=settings.feature_dtype
+            )
+            self._select_backend()
                 
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             raise
     
+    def _select_backend(self):
+        """选择预测和解释后端：CatBoost模型编译为NumPy对称树评估器/精确TreeSHAP，并在合成批次上与参考实现比对"""
+        self.predictor, self.backend = self.model, self.model_type
+        use_compiled = settings.inference_backend == "compiled"
+        use_tree_shap = settings.explainer_backend == "oblivious"
+        if self.model_type != "catboost" or not (use_compiled or use_tree_shap):
+            return
+        try:
+            compiled = ObliviousTreeEnsemble.from_catboost(self.model)
+        except Exception as e:
+            logger.warning(f"Cannot compile CatBoost model, using CatBoost predict_proba and shap: {e}")
+            return
+        feature_data = self._synthetic_batch(256)
+        
+        if use_compiled:
+            max_diff = float(np.abs(compiled.predict_proba(feature_data) - self.model.predict_proba(feature_data)).max())
+            if max_diff <= settings.compiled_backend_tolerance:
+                self.predictor, self.backend = compiled, "compiled"
+                logger.info(
+                    f"Compiled {compiled.n_trees} oblivious trees (depth {compiled.depth}, "
+                    f"{len(compiled.split_features)} splits), max diff vs CatBoost {max_diff:.1e}"
+                )
+            else:
+                logger.warning(f"Compiled backend disagrees with CatBoost (max diff {max_diff:.2e}), not using it")
+        
+        if use_tree_shap:
+            try:
+                started = time.perf_counter()
+                tree_shap = ObliviousTreeShap(compiled)
+                build_ms = (time.perf_counter() - started) * 1000
+                cb = lazy_import("catboost")
+                reference = self.model.get_feature_importance(cb.Pool(feature_data[:64]), type="ShapValues")
+                reference = reference[:, 0, :-1] if reference.ndim == 3 else reference[:, :-1]
+                max_diff = float(np.abs(tree_shap.shap_values(feature_data[:64])[:, :, 0] - reference).max())
+            except Exception as e:
+                logger.warning(f"Oblivious TreeSHAP unavailable, using shap.TreeExplainer: {e}")
+                return
+            if max_diff > settings.compiled_backend_tolerance:
+                logger.warning(f"Oblivious TreeSHAP disagrees with CatBoost (max diff {max_diff:.2e}), not using it")
+                return
+            self.explainer.tree_shap = tree_shap
+            logger.info(f"Precomputed per-leaf SHAP contributions in {build_ms:.0f}ms, max diff {max_diff:.1e}")
+    
+    def _synthetic_batch(self, n_rows: int) -> np.ndarray:
+        """按标准化参数生成的合成特征批次（用于预热和后端校验）"""
+        layout = self.layout
+        rng = np.random.default_rng(0)
+        mean = layout.mean if layout.mean is not None else np.zeros(layout.n_features)
+        scale = layout.scale if layout.scale is not None else np.ones(layout.n_features)
+        synthetic = mean + scale * rng.standard_normal((n_rows, layout.n_features))
+        return self._prepare_columns(
+            {feature: synthetic[:, j] for j, feature in enumerate(layout.features)}, n_rows
+        )
+    
     def _get_default_features(self) -> List[str]:
         """获取默认特征列表"""
         return [
@@ -174,7 +259,15 @@ class ModelService:
         return mapped_rows
     
     def _prepare_features(self, rows: List[Dict[str, Any]]) -> np.ndarray:
-        """准备特征数据"""
+        """准备特征数据（基于预编译特征布局，直接填充NumPy矩阵）"""
+        return self.layout.from_rows(rows)
+    
+    def _prepare_columns(self, columns: Dict[str, Any], n_rows: Optional[int] = None) -> np.ndarray:
+        """从列式数据准备特征数据"""
+        return self.layout.from_columns(columns, n_rows)
+    
+    def _prepare_features_dataframe(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """准备特征数据（旧的DataFrame路径，保留用于基准对比）"""
         # 转换为DataFrame
         df = pd.DataFrame(rows)
         
@@ -194,153 +287,103 @@ class ModelService:
         
         return feature_data
     
-    def _get_feature_importance(self, top_k: int = 5) -> List[List]:
-        """获取全局特征重要性"""
+    def _get_model_feature_names(self) -> List[str]:
+        """获取模型内部的特征名称"""
+        if self.model_type == "lightgbm":
+            return self.model.feature_name()
+        elif self.model_type == "catboost":
+            return self.model.feature_names_
+        return []
+    
+    def _get_default_sample_shap(self) -> List[List]:
+        """SHAP不可用时的默认样本SHAP值"""
+        return [
+            ['depth_ppm', 0.15],
+            ['snr', -0.08],
+            ['period', 0.12],
+            ['duration_hr', -0.05],
+            ['teff', 0.03]
+        ]
+    
+    def _get_shap_matrix(self, feature_data: np.ndarray) -> Optional[np.ndarray]:
+        """计算整个批次的SHAP矩阵，失败时返回None"""
         try:
-            if self.model_type == "catboost":
-                # CatBoost内置特征重要性
-                importance = self.model.get_feature_importance(prettified=True)
-                # 转换为所需格式 [feature, importance]
-                return [[row['Feature Id'], float(row['Importances'])] for row in importance[:top_k]]
-            
-            elif self.model_type == "lightgbm":
-                # LightGBM特征重要性
-                importance = self.model.feature_importance(importance_type='gain')
-                feature_names = self.model.feature_name()
-                # 排序并取前top_k
-                importance_pairs = list(zip(feature_names, importance))
-                importance_pairs.sort(key=lambda x: x[1], reverse=True)
-                return [[name, float(imp)] for name, imp in importance_pairs[:top_k]]
-            
-            else:
-                # 返回默认重要性（模拟）
-                return [
-                    ['depth_ppm', 0.31],
-                    ['snr', 0.22],
-                    ['period', 0.17],
-                    ['duration_hr', 0.12],
-                    ['teff', 0.08]
-                ]
-                
+            if not self.explainer.available:
+                logger.warning(f"SHAP not available for model type: {self.model_type}")
+                return None
+            return self.explainer.shap_matrix(feature_data)
         except Exception as e:
-            logger.warning(f"Failed to get feature importance: {str(e)}")
-            # 返回默认重要性
-            return [
-                ['depth_ppm', 0.31],
-                ['snr', 0.22],
-                ['period', 0.17],
-                ['duration_hr', 0.12],
-                ['teff', 0.08]
-            ]
+            logger.warning(f"Failed to calculate SHAP values: {str(e)}")
+            return None
     
-    def _get_shap_values(self, feature_data: np.ndarray, top_k: int = 5) -> List[List]:
-        """计算SHAP值"""
+    def _get_top_k_shap(self, feature_data: np.ndarray, top_k: int = 5) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """每行前top_k个SHAP特征 (索引, 值)，失败时返回None"""
         try:
-            if not SHAP_AVAILABLE:
-                logger.warning("SHAP not available, using feature importance instead")
-                return self._get_feature_importance(top_k)
-            
-            # 创建SHAP解释器
-            if self.model_type == "lightgbm":
-                explainer = shap.TreeExplainer(self.model)
-            elif self.model_type == "catboost":
-                explainer = shap.TreeExplainer(self.model)
-            else:
-                logger.warning(f"SHAP not supported for model type: {self.model_type}")
-                return self._get_feature_importance(top_k)
-            
-            # 计算SHAP值
-            shap_values = explainer.shap_values(feature_data)
-            
-            # 如果是多分类，取第一个类别的SHAP值
-            if isinstance(shap_values, list):
-                shap_values = shap_values[0]  # 取第一个类别
-            
-            # 计算平均绝对SHAP值
-            mean_shap = np.mean(np.abs(shap_values), axis=0)
-            
-            # 获取特征名称
-            if self.model_type == "lightgbm":
-                feature_names = self.model.feature_name()
-            elif self.model_type == "catboost":
-                feature_names = self.model.feature_names_
-            else:
-                feature_names = [f"feature_{i}" for i in range(len(mean_shap))]
-            
-            # 排序并取前top_k
-            importance_pairs = list(zip(feature_names, mean_shap))
-            importance_pairs.sort(key=lambda x: x[1], reverse=True)
-            
-            return [[name, float(imp)] for name, imp in importance_pairs[:top_k]]
-            
+            if not self.explainer.available:
+                logger.warning(f"SHAP not available for model type: {self.model_type}")
+                return None
+            return self.explainer.top_k_for(feature_data, top_k)
         except Exception as e:
             logger.warning(f"Failed to calculate SHAP values: {str(e)}")
-            return self._get_feature_importance(top_k)
+            return None
     
-    def _get_sample_shap_values(self, feature_data: np.ndarray, sample_idx: int = 0, top_k: int = 5) -> List[List]:
-        """计算单个样本的SHAP值"""
-        try:
-            if not SHAP_AVAILABLE:
-                logger.warning("SHAP not available, using default values")
-                return [
-                    ['depth_ppm', 0.15],
-                    ['snr', -0.08],
-                    ['period', 0.12],
-                    ['duration_hr', -0.05],
-                    ['teff', 0.03]
-                ]
-            
-            # 创建SHAP解释器
-            if self.model_type == "lightgbm":
-                explainer = shap.TreeExplainer(self.model)
-            elif self.model_type == "catboost":
-                explainer = shap.TreeExplainer(self.model)
+    def _get_batch_shap_values(self, feature_data: np.ndarray, top_k: int = 5) -> List[List[List]]:
+        """批量计算每个样本的前top_k个SHAP值（一次SHAP计算 + 向量化排序）"""
+        top = self._get_top_k_shap(feature_data, top_k)
+        if top is None:
+            return [self._get_default_sample_shap() for _ in range(feature_data.shape[0])]
+        return self.explainer.format_top_k(*top)
+    
+    def _predict_probabilities(self, feature_data: np.ndarray) -> np.ndarray:
+        """预测并归一化类别概率 [n_samples, n_classes]"""
+        if self.model_type == "catboost":
+            probabilities = self.predictor.predict_proba(feature_data)
+            # CatBoost返回 [n_samples, n_classes] 格式
+            if probabilities.shape[1] == 2:
+                # 二分类情况，直接使用二分类结果
+                probs_array = probabilities
+            elif probabilities.shape[1] >= 3:
+                probs_array = probabilities[:, :3]  # 取前3个类别
             else:
-                return [
-                    ['depth_ppm', 0.15],
-                    ['snr', -0.08],
-                    ['period', 0.12],
-                    ['duration_hr', -0.05],
-                    ['teff', 0.03]
-                ]
-            
-            # 计算SHAP值
-            shap_values = explainer.shap_values(feature_data)
-            
-            # 如果是多分类，取第一个类别的SHAP值
-            if isinstance(shap_values, list):
-                shap_values = shap_values[0]
-            
-            # 获取单个样本的SHAP值
-            sample_shap = shap_values[sample_idx]
-            
-            # 获取特征名称
-            if self.model_type == "lightgbm":
-                feature_names = self.model.feature_name()
-            elif self.model_type == "catboost":
-                feature_names = self.model.feature_names_
+                # 如果类别数不足，填充
+                probs_array = np.zeros((probabilities.shape[0], 3))
+                probs_array[:, :probabilities.shape[1]] = probabilities
+        
+        elif self.model_type == "lightgbm":
+            probabilities = self.model.predict(feature_data)
+            # 直接使用模型输出，不进行额外转换
+            if probabilities.ndim == 1:
+                # 二分类情况，直接使用二分类结果
+                probs_array = np.column_stack([
+                    probabilities,      # 正例概率
+                    1 - probabilities   # 负例概率
+                ])
             else:
-                feature_names = [f"feature_{i}" for i in range(len(sample_shap))]
-            
-            # 按绝对值排序并取前top_k
-            importance_pairs = list(zip(feature_names, sample_shap))
-            importance_pairs.sort(key=lambda x: abs(x[1]), reverse=True)
-            
-            return [[name, float(shap_val)] for name, shap_val in importance_pairs[:top_k]]
-            
-        except Exception as e:
-            logger.warning(f"Failed to calculate sample SHAP values: {str(e)}")
-            return [
-                ['depth_ppm', 0.15],
-                ['snr', -0.08],
-                ['period', 0.12],
-                ['duration_hr', -0.05],
-                ['teff', 0.03]
-            ]
+                # 多分类情况
+                probs_array = probabilities
+        
+        # 归一化概率
+        probs_array = probs_array / probs_array.sum(axis=1, keepdims=True)
+        return probs_array
+    
+    def _threshold_columns(self, probs_array: np.ndarray, threshold) -> Dict[str, np.ndarray]:
+        """根据阈值对整个批次构建概率列（threshold可以是标量或逐行数组）"""
+        return apply_threshold(probs_array, threshold)
     
     def predict_tabular(self, rows: List[Dict[str, Any]], threshold: float = 0.5) -> Dict[str, Any]:
         """表格数据预测"""
+        return self.predict_tabular_many([(rows, threshold)])[0]
+    
+    def predict_tabular_many(self, requests: List[Tuple[List[Dict[str, Any]], float]]) -> List[Dict[str, Any]]:
+        """将多个 (rows, threshold) 请求合并为一次模型调用，并按请求拆分结果"""
         try:
+            # 合并所有请求的行，记录每行的阈值及其在原请求中的位置
+            rows = [row for request_rows, _ in requests for row in request_rows]
+            thresholds = [threshold for request_rows, threshold in requests for _ in request_rows]
+            local_index = [i for request_rows, _ in requests for i in range(len(request_rows))]
+            if not rows:
+                return [{"predictions": []} for _ in requests]
+            
             # 如果模型使用的是KOI特征，但输入是简化特征，进行映射
             if self.features and len(self.features) > 10:  # KOI特征通常有40+个
                 # 模型期望KOI特征，但输入可能是简化特征
@@ -355,135 +398,109 @@ class ModelService:
             feature_data = self._prepare_features(mapped_rows)
             
             # 预测概率
-            if self.model_type == "catboost":
-                probabilities = self.model.predict_proba(feature_data)
-                # CatBoost返回 [n_samples, n_classes] 格式
-                if probabilities.shape[1] == 2:
-                    # 二分类情况，直接使用二分类结果
-                    probs_array = probabilities
-                elif probabilities.shape[1] >= 3:
-                    probs_array = probabilities[:, :3]  # 取前3个类别
-                else:
-                    # 如果类别数不足，填充
-                    probs_array = np.zeros((probabilities.shape[0], 3))
-                    probs_array[:, :probabilities.shape[1]] = probabilities
-            
-            elif self.model_type == "lightgbm":
-                probabilities = self.model.predict(feature_data)
-                # 直接使用模型输出，不进行额外转换
-                if probabilities.ndim == 1:
-                    # 二分类情况，直接使用二分类结果
-                    probs_array = np.column_stack([
-                        probabilities,      # 正例概率
-                        1 - probabilities   # 负例概率
-                    ])
-                else:
-                    # 多分类情况
-                    probs_array = probabilities
+            probs_array = self._predict_probabilities(feature_data)
             
-            # 归一化概率
-            probs_array = probs_array / probs_array.sum(axis=1, keepdims=True)
+            # 一次性计算整个批次的样本级SHAP值
+            batch_shap_values = self._get_batch_shap_values(feature_data)
             
-            # 计算全局SHAP值（用于全局重要性）
-            global_shap_values = self._get_shap_values(feature_data)
+            # 根据阈值构建概率列，置信度为最大概率（整批列式计算，只在输出时转为字典）
+            prob_columns = self._threshold_columns(probs_array, thresholds)
+            confs = confidence(probs_array)
+            object_ids = [resolve_object_id(rows[i], local_index[i]) for i in range(len(rows))]
             
-            # 构建预测结果
-            predictions = []
-            for i, prob_row in enumerate(probs_array):
-                # 根据模型输出类别数构建概率字典
-                if prob_row.shape[0] == 2:
-                    # 二分类模型 - 根据阈值调整分类结果
-                    positive_prob = float(prob_row[0])
-                    negative_prob = float(prob_row[1])
-                    
-                    # 根据阈值动态调整概率分布
-                    # 高阈值: 更倾向于确认行星 (NEGATIVE概率增加)
-                    # 低阈值: 更倾向于候选行星 (POSITIVE概率增加)
-                    
-                    # 使用阈值作为权重调整概率
-                    threshold_weight = threshold
-                    
-                    # 调整后的概率
-                    adjusted_positive = positive_prob * (1 + threshold_weight) / (1 + threshold)
-                    adjusted_negative = negative_prob * (1 + (1 - threshold_weight)) / (2 - threshold)
-                    
-                    # 归一化
-                    total = adjusted_positive + adjusted_negative
-                    adjusted_positive /= total
-                    adjusted_negative /= total
-                    
-                    # 根据阈值分配CONF和PC概率
-                    if threshold > 0.5:
-                        # 高阈值：更多确认为确认行星
-                        conf_prob = adjusted_positive * threshold
-                        pc_prob = adjusted_positive * (1 - threshold)
-                    else:
-                        # 低阈值：更多确认为候选行星
-                        conf_prob = adjusted_positive * threshold
-                        pc_prob = adjusted_positive * (1 - threshold)
-                    
-                    probs = {
-                        "POSITIVE": adjusted_positive,
-                        "NEGATIVE": adjusted_negative,
-                        "CONF": conf_prob,
-                        "PC": pc_prob,
-                        "FP": 0.0
-                    }
-                else:
-                    # 多分类模型，保持原有格式
-                    probs = {
-                        "CONF": float(prob_row[0]),
-                        "PC": float(prob_row[1]),
-                        "FP": float(prob_row[2]) if len(prob_row) > 2 else 0.0
-                    }
-                
-                # 计算置信度（最大概率）
-                conf = float(np.max(prob_row))
-                
-                # 获取该样本的SHAP值
-                sample_shap_values = self._get_sample_shap_values(feature_data, i)
-                
-                # 从原始输入数据中获取object_id或kepoi_name（这些字段不参与模型训练）
-                original_row = rows[i] if i < len(rows) else {}
-                object_id = (original_row.get('kepoi_name') or 
-                           original_row.get('object_id') or 
-                           original_row.get('target_name') or 
-                           f"TARGET-{i+1}")
-                
-                prediction = {
-                    "object_id": object_id,
-                    "probs": probs,
-                    "conf": conf,
-                    "version": "v1.0.0",
-                    "explain": {
-                        "tabular": {
-                            "shap": sample_shap_values  # 使用样本级SHAP值
-                        }
-                    }
-                }
-                predictions.append(prediction)
+            # 构建预测结果，附带阈值调整前的概率供之后按新阈值重算
+            predictions = to_predictions(object_ids, prob_columns, confs, self.version,
+                                         shap=batch_shap_values, raw_probs=probs_array)
             
-            return {"predictions": predictions}
+            # 按原请求拆分结果
+            results = []
+            offset = 0
+            for request_rows, _ in requests:
+                results.append({"predictions": predictions[offset:offset + len(request_rows)]})
+                offset += len(request_rows)
+            return results
             
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
             raise
+    
+    def warm_up(self, n_rows: int = 64) -> Dict[str, float]:
+        """用合成批次跑一遍 predict_proba 和SHAP解释器，把惰性初始化的成本留在启动阶段"""
+        feature_data = self._synthetic_batch(n_rows)
+        
+        started = time.perf_counter()
+        self._predict_probabilities(feature_data)
+        predict_ms = (time.perf_counter() - started) * 1000
+        
+        started = time.perf_counter()
+        self._get_shap_matrix(feature_data)
+        explain_ms = (time.perf_counter() - started) * 1000
+        
+        logger.info(f"Model warm-up on {n_rows} rows: predict {predict_ms:.0f}ms, explain {explain_ms:.0f}ms")
+        return {"rows": n_rows, "predict_ms": round(predict_ms, 1), "explain_ms": round(explain_ms, 1)}
+    
+    def predict_columns(self, columns: Dict[str, Any], threshold: float = 0.5,
+                        object_ids: Optional[List[str]] = None, top_k: int = 5) -> Dict[str, Any]:
+        """列式批量预测 - 输入为 特征名 -> 列，输出同样为列式数组，不创建逐行对象"""
+        feature_data = self._prepare_columns(columns)
+        n_rows = feature_data.shape[0]
+        if object_ids is None:
+            object_ids = [f"TARGET-{i+1}" for i in range(n_rows)]
+        
+        if n_rows == 0:
+            probs_array = np.zeros((0, 2))
+        else:
+            probs_array = self._predict_probabilities(feature_data)
+        
+        if n_rows:
+            top = self._get_top_k_shap(feature_data, top_k)
+        else:
+            top = self.explainer.top_k_indices(np.zeros((0, self.layout.n_features)), top_k)
+        if top is not None:
+            shap_idx, shap_values = top
+            shap_features = np.asarray(self.explainer.feature_names, dtype=object)[shap_idx]
+        else:
+            default_shap = self._get_default_sample_shap()
+            shap_features = np.tile(np.array([name for name, _ in default_shap], dtype=object), (n_rows, 1))
+            shap_values = np.tile(np.array([value for _, value in default_shap]), (n_rows, 1))
+        
+        return {
+            "object_id": object_ids,
+            "version": self.version,
+            "probs": self._threshold_columns(probs_array, threshold),
+            "conf": confidence(probs_array),
+            "shap_features": shap_features,
+            "shap_values": shap_values
+        }
 
 
-# 全局模型服务实例
-_model_service = None
+def get_model_service(version: Optional[str] = None) -> ModelService:
+    """获取指定版本（默认版本）的模型服务 - 每个进程一个注册表，所有接口和推理工作线程共享"""
+    from ml.model_registry import get_model_registry
+    return get_model_registry().get(version)
 
-def get_model_service() -> ModelService:
-    """获取模型服务实例（单例模式）"""
-    global _model_service
-    if _model_service is None:
-        # 优先使用环境变量，否则使用相对路径
-        models_dir = os.getenv('MODEL_PATH', 'models')
-        _model_service = ModelService(models_dir)
-    return _model_service
+
+def warm_up_model_service(n_rows: Optional[int] = None, version: Optional[str] = None) -> Dict[str, float]:
+    """加载并预热本进程的模型服务（也用作推理进程池的初始化函数）"""
+    n_rows = settings.model_warmup_rows if n_rows is None else n_rows
+    service = get_model_service(version)
+    return service.warm_up(n_rows) if n_rows > 0 else {}
 
 
 def predict_tabular(rows: List[Dict[str, Any]], threshold: float = 0.5) -> Dict[str, Any]:
     """预测表格数据的便捷函数"""
     model_service = get_model_service()
     return model_service.predict_tabular(rows, threshold)
+
+
+def predict_tabular_many(requests: List[Tuple[List[Dict[str, Any]], float]]) -> List[Dict[str, Any]]:
+    """批量预测多个请求的便捷函数"""
+    model_service = get_model_service()
+    return model_service.predict_tabular_many(requests)
+
+
+def predict_columns(columns: Dict[str, Any], threshold: float = 0.5,
+                    object_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """列式批量预测的便捷函数"""
+    model_service = get_model_service()
+    return model_service.predict_columns(columns, threshold, object_ids)
@@ -0,0 +1,293 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedModelError(ValueError):
+    """模型结构无法编译为对称树评估器（非对称树、类别特征等）"""
+
+
+class ObliviousTreeEnsemble:
+    """CatBoost对称树（oblivious tree）的NumPy评估器
+
+    对称树每一层所有节点使用同一个分裂条件，叶子下标就是各层比较结果拼成的二进制数。
+    加载时把模型展开为扁平数组：所有不重复的 (特征, 阈值) 分裂、每棵树每层引用的分裂编号、
+    扁平叶子值表。推理时先一次性二值化全部分裂，再按位拼出叶子下标并聚合叶子值，
+    不需要构造CatBoost Pool，单行延迟只剩几次向量化运算。
+    """
+
+    def __init__(self, split_features: np.ndarray, split_borders: np.ndarray, tree_splits: np.ndarray,
+                 leaf_values: np.ndarray, scale: float = 1.0, bias=0.0, loss: str = "Logloss",
+                 n_features: int = 0, nan_as_max: np.ndarray = None, leaf_weights: np.ndarray = None,
+                 block_rows: int = 4096):
+        self.split_features = np.asarray(split_features, dtype=np.intp)  # [n_splits]
+        self.split_borders = np.asarray(split_borders, dtype=np.float32)  # [n_splits]
+        self.tree_splits = np.asarray(tree_splits, dtype=np.intp)  # [n_trees, depth]，-1 表示该层不存在
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float64)  # [n_trees, 2**depth, dimension]
+        # 训练样本落在各叶子上的权重（TreeSHAP需要的节点覆盖度）
+        self.leaf_weights = None if leaf_weights is None else np.asarray(leaf_weights, dtype=np.float64)
+        self.scale = float(scale)
+        self.bias = np.atleast_1d(np.asarray(bias, dtype=np.float64))
+        self.loss = loss
+        self.n_features = n_features
+        self.nan_as_max = np.zeros(n_features, dtype=bool) if nan_as_max is None else np.asarray(nan_as_max, bool)
+        self.block_rows = block_rows
+
+        n_trees, depth = self.tree_splits.shape
+        self.depth = depth
+        self.dimension = self.leaf_values.shape[2]
+        # 补齐的层引用一个恒为0的虚拟分裂，叶子下标不受影响
+        self._tree_splits = np.where(self.tree_splits >= 0, self.tree_splits, len(self.split_features))
+        self._leaf_offsets = (np.arange(n_trees, dtype=np.intp) * (1 << depth))[:, None]
+        self._flat_leaves = self.leaf_values.reshape(n_trees * (1 << depth), self.dimension)
+        self._borders_column = self.split_borders[:, None]
+        self._nan_as_max_features = np.flatnonzero(self.nan_as_max)
+
+    @property
+    def n_trees(self) -> int:
+        return self.tree_splits.shape[0]
+
+    @classmethod
+    def from_catboost(cls, model) -> "ObliviousTreeEnsemble":
+        """从已加载的CatBoost模型导出JSON并编译"""
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            model.save_model(path, format="json")
+            with open(path, "r") as f:
+                return cls.from_json(json.load(f))
+        finally:
+            os.remove(path)
+
+    @classmethod
+    def from_json(cls, model_json: Dict[str, Any]) -> "ObliviousTreeEnsemble":
+        """从CatBoost JSON模型编译"""
+        if "oblivious_trees" not in model_json:
+            raise UnsupportedModelError("Only symmetric (oblivious) trees are supported")
+        features_info = model_json.get("features_info", {})
+        if features_info.get("categorical_features") or features_info.get("text_features") \
+                or features_info.get("embedding_features"):
+            raise UnsupportedModelError("Only float features are supported")
+        float_features = features_info.get("float_features", [])
+        n_features = max((f["flat_feature_index"] for f in float_features), default=-1) + 1
+        column = {f["feature_index"]: f["flat_feature_index"] for f in float_features}
+        nan_as_max = np.zeros(n_features, dtype=bool)
+        for f in float_features:
+            # nan_mode=Max 的特征导出为 AsTrue：NaN 大于所有阈值；AsFalse/AsIs 时比较结果为假
+            nan_as_max[f["flat_feature_index"]] = f.get("nan_value_treatment") == "AsTrue"
+
+        trees = model_json["oblivious_trees"]
+        depth = max((len(tree["splits"]) for tree in trees), default=0)
+        dimension = max(1, len(trees[0]["leaf_values"]) >> len(trees[0]["splits"])) if trees else 1
+
+        split_ids: Dict[tuple, int] = {}
+        tree_splits = np.full((len(trees), depth), -1, dtype=np.intp)
+        leaf_values = np.zeros((len(trees), 1 << depth, dimension), dtype=np.float64)
+        leaf_weights = np.zeros((len(trees), 1 << depth), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            for d, split in enumerate(tree["splits"]):
+                if split.get("split_type", "FloatFeature") != "FloatFeature":
+                    raise UnsupportedModelError(f"Unsupported split type: {split['split_type']}")
+                key = (column[split["float_feature_index"]], float(np.float32(split["border"])))
+                tree_splits[t, d] = split_ids.setdefault(key, len(split_ids))
+            n_leaves = 1 << len(tree["splits"])
+            values = np.asarray(tree["leaf_values"], dtype=np.float64).reshape(n_leaves, dimension)
+            # 较浅的树在补齐层上的比较结果恒为0，只会落在前 n_leaves 个叶子
+            leaf_values[t, :n_leaves] = values
+            if "leaf_weights" in tree:
+                leaf_weights[t, :n_leaves] = tree["leaf_weights"]
+
+        splits = sorted(split_ids.items(), key=lambda item: item[1])
+        scale, bias = model_json.get("scale_and_bias", [1.0, [0.0]])
+        loss = model_json.get("model_info", {}).get("params", {}).get("loss_function", {}).get("type", "Logloss")
+        return cls(
+            split_features=[feature for (feature, _), _ in splits],
+            split_borders=[border for (_, border), _ in splits],
+            tree_splits=tree_splits, leaf_values=leaf_values, scale=scale, bias=bias, loss=loss,
+            n_features=n_features, nan_as_max=nan_as_max,
+            leaf_weights=leaf_weights if all("leaf_weights" in tree for tree in trees) else None
+        )
+
+    def leaf_index(self, X: np.ndarray) -> np.ndarray:
+        """每棵树命中的叶子在扁平叶子表中的下标 [n_trees, n_rows]"""
+        # 按 [特征/分裂, 行] 布局计算，按分裂编号取整行是连续内存拷贝
+        # CatBoost在float32上做二值化，这里保持一致以免阈值附近的取值落到另一侧
+        columns = np.ascontiguousarray(X.T, dtype=np.float32)
+        if self._nan_as_max_features.size:
+            nan_rows = columns[self._nan_as_max_features]
+            nan_rows[np.isnan(nan_rows)] = np.inf
+            columns[self._nan_as_max_features] = nan_rows
+        bins = np.zeros((len(self.split_features) + 1, X.shape[0]), dtype=np.uint8)
+        np.greater(columns[self.split_features], self._borders_column, out=bins[:-1], casting="unsafe")
+
+        # 每层的比较结果左移到对应的位，拼出 [n_trees, n_rows] 的叶子下标
+        leaf_index = np.repeat(self._leaf_offsets, X.shape[0], axis=1)
+        for d in range(self.depth):
+            leaf_index |= bins[self._tree_splits[:, d]].astype(np.intp) << d
+        return leaf_index
+
+    def _raw_block(self, X: np.ndarray) -> np.ndarray:
+        leaf_index = self.leaf_index(X)
+        return np.stack([
+            np.take(self._flat_leaves[:, k], leaf_index).sum(axis=0) for k in range(self.dimension)
+        ], axis=1)
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        """原始预测值 [n_rows, dimension]（scale * 叶子值之和 + bias），按块计算以限制中间数组大小"""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] < self.n_features:
+            raise ValueError(f"Expected a 2D matrix with {self.n_features} columns, got shape {X.shape}")
+        raw = np.empty((X.shape[0], self.dimension), dtype=np.float64)
+        for start in range(0, X.shape[0], self.block_rows):
+            stop = start + self.block_rows
+            raw[start:stop] = self._raw_block(X[start:stop])
+        raw *= self.scale
+        raw += self.bias
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """类别概率，与 CatBoostClassifier.predict_proba 的列顺序一致"""
+        raw = self.predict_raw(X)
+        if self.dimension == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw -= raw.max(axis=1, keepdims=True)
+        np.exp(raw, out=raw)
+        raw /= raw.sum(axis=1, keepdims=True)
+        return raw
+
+
+class ObliviousTreeShap:
+    """对称树的精确路径依赖TreeSHAP（与 CatBoost ShapValues / shap.TreeExplainer 一致）
+
+    对称树中，给定已知特征子集时的条件期望只取决于样本落入的叶子（各层比较结果），
+    因此每棵树每个叶子上各特征的SHAP贡献都可以在加载时预计算：
+    对树内不重复的特征（最多 depth 个）枚举全部子集，按覆盖度自底向上求条件期望，
+    再按Shapley权重求和。推理时与预测一样只需定位叶子并聚合预计算的贡献。
+    CatBoost把最后一个分裂作为根节点，这里按同样的顺序计算覆盖度。
+    """
+
+    def __init__(self, ensemble: ObliviousTreeEnsemble, block_rows: int = 1024):
+        if ensemble.leaf_weights is None:
+            raise UnsupportedModelError("Model has no leaf weights, cannot compute path-dependent SHAP")
+        self.ensemble = ensemble
+        self.n_features = ensemble.n_features
+        self.block_rows = block_rows
+
+        depth = ensemble.depth
+        n_leaves = 1 << depth
+        level_features = np.where(
+            ensemble.tree_splits >= 0, ensemble.split_features[np.maximum(ensemble.tree_splits, 0)], -1
+        )
+        pair_trees, pair_features, pair_tables = [], [], []
+        expected = np.zeros(ensemble.dimension)
+        # 中间数组约为 n_trees * 4**depth * depth，按树分块控制内存
+        chunk = max(1, (1 << 22) // (n_leaves * n_leaves * max(depth, 1) * ensemble.dimension))
+        for start in range(0, ensemble.n_trees, chunk):
+            stop = min(start + chunk, ensemble.n_trees)
+            slots, slot_features = self._tree_slots(level_features[start:stop])
+            values = self._conditional_values(
+                ensemble.leaf_values[start:stop], ensemble.leaf_weights[start:stop], depth
+            )
+            expected += values[:, 0, 0].sum(axis=0)
+            phi = self._shapley(values, slots, slot_features, depth)
+            for t, u in zip(*np.nonzero(slot_features >= 0)):
+                pair_trees.append(start + t)
+                pair_features.append(slot_features[t, u])
+                pair_tables.append(phi[t, :, u])
+
+        # 按特征排序，推理时用 reduceat 把同一特征的各树贡献相加
+        order = np.argsort(pair_features, kind="stable")
+        self._pair_trees = np.asarray(pair_trees, dtype=np.intp)[order]
+        pair_features = np.asarray(pair_features, dtype=np.intp)[order]
+        self._features, self._starts = np.unique(pair_features, return_index=True)
+        tables = np.asarray(pair_tables, dtype=np.float64).reshape(len(pair_trees), n_leaves, ensemble.dimension)
+        self._tables = (tables[order] * ensemble.scale).reshape(-1, ensemble.dimension)
+        self._pair_offsets = (np.arange(len(pair_trees), dtype=np.intp) * n_leaves)[:, None]
+        self._tree_offsets = (np.arange(ensemble.n_trees, dtype=np.intp) * n_leaves)[:, None]
+        self.expected_value = expected * ensemble.scale + ensemble.bias
+
+    @staticmethod
+    def _tree_slots(level_features: np.ndarray):
+        """每层的特征在该树不重复特征中的编号 [n_trees, depth]（补齐层为-1），以及各编号对应的全局特征"""
+        n_trees, depth = level_features.shape
+        slots = np.full((n_trees, depth), -1, dtype=np.intp)
+        slot_features = np.full((n_trees, depth), -1, dtype=np.intp)
+        for t in range(n_trees):
+            unique = [f for f in dict.fromkeys(level_features[t].tolist()) if f >= 0]
+            slot_features[t, :len(unique)] = unique
+            for d, f in enumerate(level_features[t].tolist()):
+                if f >= 0:
+                    slots[t, d] = unique.index(f)
+        return slots, slot_features
+
+    @staticmethod
+    def _conditional_values(leaf_values: np.ndarray, leaf_weights: np.ndarray, depth: int) -> np.ndarray:
+        """已知层集合 K（按层的位掩码）下的条件期望 [n_trees, 2**depth(K), 2**depth(叶子), dimension]"""
+        n_trees, n_leaves, dimension = leaf_values.shape
+        masks = np.arange(n_leaves)
+        values = np.broadcast_to(leaf_values[:, None], (n_trees, n_leaves, n_leaves, dimension)).copy()
+        # 根节点是最后一层：第 level 层的父节点由更高层的比较结果决定
+        for level in range(depth):
+            hi, lo = n_leaves >> (level + 1), 1 << level
+            weights = leaf_weights.reshape(n_trees, hi, 2, lo)
+            child = weights.sum(axis=3, keepdims=True)
+            parent = child.sum(axis=2, keepdims=True)
+            ratio = np.divide(child, parent, out=np.zeros_like(child), where=parent > 0)
+            grouped = values.reshape(n_trees, n_leaves, hi, 2, lo, dimension)
+            averaged = (grouped * ratio[:, None, :, :, :, None]).sum(axis=3, keepdims=True)
+            averaged = np.broadcast_to(averaged, grouped.shape).reshape(values.shape)
+            unknown = (masks >> level) & 1 == 0
+            values[:, unknown] = averaged[:, unknown]
+        return values
+
+    @staticmethod
+    def _shapley(values: np.ndarray, slots: np.ndarray, slot_features: np.ndarray, depth: int) -> np.ndarray:
+        """按不重复特征的Shapley权重求和，得到每个叶子上各特征编号的贡献 [n_trees, 2**depth, depth, dimension]"""
+        from math import factorial
+
+        n_trees, n_leaves = values.shape[:2]
+        subsets = np.arange(n_leaves)  # 特征编号子集的位掩码
+        # 特征编号子集 -> 已知层的位掩码
+        level_masks = np.zeros((n_trees, n_leaves), dtype=np.intp)
+        for d in range(depth):
+            in_subset = (subsets[None, :] >> np.maximum(slots[:, d:d + 1], 0)) & 1 == 1
+            level_masks |= np.where(in_subset & (slots[:, d:d + 1] >= 0), 1 << d, 0)
+        n_unique = (slot_features >= 0).sum(axis=1)
+        sizes = np.array([bin(m).count("1") for m in subsets])
+        coef = np.zeros((depth + 1, depth + 1))
+        for u in range(1, depth + 1):
+            for size in range(u):
+                coef[u, size] = factorial(size) * factorial(u - size - 1) / factorial(u)
+
+        tree_idx = np.arange(n_trees)[:, None]
+        phi = np.zeros((n_trees, n_leaves, depth, values.shape[3]))
+        for u in range(depth):
+            valid = ((subsets[None, :] >> u) & 1 == 0) & (subsets[None, :] < (1 << n_unique)[:, None])
+            valid &= (u < n_unique)[:, None]
+            weight = np.where(valid, coef[n_unique[:, None], sizes[None, :]], 0.0)
+            with_u = values[tree_idx, level_masks[:, subsets | (1 << u)]]
+            without_u = values[tree_idx, level_masks]
+            phi[:, :, u] = np.einsum("ts,tsld->tld", weight, with_u - without_u)
+        return phi
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """每行每个特征的SHAP值 [n_rows, n_features, dimension]（原始预测值空间）"""
+        X = np.asarray(X)
+        out = np.zeros((X.shape[0], self.n_features, self.ensemble.dimension))
+        for start in range(0, X.shape[0], self.block_rows):
+            stop = start + self.block_rows
+            out[start:stop, self._features] = self._block(X[start:stop])
+        return out
+
+    def _block(self, X: np.ndarray) -> np.ndarray:
+        """一个行块中出现过的特征的SHAP值 [n_rows, n_used_features, dimension]"""
+        leaves = self.ensemble.leaf_index(X) - self._tree_offsets
+        contributions = self._tables[leaves[self._pair_trees] + self._pair_offsets]
+        return np.add.reduceat(contributions, self._starts, axis=0).transpose(1, 0, 2)
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 二分类概率的正类列（POSITIVE，即KOI的 CONFIRMED，训练标签0）；阈值、评估指标都以此列为正类分数
+POSITIVE_COLUMN = 0
+
+
+def apply_threshold(probs_array: np.ndarray, threshold) -> Dict[str, np.ndarray]:
+    """根据阈值对整个批次构建概率列（threshold可以是标量或逐行数组），纯数组运算"""
+    threshold = np.asarray(threshold, dtype=np.float64)
+    n_samples = probs_array.shape[0]
+    if probs_array.shape[1] == 2:
+        # 二分类模型 - 根据阈值调整分类结果
+        positive_prob = probs_array[:, POSITIVE_COLUMN]
+        negative_prob = probs_array[:, 1 - POSITIVE_COLUMN]
+
+        # 根据阈值动态调整概率分布
+        # 高阈值: 更倾向于确认行星 (NEGATIVE概率增加)
+        # 低阈值: 更倾向于候选行星 (POSITIVE概率增加)
+        adjusted_positive = positive_prob * (1 + threshold) / (1 + threshold)
+        adjusted_negative = negative_prob * (1 + (1 - threshold)) / (2 - threshold)
+
+        # 归一化
+        total = adjusted_positive + adjusted_negative
+        adjusted_positive = adjusted_positive / total
+        adjusted_negative = adjusted_negative / total
+
+        # 根据阈值分配CONF和PC概率
+        return {
+            "POSITIVE": adjusted_positive,
+            "NEGATIVE": adjusted_negative,
+            "CONF": adjusted_positive * threshold,
+            "PC": adjusted_positive * (1 - threshold),
+            "FP": np.zeros(n_samples)
+        }
+
+    # 多分类模型，保持原有格式
+    return {
+        "CONF": probs_array[:, 0],
+        "PC": probs_array[:, 1],
+        "FP": probs_array[:, 2] if probs_array.shape[1] > 2 else np.zeros(n_samples)
+    }
+
+
+def confidence(probs_array: np.ndarray) -> np.ndarray:
+    """置信度为每行的最大概率（与阈值无关）"""
+    return probs_array.max(axis=1) if probs_array.shape[0] else np.zeros(0)
+
+
+def to_predictions(object_ids: Sequence[str], prob_columns: Dict[str, np.ndarray], conf: np.ndarray,
+                   version: str, shap: Optional[Sequence[List[List]]] = None,
+                   raw_probs: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """列式结果 -> 预测字典列表；只在需要逐行输出（序列化、缓存）时调用
+
+    每列只做一次 tolist()，raw_probs 是阈值调整前的概率，用于之后按新阈值重算。
+    """
+    names = list(prob_columns)
+    prob_rows = zip(*[np.asarray(prob_columns[name]).tolist() for name in names])
+    raw_rows = raw_probs.tolist() if raw_probs is not None else None
+    predictions = []
+    for i, (object_id, probs, row_conf) in enumerate(zip(object_ids, prob_rows, np.asarray(conf).tolist())):
+        prediction = {
+            "object_id": object_id,
+            "probs": dict(zip(names, probs)),
+            "conf": row_conf,
+            "version": version,
+        }
+        if shap is not None:
+            prediction["explain"] = {"tabular": {"shap": shap[i]}}
+        if raw_rows is not None:
+            prediction["raw_probs"] = raw_rows[i]
+        predictions.append(prediction)
+    return predictions
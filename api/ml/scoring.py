@@ -0,0 +1,118 @@
+import logging
+import os
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ml.columnar import ID_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ("parquet", "csv")
+REPORT_CONTENT_TYPES = {"parquet": "application/vnd.apache.parquet", "csv": "text/csv"}
+
+
+class ScoringInputError(ValueError):
+    """数据集不能用于批量评分（缺少特征列、报告格式不支持等）"""
+
+
+def iter_dataset_chunks(client, bucket: str, object_key: str, columns: Sequence[str],
+                        chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """从MinIO按块读取数据集，只保留 columns 中存在的列
+
+    Parquet副本按行组随机读取投影列；CSV按流读取，内存占用只与块大小有关。
+    """
+    wanted = set(columns)
+    if object_key.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        from services.dataset_converter import MinioObjectFile
+
+        parquet_file = pq.ParquetFile(MinioObjectFile(client, bucket, object_key))
+        present = [name for name in parquet_file.schema_arrow.names if name in wanted]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=present):
+            yield batch.to_pandas()
+        return
+
+    response = client.get_object(bucket, object_key)
+    try:
+        reader = pd.read_csv(
+            response, comment="#", encoding="utf-8-sig", usecols=lambda name: name in wanted,
+            chunksize=chunk_rows, low_memory=False
+        )
+        for chunk in reader:
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def chunk_to_columns(chunk: pd.DataFrame, features: Sequence[str], offset: int):
+    """DataFrame块 -> (特征列字典, 目标ID列表)，非数值内容按缺失值处理"""
+    columns = {
+        name: pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=np.float64)
+        for name in features if name in chunk.columns
+    }
+    for name in ID_COLUMNS:
+        if name in chunk.columns:
+            ids = chunk[name].astype(object).where(chunk[name].notna(), None).tolist()
+            object_ids = [value if value else f"TARGET-{offset + i + 1}" for i, value in enumerate(ids)]
+            break
+    else:
+        object_ids = [f"TARGET-{offset + i + 1}" for i in range(len(chunk))]
+    return columns, object_ids
+
+
+def result_to_frame(result: Dict[str, Any]) -> pd.DataFrame:
+    """predict_columns 的列式结果 -> 报告表（每个概率一列，top-k SHAP展开为 shap_feature_i / shap_value_i）"""
+    frame = {"object_id": result["object_id"]}
+    for label, values in result["probs"].items():
+        frame[f"prob_{label.lower()}"] = np.asarray(values, dtype=np.float64)
+    frame["conf"] = np.asarray(result["conf"], dtype=np.float64)
+    shap_features = np.asarray(result["shap_features"], dtype=object)
+    shap_values = np.asarray(result["shap_values"], dtype=np.float64)
+    for k in range(shap_features.shape[1] if shap_features.ndim == 2 else 0):
+        frame[f"shap_feature_{k + 1}"] = shap_features[:, k].astype(str)
+        frame[f"shap_value_{k + 1}"] = shap_values[:, k]
+    return pd.DataFrame(frame)
+
+
+class ReportWriter:
+    """按块追加写入评分报告（Parquet或CSV）"""
+
+    def __init__(self, path: str, fmt: str, metadata: Optional[Dict[str, str]] = None):
+        if fmt not in REPORT_FORMATS:
+            raise ScoringInputError(f"Unsupported report format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.metadata = metadata or {}
+        self.rows = 0
+        self._writer = None
+
+    def write(self, frame: pd.DataFrame):
+        if self.fmt == "csv":
+            frame.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                schema = table.schema.with_metadata({**(table.schema.metadata or {}), **self.metadata})
+                self._writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+            self._writer.write_table(table.cast(self._writer.schema))
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is None and not os.path.exists(self.path):
+            # 空数据集也产出一个合法的空报告
+            self.write(pd.DataFrame({"object_id": pd.Series([], dtype=object)}))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
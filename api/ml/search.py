@@ -0,0 +1,243 @@
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from ml.postprocess import POSITIVE_COLUMN
+
+try:
+    import optuna
+    from optuna.trial import TrialState
+    OPTUNA_AVAILABLE = True
+except ImportError:
+    OPTUNA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PRUNERS = ("median", "hyperband", "none")
+
+
+def suggest_catboost_params(trial) -> Dict[str, Any]:
+    """与notebook中 train_CatBoost 相同的搜索空间"""
+    return {
+        "iterations": trial.suggest_int("iterations", 100, 1000),
+        "learning_rate": trial.suggest_float("learning_rate", 1e-3, 0.3, log=True),
+        "depth": trial.suggest_int("depth", 4, 10),
+        "l2_leaf_reg": trial.suggest_float("l2_leaf_reg", 1, 10),
+        "random_strength": trial.suggest_float("random_strength", 1e-3, 10, log=True),
+        "bagging_temperature": trial.suggest_float("bagging_temperature", 0, 1),
+        "border_count": trial.suggest_int("border_count", 32, 255),
+    }
+
+
+def suggest_lgbm_params(trial) -> Dict[str, Any]:
+    """与notebook中 train_LGBM 相同的搜索空间"""
+    return {
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.1, log=True),
+        "num_leaves": trial.suggest_int("num_leaves", 31, 255),
+        "max_depth": trial.suggest_int("max_depth", -1, 12),
+        "min_child_samples": trial.suggest_int("min_child_samples", 10, 100),
+        "subsample": trial.suggest_float("subsample", 0.6, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.6, 1.0),
+        "reg_lambda": trial.suggest_float("reg_lambda", 1e-3, 10.0, log=True),
+        "reg_alpha": trial.suggest_float("reg_alpha", 1e-3, 10.0, log=True),
+        "n_estimators": 5000,
+    }
+
+
+SEARCH_SPACES: Dict[str, Callable] = {
+    "catboost": suggest_catboost_params,
+    "lgbm": suggest_lgbm_params,
+}
+
+
+def _fit_predict(model_type: str, params: Dict[str, Any], X_train, y_train, X_val, y_val,
+                 threads: int, early_stopping_rounds: int) -> np.ndarray:
+    """训练单折模型并返回验证集正类概率"""
+    if model_type == "catboost":
+        from catboost import CatBoostClassifier, Pool
+
+        model = CatBoostClassifier(**params, thread_count=threads, allow_writing_files=False, verbose=False)
+        model.fit(
+            Pool(X_train, y_train),
+            eval_set=Pool(X_val, y_val),
+            early_stopping_rounds=early_stopping_rounds,
+            use_best_model=True
+        )
+    else:
+        import lightgbm as lgb
+
+        model = lgb.LGBMClassifier(
+            **params, objective="binary", random_state=42, n_jobs=threads, verbosity=-1
+        )
+        model.fit(
+            X_train, y_train,
+            eval_set=[(X_val, y_val)],
+            eval_metric="auc",
+            callbacks=[lgb.early_stopping(stopping_rounds=early_stopping_rounds, verbose=False)]
+        )
+    return model.predict_proba(X_val)[:, POSITIVE_COLUMN]
+
+
+def cv_objective(trial, model_type: str, X: np.ndarray, y: np.ndarray, n_folds: int = 5,
+                 threads: int = 1, early_stopping_rounds: int = 200,
+                 fixed_params: Optional[Dict[str, Any]] = None) -> float:
+    """分层K折平均PR-AUC；每折结束上报累计均值，供剪枝器提前终止差的试验"""
+    from sklearn.metrics import average_precision_score
+    from sklearn.model_selection import StratifiedKFold
+
+    params = {**SEARCH_SPACES[model_type](trial), **(fixed_params or {})}
+    skf = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    scores = []
+    for fold, (tr_idx, va_idx) in enumerate(skf.split(X, y)):
+        proba = _fit_predict(
+            model_type, params, X[tr_idx], y[tr_idx], X[va_idx], y[va_idx], threads, early_stopping_rounds
+        )
+        scores.append(average_precision_score(y[va_idx] == POSITIVE_COLUMN, proba))
+        trial.report(float(np.mean(scores)), fold)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return float(np.mean(scores))
+
+
+def make_pruner(name: str, n_folds: int):
+    """中位数剪枝或Hyperband剪枝（资源单位为已完成的折数）"""
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=n_folds, reduction_factor=3)
+    if name == "none":
+        return optuna.pruners.NopPruner()
+    raise ValueError(f"Unsupported pruner: {name}")
+
+
+def make_storage(url: Optional[str], heartbeat_interval: int = 60, grace_period: Optional[int] = None):
+    """共享的研究存储；SQLite需要较长的锁等待时间以支持多进程并发写入
+
+    运行中的试验按 heartbeat_interval 写入心跳，超过 grace_period（默认两个心跳间隔）没有心跳的
+    RUNNING 试验视为其进程已中断：标记为失败，并由 RetryFailedTrialCallback 以相同参数重新排队。
+    其他启动器中仍在运行的试验持续更新心跳，不会被误判。
+    """
+    if url is None:
+        return optuna.storages.InMemoryStorage()
+    engine_kwargs = {"connect_args": {"timeout": 60}} if url.startswith("sqlite") else {}
+    return optuna.storages.RDBStorage(
+        url,
+        engine_kwargs=engine_kwargs,
+        heartbeat_interval=heartbeat_interval,
+        grace_period=grace_period,
+        failed_trial_callback=optuna.storages.RetryFailedTrialCallback(max_retry=1)
+    )
+
+
+def _search_worker(study_name: str, storage_url: str, model_type: str, X: np.ndarray, y: np.ndarray,
+                   n_trials: int, total_trials: int, pruner: str, n_folds: int, threads: int,
+                   seed: int, fixed_params: Optional[Dict[str, Any]], heartbeat_interval: int,
+                   grace_period: Optional[int]) -> int:
+    """搜索工作进程：加载共享研究并运行试验，直到研究中完成的试验数达到上限"""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=make_storage(storage_url, heartbeat_interval, grace_period),
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=make_pruner(pruner, n_folds)
+    )
+    study.optimize(
+        lambda trial: cv_objective(trial, model_type, X, y, n_folds, threads, fixed_params=fixed_params),
+        n_trials=n_trials,
+        callbacks=[optuna.study.MaxTrialsCallback(total_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))]
+    )
+    return n_trials
+
+
+def _recover_stale_trials(study) -> int:
+    """立即处理心跳已过期的 RUNNING 试验（标记失败并重新排队），返回处理的试验数"""
+    failed = len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,)))
+    optuna.storages.fail_stale_trials(study)
+    return len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,))) - failed
+
+
+def run_search(X, y, model_type: str = "catboost", n_trials: int = 40, n_workers: int = 1,
+               storage: Optional[str] = None, study_name: str = "exoquest_search", pruner: str = "median",
+               n_folds: int = 5, seed: int = 42, fixed_params: Optional[Dict[str, Any]] = None,
+               heartbeat_interval: int = 60, grace_period: Optional[int] = None) -> Dict[str, Any]:
+    """运行（或续跑）超参数搜索，研究中累计完成 n_trials 个试验后结束
+
+    n_workers > 1 时需要 storage（SQLite/RDB），各工作进程通过共享存储协同；
+    同名研究已存在时从中断处继续，已完成和已剪枝的试验计入总数。
+    中断进程留下的 RUNNING 试验在心跳过期后才重新排队（见 make_storage），可与其他启动器同时续跑同一研究。
+    """
+    if not OPTUNA_AVAILABLE:
+        raise ImportError("Optuna not available. Please install: pip install optuna")
+    if model_type not in SEARCH_SPACES:
+        raise ValueError(f"Unsupported model type: {model_type}")
+    if n_workers > 1 and storage is None:
+        raise ValueError("Parallel search requires a shared storage URL (e.g. sqlite:///optuna.db)")
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.int64)
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=make_storage(storage, heartbeat_interval, grace_period),
+        direction="maximize",
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=make_pruner(pruner, n_folds),
+        load_if_exists=True
+    )
+    recovered = _recover_stale_trials(study)
+    finished_states = (TrialState.COMPLETE, TrialState.PRUNED)
+    already_done = len(study.get_trials(deepcopy=False, states=finished_states))
+    remaining = max(0, n_trials - already_done)
+    # 每个进程分到的线程数，避免多个模型同时占满所有核心
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    started = time.perf_counter()
+    if remaining and n_workers == 1:
+        study.optimize(
+            lambda trial: cv_objective(trial, model_type, X, y, n_folds, threads, fixed_params=fixed_params),
+            n_trials=remaining
+        )
+    elif remaining:
+        per_worker = math.ceil(remaining / n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(
+                    _search_worker, study_name, storage, model_type, X, y, per_worker, n_trials,
+                    pruner, n_folds, threads, seed + i + 1, fixed_params, heartbeat_interval, grace_period
+                )
+                for i in range(n_workers)
+            ]
+            for future in futures:
+                future.result()
+    wall_seconds = time.perf_counter() - started
+
+    trials = study.get_trials(deepcopy=False)
+    counts = {state: sum(t.state == state for t in trials) for state in TrialState}
+    result = {
+        "study_name": study_name,
+        "model_type": model_type,
+        "n_workers": n_workers,
+        "pruner": pruner,
+        "wall_seconds": round(wall_seconds, 3),
+        "resumed_trials": already_done,
+        "recovered_trials": recovered,
+        "n_complete": counts[TrialState.COMPLETE],
+        "n_pruned": counts[TrialState.PRUNED],
+        "n_failed": counts[TrialState.FAIL],
+        "best_value": None,
+        "best_params": None,
+    }
+    if counts[TrialState.COMPLETE]:
+        result["best_value"] = study.best_value
+        result["best_params"] = {**study.best_params, **(fixed_params or {})}
+    logger.info(
+        f"Search {study_name} finished in {wall_seconds:.1f}s: "
+        f"{result['n_complete']} complete, {result['n_pruned']} pruned, best={result['best_value']}"
+    )
+    return result
@@ -0,0 +1,348 @@
+import functools
+import json
+import logging
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import settings
+from ml.postprocess import POSITIVE_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# 与 Model/train_model.ipynb 中 preprocess_koi_df 保持一致
+KOI_DROP_COLUMNS = [
+    "kepid", "kepoi_name", "kepler_name", "koi_pdisposition", "koi_score", "koi_teq_err1", "koi_teq_err2"
+]
+KOI_LABEL_COLUMN = "koi_disposition"
+KOI_KEEP_DISPOSITIONS = ["CANDIDATE", "CONFIRMED"]
+KOI_POSITIVE_DISPOSITION = "CANDIDATE"
+
+# 允许通过 TrainingRequest.config 覆盖的参数及其类型（与notebook的Optuna搜索空间一致）
+CATBOOST_PARAM_TYPES = {
+    "iterations": int,
+    "learning_rate": float,
+    "depth": int,
+    "l2_leaf_reg": float,
+    "random_strength": float,
+    "bagging_temperature": float,
+    "border_count": int,
+}
+TRAINING_OPTION_TYPES = {
+    "early_stopping_rounds": int,
+    "random_seed": int,
+}
+DEFAULT_TRAINING_CONFIG = {
+    "iterations": 1000,
+    "early_stopping_rounds": 200,
+    "random_seed": 42,
+}
+
+
+class TrainingConfigError(ValueError):
+    """训练配置无效"""
+
+
+def validate_training_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """校验并规范化训练配置，未知参数直接拒绝"""
+    allowed = {**CATBOOST_PARAM_TYPES, **TRAINING_OPTION_TYPES}
+    unknown = sorted(set(config) - set(allowed))
+    if unknown:
+        raise TrainingConfigError(f"不支持的训练参数: {', '.join(unknown)}")
+
+    normalized = dict(DEFAULT_TRAINING_CONFIG)
+    for name, value in config.items():
+        try:
+            normalized[name] = allowed[name](value)
+        except (TypeError, ValueError):
+            raise TrainingConfigError(f"训练参数 {name} 的值无效: {value!r}")
+    if normalized["iterations"] <= 0:
+        raise TrainingConfigError("iterations 必须大于0")
+    return normalized
+
+
+def read_koi_csv(path: str) -> pd.DataFrame:
+    """读取KOI表（NASA导出文件开头的 # 注释行会被跳过）"""
+    return pd.read_csv(path, comment="#", encoding="utf-8-sig", low_memory=False)
+
+
+def read_koi_table(path: str) -> pd.DataFrame:
+    """读取KOI数据；Parquet副本只读取标签列和数值列，跳过名称、注释等文本列"""
+    if not path.endswith(".parquet"):
+        return read_koi_csv(path)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = [
+        field.name for field in pq.read_schema(path)
+        if field.name == KOI_LABEL_COLUMN or (
+            field.name not in KOI_DROP_COLUMNS
+            and (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+        )
+    ]
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def clean_koi(koi_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """notebook中的清洗步骤：筛选候选/确认样本、填充缺失值，返回未标准化的数值特征和标签"""
+    if KOI_LABEL_COLUMN not in koi_df.columns:
+        raise ValueError(f"数据集缺少标签列 {KOI_LABEL_COLUMN}")
+
+    koi_df = koi_df.drop(columns=[c for c in KOI_DROP_COLUMNS if c in koi_df.columns])
+    koi_df = koi_df[koi_df[KOI_LABEL_COLUMN].isin(KOI_KEEP_DISPOSITIONS)].copy()
+    if koi_df.empty:
+        raise ValueError("数据集中没有 CANDIDATE/CONFIRMED 样本")
+    y = (koi_df[KOI_LABEL_COLUMN] == KOI_POSITIVE_DISPOSITION).astype(int)
+
+    # 数值列用均值填充，其余列用众数填充
+    for col in koi_df.columns:
+        if pd.api.types.is_numeric_dtype(koi_df[col]):
+            koi_df[col] = koi_df[col].fillna(koi_df[col].mean())
+        else:
+            mode = koi_df[col].mode()
+            koi_df[col] = koi_df[col].fillna(mode[0] if not mode.empty else "missing")
+
+    X = koi_df.drop(columns=[KOI_LABEL_COLUMN]).select_dtypes(include=[np.number])
+    # 全空的列均值为NaN，无法用于训练
+    X = X.loc[:, X.notna().all()]
+    return X, y
+
+
+def split_koi(X: pd.DataFrame, y: pd.Series, random_state: int = 42) -> Tuple:
+    """按 70/15/15 分层划分训练/验证/测试集；划分只取决于标签和随机种子，与是否标准化无关"""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.3, random_state=random_state, stratify=y
+    )
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, random_state=random_state, stratify=y_temp
+    )
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+def preprocess_koi(koi_df: pd.DataFrame, random_state: int = 42) -> Tuple:
+    """notebook中的预处理：清洗、标准化并按 70/15/15 分层划分"""
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = clean_koi(koi_df)
+    scaler = StandardScaler()
+    X_scaled = pd.DataFrame(scaler.fit_transform(X), columns=X.columns, index=X.index)
+    return (*split_koi(X_scaled, y, random_state), list(X.columns), scaler)
+
+
+class _IterationCallback:
+    """CatBoost迭代回调，用于上报训练进度"""
+
+    def __init__(self, on_iteration):
+        self.on_iteration = on_iteration
+
+    def after_iteration(self, info) -> bool:
+        self.on_iteration(info.iteration)
+        return True
+
+
+def train_catboost(X_train, y_train, X_val, y_val, config: Dict[str, Any], on_iteration=None):
+    """以验证集PR-AUC早停训练CatBoost"""
+    from catboost import CatBoostClassifier, Pool
+
+    params = {name: config[name] for name in CATBOOST_PARAM_TYPES if name in config}
+    model = CatBoostClassifier(
+        **params,
+        eval_metric="PRAUC",
+        random_seed=config["random_seed"],
+        allow_writing_files=False,
+        verbose=False
+    )
+    model.fit(
+        Pool(X_train, y_train),
+        eval_set=Pool(X_val, y_val),
+        early_stopping_rounds=config["early_stopping_rounds"],
+        use_best_model=True,
+        callbacks=[_IterationCallback(on_iteration)] if on_iteration else None
+    )
+    return model
+
+
+def evaluate_binary(model, X, y) -> Dict[str, float]:
+    """测试集指标（accuracy/precision/recall/F1 与notebook一样使用加权平均）"""
+    from sklearn.metrics import (
+        accuracy_score, average_precision_score, f1_score, matthews_corrcoef,
+        precision_score, recall_score, roc_auc_score
+    )
+
+    # 与预测阈值和留出评估使用同一个正类（概率列 POSITIVE_COLUMN，对应训练标签 POSITIVE_COLUMN）
+    proba = model.predict_proba(X)[:, POSITIVE_COLUMN]
+    y = (np.asarray(y) == POSITIVE_COLUMN).astype(int)
+    pred = (proba >= 0.5).astype(int)
+    return {
+        "pr_auc": float(average_precision_score(y, proba)),
+        "roc_auc": float(roc_auc_score(y, proba)),
+        "accuracy": float(accuracy_score(y, pred)),
+        "precision": float(precision_score(y, pred, average="weighted", zero_division=0)),
+        "recall": float(recall_score(y, pred, average="weighted", zero_division=0)),
+        "f1_score": float(f1_score(y, pred, average="weighted", zero_division=0)),
+        "mcc": float(matthews_corrcoef(y, pred)),
+    }
+
+
+def save_artifacts(output_dir: str, model, features, scaler, metadata: Dict[str, Any]):
+    """按 ModelService 可直接加载的格式保存模型、特征列表和标准化参数"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.save_model(str(output_dir / "best_model.cbm"))
+
+    std_params = {
+        "features": features,
+        "mean": np.asarray(scaler.mean_).tolist(),
+        "scale": np.asarray(scaler.scale_).tolist()
+    }
+    files = {
+        "features.json": {"features": features},
+        "scaler_params.json": std_params,
+        "standardizer.json": std_params,
+        "metadata.json": metadata,
+    }
+    for name, data in files.items():
+        with open(output_dir / name, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def fetch_dataset(source: Dict[str, str], workdir: str) -> str:
+    """获取训练数据到本地：source 为 {"path": ...} 或 {"bucket": ..., "object_key": ...}"""
+    if "path" in source:
+        return source["path"]
+
+    from ml.model_registry import create_minio_client
+
+    client = create_minio_client()
+    local_path = str(Path(workdir) / Path(source["object_key"]).name)
+    client.fget_object(source["bucket"], source["object_key"], local_path)
+    return local_path
+
+
+class _ProgressReporter:
+    """把进度写入任务存储，进度百分比不变时不重复写入"""
+
+    def __init__(self, store, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.progress = -1
+
+    def __call__(self, progress: int, message: str, **fields):
+        progress = int(progress)
+        if progress == self.progress and not fields:
+            return
+        self.progress = progress
+        self.store.update(self.job_id, status="running", progress=progress, message=message, **fields)
+
+
+def run_training_job(job_id: str, source: Dict[str, str], config: Dict[str, Any], store,
+                     output_dir: str) -> Dict[str, float]:
+    """训练任务入口（在工作进程中执行）：下载数据 -> 预处理 -> 训练 -> 评估 -> 保存"""
+    report = _ProgressReporter(store, job_id)
+    started = time.perf_counter()
+    try:
+        report(2, "下载数据集")
+        with tempfile.TemporaryDirectory() as workdir:
+            koi_df = read_koi_table(fetch_dataset(source, workdir))
+
+        report(10, f"预处理 {len(koi_df)} 行数据")
+        X_train, X_val, X_test, y_train, y_val, y_test, features, scaler = preprocess_koi(
+            koi_df, random_state=config["random_seed"]
+        )
+        del koi_df
+
+        # 训练阶段占 15% - 90% 的进度
+        iterations = config["iterations"]
+        report(15, f"训练CatBoost（{len(X_train)} 训练样本，{len(features)} 个特征）")
+        model = train_catboost(
+            X_train, y_train, X_val, y_val, config,
+            on_iteration=lambda i: report(15 + 75 * (i + 1) / iterations, f"训练中 {i + 1}/{iterations}")
+        )
+
+        report(92, "评估测试集")
+        metrics = evaluate_binary(model, X_test, y_test)
+
+        report(96, "保存模型")
+        metadata = {
+            "job_id": job_id,
+            "trained_at": datetime.utcnow().isoformat(),
+            "params": config,
+            "best_iteration": int(model.get_best_iteration() or 0),
+            "n_train": int(len(X_train)),
+            "n_val": int(len(X_val)),
+            "n_test": int(len(X_test)),
+            "metrics": metrics,
+        }
+        save_artifacts(output_dir, model, features, scaler, metadata)
+        if settings.model_registry_source == "minio":
+            # 发布到模型注册表，其他API实例可按任务ID加载该版本
+            from ml.model_registry import create_minio_client, publish_model_version
+            publish_model_version(create_minio_client(), settings.minio_bucket_models, output_dir, job_id)
+
+        elapsed = time.perf_counter() - started
+        store.update(
+            job_id, status="completed", progress=100,
+            message=f"训练完成，用时 {elapsed:.1f}s", metrics=metrics, model_version=job_id
+        )
+        return metrics
+    except Exception as e:
+        logger.error(f"Training job {job_id} failed: {str(e)}")
+        store.update(job_id, status="failed", message=f"训练失败: {str(e)}")
+        raise
+
+
+class TrainingRunner:
+    """训练任务运行器 - 在独立的进程池中训练，避免与API进程争用CPU和内存"""
+
+    def __init__(self, store, max_workers: int = 1, output_dir: str = "models/versions"):
+        self.store = store
+        self.max_workers = max_workers
+        self.output_dir = Path(output_dir)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._futures = {}
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn 避免 fork 继承API进程中的线程和模型
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def submit(self, job_id: str, source: Dict[str, str], config: Dict[str, Any]):
+        """提交训练任务，任务记录需已在存储中创建"""
+        args = (run_training_job, job_id, source, config, self.store, str(self.output_dir / job_id))
+        try:
+            future = self._ensure_pool().submit(*args)
+        except BrokenProcessPool:
+            # 工作进程异常退出后进程池不可用，重建一次
+            self._pool = None
+            future = self._ensure_pool().submit(*args)
+        self._futures[job_id] = future
+        future.add_done_callback(functools.partial(self._on_done, job_id))
+
+    def _on_done(self, job_id: str, future):
+        """工作进程内的异常已写入存储，这里只处理进程崩溃和取消"""
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            self.store.update(job_id, status="failed", message="训练任务已取消")
+        elif isinstance(future.exception(), BrokenProcessPool):
+            self.store.update(job_id, status="failed", message="训练进程异常退出")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.max_workers, "active": len(self._futures)}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
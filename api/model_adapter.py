@@ -1,34 +1,56 @@
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import tempfile
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Any, Optional
 import httpx
+import numpy as np
 import redis.asyncio as redis
 from minio import Minio
 
 from config import settings
+from ml.batcher import MicroBatcher
+from ml.columnar import ID_COLUMNS
+from ml.evaluation import at_threshold, evaluate_model
+from ml.executor import InferenceExecutor, InferenceQueueFullError
+from ml.imports import import_timings
+from ml.lightcurve import predict_curves, shutdown_curve_pipeline
+from ml.postprocess import apply_threshold, confidence, to_predictions
+from ml.scoring import (
+    REPORT_CONTENT_TYPES, ReportWriter, ScoringInputError,
+    chunk_to_columns, iter_dataset_chunks, result_to_frame
+)
+from ml.training import TrainingRunner, validate_training_config
+from services.job_store import create_job_store
+from services.minio_service import minio_service
+from services.curve_store import get_curve_store
+from services.evaluation_store import get_evaluation_store
+from services.prediction_cache import PredictionCache, TwoTierCache
 from models import (
-    TabularPredictRequest, CurvePredictRequest, FusePredictRequest,
+    TabularPredictRequest, CurvePredictRequest, CurveBatchPredictRequest,
+    FusePredictRequest, FuseBatchPredictRequest,
     TrainingRequest, ExoplanetPrediction, Probabilities, 
     ShapExplanation, TabularExplanation, TrainingJob, JobStatus,
-    ModelMetrics, ConfusionMatrix
+    ModelMetrics, ConfusionMatrix, ThresholdMetrics, ThresholdCurve,
+    ScoringRequest, TabularRow, RethresholdRequest
 )
 
 # 导入真实模型服务
 try:
-    from ml.model_service import ModelService
-    # 创建全局模型服务实例
-    _model_service = None
-    def get_model_service():
-        global _model_service
-        if _model_service is None:
-            _model_service = ModelService()
-        return _model_service
-    
-    def real_predict_tabular(rows, threshold=0.5):
+    # 与 /api/features 等接口共用进程级模型注册表
+    from ml.model_registry import ModelVersionNotFoundError, get_model_registry
+    from ml.model_service import get_model_service, resolve_object_id, warm_up_model_service
+    
+    def real_predict_tabular(rows, threshold=0.5, version=None):
         try:
-            service = get_model_service()
+            service = get_model_service(version)
             return service.predict_tabular(rows, threshold)
+        except ModelVersionNotFoundError:
+            raise
         except Exception as e:
             logger.error(f"Real predict tabular failed: {str(e)}")
             # 返回基于二分类模型的模拟数据作为fallback
@@ -60,12 +82,31 @@ try:
                 }
                 predictions.append(prediction)
             return {"predictions": predictions}
+    
+    def real_predict_tabular_many(requests, version=None):
+        try:
+            service = get_model_service(version)
+            return service.predict_tabular_many(requests)
+        except ModelVersionNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Real predict tabular batch failed: {str(e)}")
+            return [real_predict_tabular(rows, threshold, version) for rows, threshold in requests]
+    
+    def real_predict_columns(columns, threshold=0.5, object_ids=None, top_k=5, version=None):
+        service = get_model_service(version)
+        return service.predict_columns(columns, threshold, object_ids, top_k)
         
 except ImportError as e:
     import logging
     logger = logging.getLogger(__name__)
     logger.error(f"Failed to import model_service: {e}")
+    get_model_service = None
+    get_model_registry = None
+    warm_up_model_service = None
     real_predict_tabular = None
+    real_predict_tabular_many = None
+    real_predict_columns = None
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -102,20 +143,75 @@ class ModelAdapter:
     async def predict_tabular(self, request: TabularPredictRequest) -> Dict[str, Any]:
         raise NotImplementedError
     
+    def predict_tabular_stream(self, rows: AsyncIterator[Dict[str, Any]], threshold: float,
+                               chunk_rows: Optional[int] = None,
+                               version: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+    
+    async def predict_tabular_bulk(self, columns: Dict[str, Any], threshold: float,
+                                   object_ids: Optional[List[str]] = None,
+                                   version: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    async def rethreshold(self, request: RethresholdRequest) -> Dict[str, Any]:
+        raise NotImplementedError
+    
     async def predict_curve(self, request: CurvePredictRequest) -> Dict[str, Any]:
         raise NotImplementedError
     
+    async def predict_curve_batch(self, request: CurveBatchPredictRequest) -> Dict[str, Any]:
+        raise NotImplementedError
+    
     async def predict_fuse(self, request: FusePredictRequest) -> Dict[str, Any]:
         raise NotImplementedError
     
+    async def predict_fuse_batch(self, request: FuseBatchPredictRequest) -> Dict[str, Any]:
+        raise NotImplementedError
+    
     async def start_training(self, request: TrainingRequest) -> Dict[str, str]:
         raise NotImplementedError
     
     async def get_job_status(self, job_id: str) -> TrainingJob:
         raise NotImplementedError
     
-    async def get_model_metrics(self, model_id: str) -> ModelMetrics:
+    async def start_scoring(self, dataset_id: str, request: ScoringRequest) -> Dict[str, str]:
+        raise NotImplementedError
+    
+    async def get_model_metrics(self, model_id: str, threshold: float = 0.5) -> ModelMetrics:
+        raise NotImplementedError
+    
+    async def get_threshold_curve(self, model_id: str) -> ThresholdCurve:
         raise NotImplementedError
+    
+    async def get_model_plot(self, model_id: str, name: str) -> Path:
+        raise NotImplementedError
+    
+    async def resolve_model_version(self, version: Optional[str]) -> Optional[str]:
+        """把请求中的模型版本解析为具体版本号"""
+        return version
+    
+    async def list_models(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    async def activate_model(self, version: str) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def get_inference_stats(self) -> Dict[str, Any]:
+        """推理运行时统计"""
+        return {}
+    
+    async def load_model(self):
+        """加载模型（启动钩子在后台调用）"""
+    
+    def readiness(self) -> Dict[str, Any]:
+        """模型就绪状态"""
+        return {"status": "ready"}
+    
+    async def close(self):
+        """释放客户端连接"""
+        if self.redis_client:
+            await self.redis_client.aclose()
+            self.redis_client = None
 
 
 
@@ -125,8 +221,152 @@ class ModelServiceAdapter(ModelAdapter):
     
     def __init__(self):
         super().__init__()
+        # 模型调用在独立的线程池/进程池中执行，避免阻塞事件循环
+        self.executor = InferenceExecutor(
+            kind=settings.inference_executor,
+            max_workers=settings.inference_workers,
+            queue_size=settings.inference_queue_size,
+            initializer=warm_up_model_service
+        )
+        # 光变曲线在独立的执行器中处理，融合预测时两种模态并行且互不占用队列
+        self.curve_executor = InferenceExecutor(
+            kind=settings.curve_executor,
+            max_workers=settings.curve_workers,
+            queue_size=settings.curve_queue_size
+        )
+        # 并发的小请求在时间窗口内合并为一次模型调用
+        self.batcher = MicroBatcher(
+            self.executor,
+            real_predict_tabular_many,
+            window_ms=settings.microbatch_window_ms,
+            max_rows=settings.microbatch_max_rows
+        )
+        # 预测结果缓存（进程内LRU + Redis）
+        self.prediction_cache = PredictionCache(
+            ttl_seconds=settings.prediction_cache_ttl_seconds,
+            max_local_entries=settings.prediction_cache_local_entries,
+            max_redis_entries=settings.prediction_cache_redis_entries
+        )
+        # 阈值调整前的原始概率（按prediction_id），阈值滑块变化时无需再次运行模型
+        self.raw_probs_cache = TwoTierCache(
+            "exoquest:raw",
+            ttl_seconds=settings.rethreshold_ttl_seconds,
+            max_local_entries=settings.rethreshold_max_entries,
+            max_redis_entries=settings.rethreshold_max_entries
+        )
+        # 模型评估报告（按版本），每个版本只评估一次，之后指标和阈值曲线直接读取缓存
+        self.evaluation_cache = TwoTierCache(
+            "exoquest:eval",
+            ttl_seconds=settings.evaluation_cache_ttl_seconds,
+            max_local_entries=16,
+            max_redis_entries=256
+        )
+        self.evaluation_locks: Dict[str, asyncio.Lock] = {}
+        self.evaluation_tasks: Dict[str, asyncio.Task] = {}
+        # 训练任务在独立进程中执行，任务存储在首次使用时创建
+        self.job_store = None
+        self.training_runner = None
+        # 正在运行的批量评分任务（持有引用，避免任务被回收）
+        self.scoring_tasks: Dict[str, asyncio.Task] = {}
+        # 模型在启动后于后台加载，/ready 报告加载状态
+        self.model_state: Dict[str, Any] = {"status": "not_loaded"}
+        # 正在后台加载预热、完成后切换为默认版本的模型
+        self.activations: Dict[str, Dict[str, Any]] = {}
+        self.activation_tasks: Dict[str, asyncio.Task] = {}
         logger.info("Initializing Model Adapter with local model service")
     
+    async def load_model(self):
+        """启动时加载共享的模型服务并用合成批次预热，记录加载和预热耗时"""
+        if get_model_service is None:
+            self.model_state = {"status": "failed", "error": "Model service not available"}
+            return
+        self.model_state = {"status": "loading"}
+        try:
+            started = time.perf_counter()
+            service = await asyncio.to_thread(get_model_service)
+            load_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.model_state = {"status": "warming_up", "load_ms": load_ms}
+            
+            started = time.perf_counter()
+            warmup = await asyncio.to_thread(warm_up_model_service)
+            if self.executor.kind == "process":
+                # 启动推理进程池，各工作进程在初始化函数中加载并预热自己的模型副本
+                await self.executor.run(warm_up_model_service, 0)
+            warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            logger.error(f"Model load failed: {e}")
+            self.model_state = {"status": "failed", "error": str(e)}
+            return
+        self.model_state = {
+            "status": "ready",
+            "version": service.version,
+            "model_type": service.model_type,
+            "backend": service.backend,
+            "load_ms": load_ms,
+            "warmup_ms": warmup_ms,
+            "warmup": warmup
+        }
+        logger.info(
+            f"Model {service.version} ({service.model_type}) ready: load {load_ms:.0f}ms, warm-up {warmup_ms:.0f}ms"
+        )
+        self._schedule_evaluation(service.version)
+    
+    def readiness(self) -> Dict[str, Any]:
+        """模型就绪状态，附带按需导入的重量级库的导入耗时"""
+        return {**self.model_state, "imports_ms": import_timings()}
+    
+    async def resolve_model_version(self, version: Optional[str]) -> str:
+        """把请求中的模型版本解析为具体版本号；整个请求（评分任务）固定使用该版本，不受期间的切换影响"""
+        if get_model_registry is None:
+            raise ImportError("Model service not available")
+        registry = await asyncio.to_thread(get_model_registry)
+        return await asyncio.to_thread(registry.resolve, version)
+    
+    async def list_models(self) -> Dict[str, Any]:
+        """模型注册表状态，以及正在后台加载的版本"""
+        if get_model_registry is None:
+            raise ImportError("Model service not available")
+        registry = await asyncio.to_thread(get_model_registry)
+        state = await asyncio.to_thread(registry.describe)
+        state["activations"] = dict(self.activations)
+        return state
+    
+    async def activate_model(self, version: str) -> Dict[str, Any]:
+        """在后台加载并预热指定版本，完成后原子切换为默认版本；期间请求继续使用旧版本"""
+        version = await self.resolve_model_version(version)
+        task = self.activation_tasks.get(version)
+        if task is None or task.done():
+            self.activations[version] = {"status": "loading"}
+            task = asyncio.create_task(self._activate(version))
+            self.activation_tasks[version] = task
+            task.add_done_callback(lambda _: self.activation_tasks.pop(version, None))
+        return {"version": version, **self.activations[version]}
+    
+    async def _activate(self, version: str):
+        started = time.perf_counter()
+        try:
+            registry = await asyncio.to_thread(get_model_registry)
+            if self.executor.kind == "process":
+                # 先在推理进程中加载预热，切换后的首批请求不会在工作进程里冷启动
+                await self.executor.run(warm_up_model_service, None, version)
+            service = await asyncio.to_thread(registry.activate, version, settings.model_warmup_rows)
+        except Exception as e:
+            logger.error(f"Activating model version {version} failed: {e}")
+            self.activations[version] = {"status": "failed", "error": str(e)}
+            return
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.activations[version] = {"status": "active", "activate_ms": elapsed_ms}
+        self.model_state = {**self.model_state, "version": service.version, "model_type": service.model_type}
+        logger.info(f"Model version {version} activated in {elapsed_ms:.0f}ms")
+        self._schedule_evaluation(service.version)
+    
+    async def init_clients(self):
+        """初始化客户端连接，并让预测缓存使用Redis作为第二级"""
+        await super().init_clients()
+        self.prediction_cache.store.redis = self.redis_client
+        self.raw_probs_cache.redis = self.redis_client
+        self.evaluation_cache.redis = self.redis_client
+    
     async def predict_tabular(self, request: TabularPredictRequest) -> Dict[str, Any]:
         """使用本地模型进行表格预测"""
         try:
@@ -139,66 +379,535 @@ class ModelServiceAdapter(ModelAdapter):
             logger.info(f"Data prepared: {len(rows_data)} rows")
             logger.info(f"First row keys: {list(rows_data[0].keys()) if rows_data else 'No data'}")
             
-            result = real_predict_tabular(rows_data, request.threshold)
-            logger.info(f"Model prediction completed successfully with threshold {request.threshold}")
-            return result
+            version = await self.resolve_model_version(request.model_version)
+            predictions, timing = await self._predict_rows(rows_data, request.threshold, version=version)
+            logger.info(
+                f"Model prediction completed successfully with threshold {request.threshold} "
+                f"(cache {timing['cache_hits']}/{len(rows_data)}, queue {timing['queue_wait_ms']:.1f}ms, "
+                f"compute {timing['compute_ms']:.1f}ms)"
+            )
+            prediction_id = await self._save_raw_probs(predictions)
+            return {"predictions": predictions, "timing": timing, "prediction_id": prediction_id}
+        except (InferenceQueueFullError, ModelVersionNotFoundError):
+            raise
         except Exception as e:
             logger.error(f"Model prediction failed: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise
     
+    async def predict_tabular_stream(self, rows: AsyncIterator[Dict[str, Any]], threshold: float,
+                                     chunk_rows: Optional[int] = None,
+                                     version: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """流式预测 - 按块读取输入行并逐块产出预测，内存占用只与块大小有关"""
+        if real_predict_tabular is None:
+            raise ImportError("Model service not available")
+        
+        version = await self.resolve_model_version(version)
+        chunk_rows = chunk_rows or settings.stream_chunk_rows
+        chunk: List[Dict[str, Any]] = []
+        offset = 0
+        input_error = None
+        rows = rows.__aiter__()
+        exhausted = False
+        while not exhausted:
+            try:
+                chunk.append(await rows.__anext__())
+                if len(chunk) < chunk_rows:
+                    continue
+            except StopAsyncIteration:
+                exhausted = True
+            except Exception as e:
+                # 输入出错时先输出已读取行的预测，再把错误抛给调用方
+                input_error = e
+                exhausted = True
+            
+            if chunk:
+                predictions, _ = await self._predict_rows(chunk, threshold, offset, version)
+                for prediction in predictions:
+                    yield prediction
+                offset += len(chunk)
+                chunk = []
+        if input_error is not None:
+            raise input_error
+        logger.info(f"Streaming prediction completed for {offset} rows with threshold {threshold}")
+    
+    async def predict_tabular_bulk(self, columns: Dict[str, Any], threshold: float,
+                                   object_ids: Optional[List[str]] = None,
+                                   version: Optional[str] = None) -> Dict[str, Any]:
+        """列式批量预测 - 整批直接提交到推理执行器，不经过逐行对象和缓存"""
+        if real_predict_columns is None:
+            raise ImportError("Model service not available")
+        
+        version = await self.resolve_model_version(version)
+        result, timing = await self.executor.run(
+            real_predict_columns, columns, threshold, object_ids, version=version
+        )
+        result["timing"] = timing
+        logger.info(
+            f"Bulk prediction completed for {len(result['object_id'])} rows "
+            f"(queue {timing['queue_wait_ms']:.1f}ms, compute {timing['compute_ms']:.1f}ms)"
+        )
+        return result
+    
+    async def _predict_rows(self, rows_data: List[Dict[str, Any]], threshold: float, offset: int = 0,
+                            version: Optional[str] = None):
+        """预测一组行字典，返回 (预测列表, 耗时)；offset用于生成默认目标ID"""
+        # 先查预测缓存，只有未命中的行才进入模型
+        signature = await self._cache_signature(version) if settings.prediction_cache_enabled else None
+        cached = {}
+        if signature is not None:
+            version, features = signature
+            keys, cached = await self.prediction_cache.lookup(rows_data, threshold, version, features)
+        
+        miss_idx = [i for i in range(len(rows_data)) if i not in cached]
+        fresh = {}
+        timing = {"queue_wait_ms": 0.0, "compute_ms": 0.0, "total_ms": 0.0}
+        if miss_idx:
+            miss_rows = [rows_data[i] for i in miss_idx]
+            result, timing = await self._run_tabular(miss_rows, threshold, version)
+            fresh = dict(zip(miss_idx, result["predictions"]))
+            if signature is not None:
+                # 降级结果（版本不一致）不写入缓存
+                valid = [i for i in miss_idx if fresh[i].get("version") == signature[0]]
+                await self.prediction_cache.save([keys[i] for i in valid], [fresh[i] for i in valid])
+        
+        predictions = []
+        for i, row in enumerate(rows_data):
+            prediction = dict(cached[i]) if i in cached else fresh[i]
+            prediction["object_id"] = resolve_object_id(row, offset + i)
+            predictions.append(prediction)
+        
+        timing["cache_hits"] = len(cached)
+        timing["cache_misses"] = len(miss_idx)
+        return predictions, timing
+    
+    async def _save_raw_probs(self, predictions: List[Dict[str, Any]]) -> Optional[str]:
+        """取出各预测的原始概率，整批写入缓存并返回prediction_id；降级结果没有原始概率时返回None"""
+        raw = [prediction.pop("raw_probs", None) for prediction in predictions]
+        if not predictions or any(r is None for r in raw):
+            return None
+        prediction_id = uuid.uuid4().hex
+        await self.raw_probs_cache.set_many({prediction_id: {
+            "version": predictions[0]["version"],
+            "object_id": [prediction["object_id"] for prediction in predictions],
+            "raw_probs": raw,
+            "shap": [(prediction.get("explain") or {}).get("tabular", {}).get("shap") for prediction in predictions]
+        }})
+        return prediction_id
+    
+    async def rethreshold(self, request: RethresholdRequest) -> Dict[str, Any]:
+        """按新阈值重算缓存的原始概率 - 整批数组运算，不再运行模型"""
+        entry = (await self.raw_probs_cache.get_many([request.prediction_id])).get(request.prediction_id)
+        if entry is None:
+            raise ValueError(f"Prediction not found or expired: {request.prediction_id}")
+        started = time.perf_counter()
+        probs_array = np.asarray(entry["raw_probs"], dtype=np.float64)
+        shap = entry["shap"] if all(values is not None for values in entry["shap"]) else None
+        predictions = to_predictions(
+            entry["object_id"], apply_threshold(probs_array, request.threshold),
+            confidence(probs_array), entry["version"], shap=shap
+        )
+        timing = {"compute_ms": round((time.perf_counter() - started) * 1000, 3)}
+        return {"predictions": predictions, "timing": timing, "prediction_id": request.prediction_id}
+    
+    async def _run_tabular(self, rows: List[Dict[str, Any]], threshold: float, version: Optional[str] = None):
+        """小请求走微批处理，大请求直接提交到推理执行器"""
+        if settings.microbatch_enabled and len(rows) <= settings.microbatch_max_rows:
+            return await self.batcher.submit(rows, threshold, version)
+        return await self.executor.run(real_predict_tabular, rows, threshold, version)
+    
+    async def _cache_signature(self, version: Optional[str] = None):
+        """缓存键所需的模型版本和特征顺序，模型不可用时返回None"""
+        try:
+            service = await asyncio.to_thread(get_model_service, version)
+            return service.version, service.features
+        except Exception as e:
+            logger.warning(f"Prediction cache disabled for this request: {e}")
+            return None
+    
     async def predict_curve(self, request: CurvePredictRequest) -> Dict[str, Any]:
-        """曲线预测 - 暂未实现"""
-        raise NotImplementedError("Curve prediction not yet implemented")
+        """单条光变曲线预测（按一条曲线的批次处理）"""
+        return await self.predict_curve_batch(CurveBatchPredictRequest(curves=[request]))
+    
+    async def predict_curve_batch(self, request: CurveBatchPredictRequest) -> Dict[str, Any]:
+        """批量光变曲线预测"""
+        predictions, timing = await self._run_curves(request.curves)
+        for prediction in predictions:
+            prediction.pop("raw_probs", None)
+        logger.info(
+            f"Curve prediction completed for {len(predictions)} curves "
+            f"(queue {timing['queue_wait_ms']:.1f}ms, compute {timing['compute_ms']:.1f}ms)"
+        )
+        return {"predictions": predictions, "timing": timing}
+    
+    async def _run_curves(self, curves: List[CurvePredictRequest]):
+        """每 curve_max_batch 条曲线补齐为一个数组，在曲线执行器中整批处理，返回 (预测列表, 耗时)"""
+        # 引用的已存储曲线先确保在本地缓存中（不存在时返回404），工作进程直接映射文件
+        curve_ids = [item.curve_id for item in curves if item.curve_id]
+        if curve_ids:
+            store = get_curve_store()
+            for curve_id in dict.fromkeys(curve_ids):
+                await asyncio.to_thread(store.header, curve_id)
+        predictions = []
+        timing = {"queue_wait_ms": 0.0, "compute_ms": 0.0, "total_ms": 0.0}
+        for start in range(0, len(curves), settings.curve_max_batch):
+            chunk = curves[start:start + settings.curve_max_batch]
+            result, chunk_timing = await self.curve_executor.run(
+                predict_curves,
+                [item.curve for item in chunk],
+                [item.threshold for item in chunk],
+                times=[item.time for item in chunk],
+                periods=[item.period for item in chunk],
+                epochs=[item.epoch for item in chunk],
+                object_ids=[item.object_id or item.curve_id or f"CURVE-{start + i + 1}" for i, item in enumerate(chunk)],
+                search=[item.search_period for item in chunk],
+                curve_ids=[item.curve_id for item in chunk]
+            )
+            predictions.extend(result)
+            for key in timing:
+                timing[key] += chunk_timing[key]
+        return predictions, timing
     
     async def predict_fuse(self, request: FusePredictRequest) -> Dict[str, Any]:
-        """融合预测 - 暂未实现"""
-        raise NotImplementedError("Fuse prediction not yet implemented")
+        """单个 (表格行, 光变曲线) 对的融合预测"""
+        return await self.predict_fuse_batch(FuseBatchPredictRequest(pairs=[request]))
+    
+    async def predict_fuse_batch(self, request: FuseBatchPredictRequest) -> Dict[str, Any]:
+        """融合预测 - 表格模型与光变曲线引擎在各自的执行器中并行运行，按 alpha 混合原始概率
+
+        延迟约为 max(表格, 曲线) 而不是两者之和；两种模态的耗时分别记录在 timing 中。
+        """
+        if real_predict_tabular is None:
+            raise ImportError("Model service not available")
+        pairs = request.pairs
+        rows_data = [pair.tabular_data.model_dump() for pair in pairs]
+        curves = [
+            CurvePredictRequest(curve=pair.curve_data, curve_id=pair.curve_id, time=pair.curve_time,
+                                threshold=pair.threshold)
+            for pair in pairs
+        ]
+        version = await self.resolve_model_version(None)
+        started = time.perf_counter()
+        
+        async def timed(coro):
+            result = await coro
+            return result, round((time.perf_counter() - started) * 1000, 3)
+        
+        (tabular, tabular_ms), (curve, curve_ms) = await asyncio.gather(
+            # 原始概率与阈值无关，各对的阈值在混合后统一应用
+            timed(self._predict_rows(rows_data, pairs[0].threshold, version=version)),
+            timed(self._run_curves(curves))
+        )
+        (tabular_predictions, tabular_timing), (curve_predictions, _) = tabular, curve
+        
+        blend_started = time.perf_counter()
+        tabular_raw = np.array([
+            p.get("raw_probs") or [p["probs"].get("POSITIVE", 0.0), p["probs"].get("NEGATIVE", 0.0)]
+            for p in tabular_predictions
+        ], dtype=np.float64)
+        if tabular_raw.shape[1] != 2:
+            raise ValueError("Fuse prediction requires a binary tabular model")
+        curve_raw = np.array([p["raw_probs"] for p in curve_predictions], dtype=np.float64)
+        alpha = np.array([pair.alpha for pair in pairs])[:, None]
+        probs_array = alpha * tabular_raw + (1 - alpha) * curve_raw
+        
+        version = f"{tabular_predictions[0]['version']}+{curve_predictions[0]['version']}"
+        predictions = to_predictions(
+            [p["object_id"] for p in tabular_predictions],
+            apply_threshold(probs_array, [pair.threshold for pair in pairs]),
+            confidence(probs_array), version
+        )
+        for prediction, tabular_prediction, curve_prediction in zip(predictions, tabular_predictions, curve_predictions):
+            if tabular_prediction.get("explain"):
+                prediction["explain"] = tabular_prediction["explain"]
+            prediction["importance"] = curve_prediction["importance"]
+            prediction["detection"] = curve_prediction["detection"]
+        
+        timing = {
+            "tabular_ms": tabular_ms,
+            "curve_ms": curve_ms,
+            "blend_ms": round((time.perf_counter() - blend_started) * 1000, 3),
+            "total_ms": round((time.perf_counter() - started) * 1000, 3),
+            "cache_hits": tabular_timing["cache_hits"]
+        }
+        logger.info(
+            f"Fuse prediction completed for {len(pairs)} pairs "
+            f"(tabular {tabular_ms:.1f}ms, curve {curve_ms:.1f}ms, total {timing['total_ms']:.1f}ms)"
+        )
+        return {"predictions": predictions, "timing": timing}
+    
+    async def _get_job_store(self):
+        """创建任务存储（auto模式需探测Redis），训练和评分任务共用"""
+        if self.job_store is None:
+            self.job_store = await asyncio.to_thread(create_job_store)
+        return self.job_store
+    
+    async def _get_training_runner(self) -> TrainingRunner:
+        """创建训练进程池"""
+        if self.training_runner is None:
+            await self._get_job_store()
+            self.training_runner = TrainingRunner(
+                self.job_store,
+                max_workers=settings.training_workers,
+                output_dir=settings.training_output_dir
+            )
+        return self.training_runner
     
     async def start_training(self, request: TrainingRequest) -> Dict[str, str]:
-        """训练接口 - 模拟实现"""
-        import uuid
-        from datetime import datetime
+        """提交训练任务 - 数据集从MinIO拉取，训练在工作进程中执行"""
+        config = validate_training_config(request.config)
+        object_key = await asyncio.to_thread(minio_service.find_dataset_key, request.dataset_id)
+        if object_key is None:
+            raise ValueError(f"Dataset not found: {request.dataset_id}")
+        # 优先使用列式副本，训练进程只读取需要的列
+        columnar_key = await asyncio.to_thread(minio_service.get_dataset_columnar_key, request.dataset_id)
+        object_key = columnar_key or object_key
         
+        runner = await self._get_training_runner()
         job_id = str(uuid.uuid4())
-        logger.info(f"Simulating training job start: {job_id}")
+        await asyncio.to_thread(
+            self.job_store.create, job_id,
+            status=JobStatus.PENDING.value, progress=0, message="等待训练进程", dataset_id=request.dataset_id
+        )
+        runner.submit(job_id, {"bucket": settings.minio_bucket_datasets, "object_key": object_key}, config)
+        logger.info(f"Training job {job_id} submitted for dataset {request.dataset_id} ({object_key})")
+        return {"job_id": job_id}
+    
+    async def start_scoring(self, dataset_id: str, request: ScoringRequest) -> Dict[str, str]:
+        """提交数据集批量评分任务 - 在事件循环中调度，按块提交到推理执行器"""
+        if real_predict_columns is None:
+            raise ImportError("Model service not available")
+        
+        object_key = await asyncio.to_thread(minio_service.find_dataset_key, dataset_id)
+        if object_key is None:
+            raise ValueError(f"Dataset not found: {dataset_id}")
+        record = await asyncio.to_thread(minio_service.catalog.get, dataset_id)
+        if record is not None and record.get("columns"):
+            names = {column["name"] for column in record["columns"]}
+            missing = [name for name, field in TabularRow.model_fields.items() if field.is_required() and name not in names]
+            if missing:
+                raise ScoringInputError(f"Dataset is missing feature columns: {', '.join(missing)}")
+            # 有列式副本时只读取需要的列
+            object_key = record.get("columnar_key") or object_key
+        version = await self.resolve_model_version(request.model_version)
         
-        # 模拟训练任务启动
+        await self._get_job_store()
+        job_id = str(uuid.uuid4())
+        rows_total = record.get("row_count") if record is not None else None
+        await asyncio.to_thread(
+            self.job_store.create, job_id,
+            kind="scoring", status=JobStatus.PENDING.value, progress=0, message="等待评分",
+            dataset_id=dataset_id, rows_done=0, rows_total=rows_total, model_version=version
+        )
+        task = asyncio.create_task(self._run_scoring(job_id, dataset_id, object_key, rows_total, request, version))
+        self.scoring_tasks[job_id] = task
+        task.add_done_callback(lambda _: self.scoring_tasks.pop(job_id, None))
+        logger.info(f"Scoring job {job_id} submitted for dataset {dataset_id} ({object_key})")
         return {"job_id": job_id}
     
+    async def _predict_chunk(self, columns, threshold: float, object_ids, top_k: int, version: str):
+        """提交一个评分块；推理队列满时退避重试，批量任务让位于在线请求"""
+        delay = 0.05
+        while True:
+            try:
+                result, _ = await self.executor.run(
+                    real_predict_columns, columns, threshold, object_ids, top_k, version
+                )
+                return result
+            except InferenceQueueFullError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+    
+    async def _run_scoring(self, job_id: str, dataset_id: str, object_key: str,
+                           rows_total: Optional[int], request: ScoringRequest, version: str):
+        """评分任务主体：读取块 -> 推理（最多 scoring_max_inflight 块并行）-> 按原顺序写报告 -> 上传"""
+        features = list(TabularRow.model_fields)
+        chunk_rows = request.chunk_rows or settings.scoring_chunk_rows
+        wanted = features + list(ID_COLUMNS)
+        report_key = f"scores/{dataset_id}/{job_id}.{request.format}"
+        started = time.perf_counter()
+        rows_done = 0
+        inflight = deque()
+        chunks = None
+        
+        async def update(**fields):
+            await asyncio.to_thread(self.job_store.update, job_id, **fields)
+        
+        try:
+            await update(status=JobStatus.RUNNING.value, message="评分中")
+            chunks = iter_dataset_chunks(
+                minio_service.client, settings.minio_bucket_datasets, object_key, wanted, chunk_rows
+            )
+            with tempfile.TemporaryDirectory() as workdir:
+                report_path = f"{workdir}/report.{request.format}"
+                metadata = {"dataset_id": dataset_id, "job_id": job_id, "model_version": version}
+                with ReportWriter(report_path, request.format, metadata) as writer:
+                    offset = 0
+                    exhausted = False
+                    while not exhausted or inflight:
+                        # 读取下一块（阻塞IO放到线程）并提交推理，直到在途块数达到上限
+                        while not exhausted and len(inflight) < settings.scoring_max_inflight:
+                            chunk = await asyncio.to_thread(next, chunks, None)
+                            if chunk is None:
+                                exhausted = True
+                                break
+                            columns, object_ids = chunk_to_columns(chunk, features, offset)
+                            offset += len(chunk)
+                            inflight.append(asyncio.ensure_future(
+                                self._predict_chunk(columns, request.threshold, object_ids, request.top_k, version)
+                            ))
+                        if not inflight:
+                            break
+                        frame = result_to_frame(await inflight.popleft())
+                        await asyncio.to_thread(writer.write, frame)
+                        rows_done += len(frame)
+                        elapsed = time.perf_counter() - started
+                        progress = min(99, int(95 * rows_done / rows_total)) if rows_total else 50
+                        await update(
+                            progress=progress, rows_done=rows_done,
+                            rows_per_sec=round(rows_done / elapsed, 1) if elapsed > 0 else None,
+                            message=f"已评分 {rows_done} 行"
+                        )
+                
+                await asyncio.to_thread(
+                    minio_service.client.fput_object, settings.minio_bucket_reports, report_key, report_path,
+                    content_type=REPORT_CONTENT_TYPES[request.format]
+                )
+            elapsed = time.perf_counter() - started
+            await update(
+                status=JobStatus.COMPLETED.value, progress=100, rows_done=rows_done, rows_total=rows_done,
+                rows_per_sec=round(rows_done / elapsed, 1) if elapsed > 0 else None,
+                report_key=report_key, message=f"评分完成，共 {rows_done} 行，耗时 {elapsed:.1f}s"
+            )
+            logger.info(f"Scoring job {job_id} completed: {rows_done} rows in {elapsed:.1f}s -> {report_key}")
+        except asyncio.CancelledError:
+            await update(status=JobStatus.FAILED.value, message="评分任务已取消")
+            raise
+        except Exception as e:
+            logger.error(f"Scoring job {job_id} failed: {e}")
+            await update(status=JobStatus.FAILED.value, message=f"评分失败: {e}")
+        finally:
+            for future in inflight:
+                future.cancel()
+            if chunks is not None:
+                chunks.close()
+    
     async def get_job_status(self, job_id: str) -> TrainingJob:
-        """获取训练状态 - 模拟实现"""
-        from datetime import datetime
-        
-        # 模拟训练状态
-        return TrainingJob(
-            job_id=job_id,
-            status="completed",
-            progress=100,
-            message="训练完成",
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-    
-    async def get_model_metrics(self, model_id: str) -> ModelMetrics:
-        """获取模型指标 - 模拟实现"""
-        # 使用固定的指标值，避免每次调用都变化
+        """从任务存储读取训练或评分任务进度"""
+        await self._get_job_store()
+        record = await asyncio.to_thread(self.job_store.get, job_id)
+        if record is None:
+            raise ValueError(f"Job not found: {job_id}")
+        return TrainingJob(**record)
+    
+    def _evaluate_version(self, version: str) -> Dict[str, Any]:
+        """在留出测试集上评估模型版本并保存报告和图表（在线程中执行）"""
+        service = get_model_registry().get(version)
+        report, plots = evaluate_model(
+            service, settings.evaluation_dataset_path,
+            threshold_steps=settings.evaluation_threshold_steps,
+            n_bins=settings.evaluation_calibration_bins
+        )
+        get_evaluation_store().save(version, report, plots)
+        return report
+    
+    async def _get_evaluation(self, model_id: str) -> Dict[str, Any]:
+        """模型版本的评估报告：两级缓存 -> 评估结果存储（本地/MinIO）-> 现场评估，同一版本的并发请求只评估一次"""
+        version = await self.resolve_model_version(None if model_id == "latest" else model_id)
+        cached = await self.evaluation_cache.get_many([version])
+        if version in cached:
+            return cached[version]
+        
+        lock = self.evaluation_locks.setdefault(version, asyncio.Lock())
+        async with lock:
+            cached = await self.evaluation_cache.get_many([version])
+            if version in cached:
+                return cached[version]
+            store = await asyncio.to_thread(get_evaluation_store)
+            report = await asyncio.to_thread(store.load_report, version)
+            if report is None:
+                report = await asyncio.to_thread(self._evaluate_version, version)
+            await self.evaluation_cache.set_many({version: report})
+        return report
+    
+    def _schedule_evaluation(self, version: str):
+        """模型加载或切换后在后台预先评估，首个指标请求无需等待"""
+        if not settings.evaluation_precompute or version in self.evaluation_tasks:
+            return
+        
+        async def precompute():
+            try:
+                await self._get_evaluation(version)
+            except Exception as e:
+                logger.warning(f"Precomputing evaluation of model {version} failed: {e}")
+        
+        task = asyncio.create_task(precompute())
+        self.evaluation_tasks[version] = task
+        task.add_done_callback(lambda _: self.evaluation_tasks.pop(version, None))
+    
+    async def get_model_metrics(self, model_id: str, threshold: float = 0.5) -> ModelMetrics:
+        """获取模型在留出测试集上的指标，MCC和混淆矩阵取预先计算的阈值网格中最接近 threshold 的点"""
+        report = await self._get_evaluation(model_id)
+        point = at_threshold(report, threshold)
+        version = report["version"]
         return ModelMetrics(
-            pr_auc=0.892,  # 固定值
-            mcc=0.756,     # 固定值
-            ece=0.067,     # 固定值
-            confusion=ConfusionMatrix(
-                tp=85,
-                fp=12,
-                tn=890,
-                fn=13
-            ),
+            pr_auc=report["pr_auc"],
+            mcc=point["mcc"],
+            ece=report["ece"],
+            confusion=ConfusionMatrix(tp=point["tp"], fp=point["fp"], tn=point["tn"], fn=point["fn"]),
             plots={
-                "pr_png": "/api/models/latest/plots/pr_curve.png",
-                "calib_png": "/api/models/latest/plots/calibration.png"
-            }
+                "pr_png": f"/api/models/{version}/plots/pr_curve.png",
+                "calib_png": f"/api/models/{version}/plots/calibration.png"
+            },
+            version=version,
+            threshold=point["threshold"],
+            n_samples=report["n_samples"]
+        )
+    
+    async def get_threshold_curve(self, model_id: str) -> ThresholdCurve:
+        """预先计算的各阈值指标，供阈值滑块直接查表"""
+        report = await self._get_evaluation(model_id)
+        sweep = report["thresholds"]
+        points = [dict(zip(sweep, values)) for values in zip(*sweep.values())]
+        return ThresholdCurve(
+            version=report["version"],
+            n_samples=report["n_samples"],
+            n_positive=report["n_positive"],
+            points=[ThresholdMetrics(**point) for point in points]
         )
+    
+    async def get_model_plot(self, model_id: str, name: str) -> Path:
+        """评估图表的本地文件路径，图表不存在时抛出 ValueError"""
+        report = await self._get_evaluation(model_id)
+        store = await asyncio.to_thread(get_evaluation_store)
+        path = await asyncio.to_thread(store.plot_path, report["version"], name)
+        if path is None:
+            raise ValueError(f"Plot not found: {name}")
+        return path
+    
+    def get_inference_stats(self) -> Dict[str, Any]:
+        """推理执行器、微批处理与预测缓存统计"""
+        return {
+            "executor": self.executor.stats(),
+            "curve_executor": self.curve_executor.stats(),
+            "microbatch": self.batcher.stats(),
+            "cache": self.prediction_cache.stats(),
+            "training": self.training_runner.stats() if self.training_runner else None
+        }
+    
+    async def close(self):
+        """关闭推理执行器和客户端连接"""
+        tasks = [*self.scoring_tasks.values(), *self.activation_tasks.values(), *self.evaluation_tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await self.batcher.close()
+        self.executor.shutdown()
+        self.curve_executor.shutdown()
+        shutdown_curve_pipeline()
+        if self.training_runner is not None:
+            self.training_runner.shutdown()
+        await super().close()
 
 
 class RemoteModelAdapter(ModelAdapter):
@@ -239,9 +948,9 @@ class RemoteModelAdapter(ModelAdapter):
         job_data = response.json()
         return TrainingJob(**job_data)
     
-    async def get_model_metrics(self, model_id: str) -> ModelMetrics:
+    async def get_model_metrics(self, model_id: str, threshold: float = 0.5) -> ModelMetrics:
         """获取远程模型的指标"""
-        response = await self.client.get(f"/models/{model_id}/metrics")
+        response = await self.client.get(f"/models/{model_id}/metrics", params={"threshold": threshold})
         response.raise_for_status()
         metrics_data = response.json()
         return ModelMetrics(**metrics_data)
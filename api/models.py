@@ -1,6 +1,6 @@
 from typing import Dict, List, Optional, Union, Any
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
 
 
@@ -64,26 +64,79 @@ class TabularRow(BaseModel):
 class TabularPredictRequest(BaseModel):
     rows: List[TabularRow]
     threshold: float = Field(0.5, ge=0.0, le=1.0, description="决策阈值")
+    model_version: Optional[str] = Field(None, description="模型版本，默认使用当前默认版本")
 
 
 class CurvePredictRequest(BaseModel):
-    curve: List[float] = Field(..., description="光变曲线数据")
+    curve: Optional[List[float]] = Field(None, description="光变曲线数据（与curve_id二选一）")
+    curve_id: Optional[str] = Field(None, description="已存储的光变曲线ID（/api/curves 上传），代替内联数据")
     time: Optional[List[float]] = Field(None, description="时间序列（可选）")
     threshold: float = Field(0.5, ge=0.0, le=1.0, description="决策阈值")
+    object_id: Optional[str] = Field(None, description="目标ID（可选）")
+    period: Optional[float] = Field(None, gt=0, description="已知周期（天，可选），提供时按周期折叠后检测")
+    epoch: Optional[float] = Field(None, description="凌星中心时间（可选，与time同一时间基准）")
+    search_period: bool = Field(False, description="未提供周期时先做BLS周期搜索，返回KOI风格的候选参数")
+
+    @model_validator(mode="after")
+    def check_curve_source(self):
+        if (self.curve is None) == (self.curve_id is None):
+            raise ValueError("需要且只能提供 curve 或 curve_id 之一")
+        return self
+
+
+class CurveBatchPredictRequest(BaseModel):
+    curves: List[CurvePredictRequest] = Field(..., min_length=1, description="一批光变曲线，整批处理")
 
 
 class FusePredictRequest(BaseModel):
     tabular_data: TabularRow
-    curve_data: List[float]
-    alpha: float = Field(0.7, ge=0.0, le=1.0, description="融合权重")
+    curve_data: Optional[List[float]] = Field(None, description="光变曲线数据（与curve_id二选一）")
+    curve_id: Optional[str] = Field(None, description="已存储的光变曲线ID")
+    curve_time: Optional[List[float]] = Field(None, description="光变曲线时间序列（可选）")
+    alpha: float = Field(0.7, ge=0.0, le=1.0, description="融合权重（表格模型概率的权重）")
     threshold: float = Field(0.5, ge=0.0, le=1.0, description="决策阈值")
 
+    @model_validator(mode="after")
+    def check_curve_source(self):
+        if (self.curve_data is None) == (self.curve_id is None):
+            raise ValueError("需要且只能提供 curve_data 或 curve_id 之一")
+        return self
+
+
+class CurveUploadRequest(BaseModel):
+    curve_id: str = Field(..., description="曲线ID（字母、数字和 . _ -）")
+    time: List[float] = Field(..., description="时间序列（天）")
+    flux: List[float] = Field(..., description="通量")
+    flux_err: Optional[List[float]] = Field(None, description="通量误差（可选）")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="目标元数据")
+
+
+class StoredCurve(BaseModel):
+    curve_id: str
+    n_points: int
+    time_offset: float = Field(..., description="时间列的基准值，文件中存相对时间")
+    columns: List[str]
+    size: int = Field(..., description="文件字节数")
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class FuseBatchPredictRequest(BaseModel):
+    pairs: List[FusePredictRequest] = Field(..., min_length=1, description="一批 (表格行, 光变曲线) 对")
+
 
 class TrainingRequest(BaseModel):
     dataset_id: str
     config: Dict[str, Any] = Field(default_factory=dict, description="训练配置")
 
 
+class ScoringRequest(BaseModel):
+    threshold: float = Field(0.5, ge=0.0, le=1.0, description="分类阈值")
+    top_k: int = Field(5, ge=0, le=40, description="报告中每行保留的SHAP特征数")
+    format: str = Field("parquet", pattern="^(parquet|csv)$", description="报告格式")
+    chunk_rows: Optional[int] = Field(None, ge=1, le=100000, description="每块行数，默认使用配置值")
+    model_version: Optional[str] = Field(None, description="模型版本，默认使用提交时的默认版本")
+
+
 class FeedbackRequest(BaseModel):
     target_id: str
     user_label: str = Field(..., pattern="^(CONF|PC|FP)$", description="用户标注")
@@ -118,15 +171,33 @@ class TabularExplanation(BaseModel):
 
 
 class ExoplanetPrediction(BaseModel):
+    object_id: Optional[str] = Field(None, description="目标ID")
     probs: Probabilities
     conf: float = Field(..., description="预测置信度")
     version: str = Field(..., description="模型版本")
     explain: Optional[TabularExplanation] = None
     importance: Optional[List[float]] = Field(None, description="时间序列重要性")
+    detection: Optional[Dict[str, Union[float, bool]]] = Field(None, description="光变曲线检测参数（SNR、深度等）")
 
 
 class PredictionResponse(BaseModel):
     predictions: List[ExoplanetPrediction]
+    timing: Optional[Dict[str, float]] = Field(None, description="推理耗时（毫秒）")
+    prediction_id: Optional[str] = Field(None, description="原始概率的缓存ID，用于按新阈值重算")
+
+
+class RethresholdRequest(BaseModel):
+    prediction_id: str = Field(..., description="表格预测返回的prediction_id")
+    threshold: float = Field(..., ge=0.0, le=1.0, description="新的分类阈值")
+
+
+class DatasetColumn(BaseModel):
+    name: str
+    dtype: str
+    null_count: Optional[int] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
 
 
 class Dataset(BaseModel):
@@ -135,6 +206,11 @@ class Dataset(BaseModel):
     size: int
     filename: str
     uploaded_at: datetime
+    content_type: Optional[str] = None
+    row_count: Optional[int] = Field(None, description="数据行数（不含表头和注释行）")
+    columns: Optional[List[DatasetColumn]] = Field(None, description="列名及推断的类型")
+    checksum: Optional[str] = Field(None, description="SHA-256校验和")
+    columnar_key: Optional[str] = Field(None, description="列式Parquet副本的对象键")
 
 
 class TrainingJob(BaseModel):
@@ -142,6 +218,14 @@ class TrainingJob(BaseModel):
     status: JobStatus
     progress: int = Field(..., ge=0, le=100, description="进度百分比")
     message: Optional[str] = None
+    dataset_id: Optional[str] = None
+    metrics: Optional[Dict[str, float]] = Field(None, description="测试集指标")
+    model_version: Optional[str] = Field(None, description="训练产出的模型版本")
+    kind: str = Field("training", description="任务类型：training 或 scoring")
+    rows_done: Optional[int] = Field(None, description="评分任务已处理行数")
+    rows_total: Optional[int] = Field(None, description="评分任务总行数")
+    rows_per_sec: Optional[float] = Field(None, description="评分吞吐量（行/秒）")
+    report_key: Optional[str] = Field(None, description="评分报告在reports存储桶中的对象键")
     created_at: datetime
     updated_at: datetime
 
@@ -150,6 +234,10 @@ class TrainingResponse(BaseModel):
     job_id: str
 
 
+class ScoringResponse(BaseModel):
+    job_id: str
+
+
 class ConfusionMatrix(BaseModel):
     tp: int
     fp: int
@@ -163,6 +251,28 @@ class ModelMetrics(BaseModel):
     ece: float = Field(..., description="期望校准误差")
     confusion: ConfusionMatrix
     plots: Dict[str, str] = Field(..., description="图表URL")
+    version: Optional[str] = Field(None, description="评估的模型版本")
+    threshold: Optional[float] = Field(None, description="MCC和混淆矩阵对应的阈值")
+    n_samples: Optional[int] = Field(None, description="留出测试集样本数")
+
+
+class ThresholdMetrics(BaseModel):
+    threshold: float
+    precision: float
+    recall: float
+    f1: float
+    mcc: float
+    tp: int
+    fp: int
+    tn: int
+    fn: int
+
+
+class ThresholdCurve(BaseModel):
+    version: str
+    n_samples: int
+    n_positive: int
+    points: List[ThresholdMetrics] = Field(..., description="各阈值下的混淆矩阵和指标（阈值升序）")
 
 
 class FeedbackResponse(BaseModel):
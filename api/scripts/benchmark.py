@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+推理性能基准脚本
+用于对比不同实现路径的延迟
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+# 添加父目录到路径以便导入模型服务
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.model_service import ModelService  # noqa: E402
+
+
+def measure(fn, repeat: int) -> dict:
+    """多次运行并返回 p50/p99 延迟（毫秒）"""
+    fn()  # 预热
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(samples, [50, 99])
+    return {"p50": p50, "p99": p99}
+
+
+def make_rows(features, n_rows: int, seed: int = 42) -> list:
+    """生成随机KOI特征行（约5%缺失值）"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n_rows, len(features)))
+    missing = rng.random(size=values.shape) < 0.05
+    return [
+        {f: (None if missing[i, j] else float(values[i, j])) for j, f in enumerate(features)}
+        for i in range(n_rows)
+    ]
+
+
+def print_table(title: str, columns: list, results: dict):
+    print(f"\n{title}")
+    print(f"{'rows':>8} " + " ".join(f"{c + ' p50':>16} {c + ' p99':>16}" for c in columns))
+    for n_rows, row in results.items():
+        print(f"{n_rows:>8} " + " ".join(
+            f"{row[c]['p50']:>13.3f} ms {row[c]['p99']:>13.3f} ms" for c in columns
+        ))
+
+
+def bench_features(service: ModelService, sizes: list, repeat: int):
+    """特征准备：DataFrame路径 vs 预编译特征布局"""
+    results = {}
+    for n_rows in sizes:
+        rows = make_rows(service.features, n_rows)
+        assert np.allclose(service._prepare_features_dataframe(rows), service._prepare_features(rows))
+        results[n_rows] = {
+            "dataframe": measure(lambda: service._prepare_features_dataframe(rows), repeat),
+            "layout": measure(lambda: service._prepare_features(rows), repeat),
+        }
+    print_table("特征准备 (DataFrame vs FeatureLayout)", ["dataframe", "layout"], results)
+
+
+def bench_backend(service: ModelService, sizes: list, repeat: int):
+    """概率预测：CatBoost predict_proba vs 编译后的NumPy对称树评估器"""
+    from ml.oblivious import ObliviousTreeEnsemble
+
+    if service.model_type != "catboost":
+        raise SystemExit(f"backend benchmark requires a CatBoost model, got {service.model_type}")
+    compiled = ObliviousTreeEnsemble.from_catboost(service.model)
+    results = {}
+    for n_rows in sizes:
+        feature_data = service._prepare_features(make_rows(service.features, n_rows))
+        max_diff = np.abs(compiled.predict_proba(feature_data) - service.model.predict_proba(feature_data)).max()
+        assert max_diff < 1e-9, f"compiled backend differs by {max_diff:.2e} at {n_rows} rows"
+        results[n_rows] = {
+            "catboost": measure(lambda: service.model.predict_proba(feature_data), repeat),
+            "compiled": measure(lambda: compiled.predict_proba(feature_data), repeat),
+        }
+    print_table(
+        f"概率预测 (CatBoost vs compiled, {compiled.n_trees} trees depth {compiled.depth})",
+        ["catboost", "compiled"], results
+    )
+
+
+def bench_explain(service: ModelService, sizes: list, repeat: int):
+    """逐行SHAP top-5：shap.TreeExplainer vs 对称树精确TreeSHAP（预计算叶子贡献）"""
+    import shap
+    from ml.explainer import BatchExplainer
+
+    tree_shap = service.explainer.tree_shap
+    if tree_shap is None:
+        raise SystemExit("oblivious TreeSHAP is not enabled for this model (EXPLAINER_BACKEND=oblivious)")
+    reference = BatchExplainer(service.model, service.model_type, service.explainer.feature_names)
+    explainer = shap.TreeExplainer(service.model)
+    results = {}
+    for n_rows in sizes:
+        feature_data = service._prepare_features(make_rows(service.features, n_rows))
+        max_diff = np.abs(tree_shap.shap_values(feature_data)[:, :, 0] - explainer.shap_values(feature_data)).max()
+        assert max_diff < 1e-9, f"oblivious TreeSHAP differs by {max_diff:.2e} at {n_rows} rows"
+        results[n_rows] = {
+            "shap": measure(lambda: reference.top_k_for(feature_data, 5), repeat),
+            "oblivious": measure(lambda: service.explainer.top_k_for(feature_data, 5), repeat),
+        }
+    print_table("SHAP top-5 (shap.TreeExplainer vs oblivious TreeSHAP)", ["shap", "oblivious"], results)
+
+
+def make_light_curve(n_points: int, seed: int = 42):
+    """生成含周期凌星的27天光变曲线（白噪声 + 恒星变化）"""
+    rng = np.random.default_rng(seed)
+    time = np.sort(rng.uniform(0, 27, n_points))
+    flux = 1 + rng.normal(0, 0.002, n_points) + 0.001 * np.sin(2 * np.pi * time / 6)
+    flux[np.abs(((time - 1.3) / 3.1 + 0.5) % 1 - 0.5) * 3.1 < 0.06] -= 0.002
+    return time, flux
+
+
+def bench_bls(service, sizes: list, repeat: int):
+    """BLS：逐周期/逐相位的朴素实现 vs 按周期块向量化的前缀和实现（100个试验周期；sizes为采样点数）"""
+    from ml.bls import DEFAULT_DURATIONS_HR, _duration_bins, bls_naive, evaluate_periods, prepare
+
+    periods = np.linspace(0.8, 10.0, 100)
+    duration_bins = _duration_bins(np.asarray(DEFAULT_DURATIONS_HR[:5]) / 24, 0.01)
+    results = {}
+    for n_points in sizes:
+        state = prepare(*make_light_curve(n_points))
+        naive = bls_naive(state, periods[:5], duration_bins)
+        assert np.allclose(naive, evaluate_periods(state, periods[:5], duration_bins)["power"], rtol=1e-9, atol=1e-18)
+        results[n_points] = {
+            "naive": measure(lambda: bls_naive(state, periods, duration_bins), min(repeat, 2)),
+            "vectorized": measure(lambda: evaluate_periods(state, periods, duration_bins), repeat),
+        }
+    print_table("BLS power spectrum, 100 periods (naive vs vectorized)", ["naive", "vectorized"], results)
+
+
+BENCHMARKS = {
+    "features": bench_features,
+    "backend": bench_backend,
+    "explain": bench_explain,
+    "bls": bench_bls,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ExoQuest 推理性能基准")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="要运行的基准")
+    parser.add_argument("--sizes", default="1,10,100,1000,10000", help="批大小列表（逗号分隔）")
+    parser.add_argument("--repeat", type=int, default=50, help="每个批大小的重复次数")
+    parser.add_argument("--models-dir", default=os.getenv("MODEL_PATH", "models"), help="模型目录")
+    args = parser.parse_args()
+
+    # 旧的DataFrame路径在含None的输入上会触发pandas的降级警告
+    warnings.simplefilter("ignore", FutureWarning)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    service = None if args.benchmark == "bls" else ModelService(args.models_dir)
+    BENCHMARKS[args.benchmark](service, sizes, args.repeat)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+导入耗时报告
+在干净的子进程中用 python -X importtime 导入API入口模块，按顶层包汇总累计导入耗时，
+并分别测量延迟导入的重量级库（catboost/lightgbm/shap）首次导入的耗时
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ("catboost", "lightgbm", "shap")
+
+
+def measure(statement: str):
+    """在子进程中执行导入语句，返回 [(自身微秒, 模块名)]"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=API_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return rows
+
+
+def breakdown(rows, top: int):
+    """按顶层包汇总各模块的自身导入耗时（每个模块只计一次）"""
+    by_package = defaultdict(int)
+    for self_us, name in rows:
+        by_package[name.split(".")[0]] += self_us
+    total = sum(by_package.values())
+    return total, sorted(by_package.items(), key=lambda item: -item[1])[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ExoQuest API 导入耗时报告")
+    parser.add_argument("--module", default="main", help="要测量的入口模块")
+    parser.add_argument("--top", type=int, default=15, help="显示的顶层包数量")
+    args = parser.parse_args()
+
+    total, packages = breakdown(measure(f"import {args.module}"), args.top)
+    print(f"import {args.module}: {total / 1000:.0f}ms")
+    for package, self_us in packages:
+        print(f"  {package:<24} {self_us / 1000:>8.0f}ms {100 * self_us / total:>5.1f}%")
+
+    # 延迟导入的库：启动时不加载，首次加载模型/首次解释时才付出的成本
+    print("\ndeferred (paid on first model load / first explanation):")
+    for module in DEFERRED_MODULES:
+        try:
+            module_total, _ = breakdown(measure(f"import {module}"), 1)
+            print(f"  {module:<24} {module_total / 1000:>8.0f}ms")
+        except RuntimeError as e:
+            print(f"  {module:<24} {'unavailable':>10} ({e})")
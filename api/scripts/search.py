@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+超参数搜索脚本
+在进程池中并行运行Optuna试验（共享SQLite/RDB研究存储，支持剪枝和断点续跑）
+"""
+
+import argparse
+import json
+import os
+import sys
+import warnings
+
+# 添加父目录到路径以便导入训练模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.search import PRUNERS, SEARCH_SPACES, run_search  # noqa: E402
+from ml.training import preprocess_koi, read_koi_table  # noqa: E402
+
+DEFAULT_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "Model", "data", "Kepler Objects of Interest (KOI).csv"
+)
+
+
+def print_summary(results: list):
+    baseline = results[0]["wall_seconds"] if len(results) > 1 else None
+    print(f"\n{'mode':>28} {'wall':>10} {'complete':>9} {'pruned':>7} {'best PR-AUC':>12} {'speedup':>8}")
+    for label, result in zip(["serial (no pruning)", "parallel"] if baseline else ["search"], results):
+        best = f"{result['best_value']:.4f}" if result["best_value"] is not None else "-"
+        speedup = f"{baseline / result['wall_seconds']:.2f}x" if baseline and result["wall_seconds"] else "-"
+        print(f"{label:>28} {result['wall_seconds']:>9.1f}s {result['n_complete']:>9} "
+              f"{result['n_pruned']:>7} {best:>12} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ExoQuest 超参数搜索")
+    parser.add_argument("--model", choices=sorted(SEARCH_SPACES), default="catboost", help="模型类型")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="KOI CSV路径")
+    parser.add_argument("--trials", type=int, default=40, help="研究的目标试验总数（含已完成的）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument("--pruner", choices=PRUNERS, default="median", help="剪枝策略")
+    parser.add_argument("--folds", type=int, default=5, help="交叉验证折数")
+    parser.add_argument("--storage", default="sqlite:///optuna_search.db", help="研究存储URL")
+    parser.add_argument("--study-name", default=None, help="研究名称（同名研究会被续跑）")
+    parser.add_argument("--heartbeat", type=int, default=60, help="试验心跳间隔（秒），用于识别中断进程留下的试验")
+    parser.add_argument("--grace-period", type=int, default=None,
+                        help="心跳超过该秒数未更新的RUNNING试验视为中断并重新排队（默认两个心跳间隔）")
+    parser.add_argument("--params", default=None, help="固定参数（JSON），覆盖搜索空间，例如 '{\"iterations\": 200}'")
+    parser.add_argument("--compare-serial", action="store_true",
+                        help="先运行与notebook相同的串行无剪枝基线（内存存储），再报告并行加速比")
+    parser.add_argument("--output", default=None, help="将搜索结果写入JSON文件")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", UserWarning)
+    X_train, _, _, y_train, _, _, features, _ = preprocess_koi(read_koi_table(args.data))
+    fixed_params = json.loads(args.params) if args.params else None
+    study_name = args.study_name or f"{args.model}_pr_auc"
+    print(f"Search {study_name}: {len(X_train)} rows x {len(features)} features, "
+          f"{args.trials} trials, {args.workers} workers, pruner={args.pruner}")
+
+    results = []
+    if args.compare_serial:
+        results.append(run_search(
+            X_train, y_train, args.model, n_trials=args.trials, n_workers=1, storage=None,
+            study_name=f"{study_name}_serial", pruner="none", n_folds=args.folds, fixed_params=fixed_params
+        ))
+    results.append(run_search(
+        X_train, y_train, args.model, n_trials=args.trials, n_workers=args.workers, storage=args.storage,
+        study_name=study_name, pruner=args.pruner, n_folds=args.folds, fixed_params=fixed_params,
+        heartbeat_interval=args.heartbeat, grace_period=args.grace_period
+    ))
+
+    print_summary(results)
+    print(f"\nBest params: {json.dumps(results[-1]['best_params'])}")
+    if results[-1]["resumed_trials"]:
+        print(f"Resumed study with {results[-1]['resumed_trials']} finished trials")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
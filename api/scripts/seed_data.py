@@ -20,6 +20,9 @@ from io import StringIO
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import settings
+from services.curve_store import CurveStore
+
+SAMPLE_CURVE_ID = "sample-transit-001"
 
 
 async def create_sample_datasets():
@@ -82,6 +85,19 @@ async def create_sample_datasets():
         print("✓ 光变曲线示例数据已创建")
     except S3Error as e:
         print(f"✗ 创建光变曲线数据失败: {e}")
+    
+    # 4. 同一条光变曲线写入二进制曲线存储，预测请求可用 curve_id 引用
+    store = CurveStore(settings.curve_cache_dir, client=client, bucket=settings.minio_bucket_curves)
+    try:
+        if not client.bucket_exists(settings.minio_bucket_curves):
+            client.make_bucket(settings.minio_bucket_curves)
+        header = store.put_arrays(
+            SAMPLE_CURVE_ID, lightcurve_data['time'], lightcurve_data['flux'], lightcurve_data['flux_err'],
+            {k: v for k, v in lightcurve_data.items() if k not in ('time', 'flux', 'flux_err')}
+        )
+        print(f"✓ 二进制光变曲线已存储: {SAMPLE_CURVE_ID} ({header['n_points']} 点)")
+    except S3Error as e:
+        print(f"✗ 存储二进制光变曲线失败: {e}")
 
 
 def generate_kepler_sample():
@@ -213,6 +229,7 @@ if __name__ == "__main__":
         print("- kepler-452b-sample.csv: 开普勒-452b单个目标数据")
         print("- tess-sample-batch.csv: TESS批量目标数据 (100个)")
         print("- lightcurve-sample.json: 光变曲线时间序列数据")
+        print(f"- {SAMPLE_CURVE_ID}: 二进制光变曲线（curve_id）")
         
     except Exception as e:
         print(f"\n✗ 数据初始化失败: {e}")
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 文件格式：8字节魔数 + uint32 头部长度 + JSON头部（含各列字节偏移）+ 对齐后的 float32 列
+MAGIC = b"EXQLC01\0"
+ALIGN = 64
+COLUMNS = ("time", "flux", "flux_err")
+CURVES_PREFIX = "curves/"
+CURVE_CONTENT_TYPE = "application/x-exoquest-curve"
+
+_CURVE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+
+class CurveNotFoundError(ValueError):
+    """请求的光变曲线不存在"""
+
+
+class CurveFormatError(ValueError):
+    """光变曲线文件格式错误"""
+
+
+def validate_curve_id(curve_id: str) -> str:
+    """曲线ID直接用作文件名和对象键，只允许字母、数字和 . _ -"""
+    if not _CURVE_ID.match(curve_id or ""):
+        raise ValueError(f"Invalid curve id: {curve_id!r}")
+    return curve_id
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGN) * ALIGN
+
+
+def encode_curve(time: Sequence[float], flux: Sequence[float], flux_err: Optional[Sequence[float]] = None,
+                 metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """编码为二进制列式文件；时间以 time_offset（float64）为基准存相对值，float32 精度约为跨度的 1e-7"""
+    time = np.asarray(time, dtype=np.float64)
+    columns = {"time": time, "flux": np.asarray(flux, dtype=np.float64)}
+    if flux_err is not None:
+        columns["flux_err"] = np.asarray(flux_err, dtype=np.float64)
+    n_points = len(time)
+    for name, values in columns.items():
+        if values.ndim != 1 or len(values) != n_points:
+            raise CurveFormatError(f"Column {name} must be 1-D with {n_points} points")
+    time_offset = float(np.nanmin(time)) if n_points else 0.0
+    columns["time"] = time - time_offset
+
+    def header_bytes(offsets):
+        header = {
+            "n_points": n_points,
+            "dtype": "<f4",
+            "time_offset": time_offset,
+            "columns": offsets,
+            "metadata": metadata or {}
+        }
+        return json.dumps(header, separators=(",", ":")).encode()
+
+    # 头部长度依赖偏移量的位数：从一个对齐块开始，放不下头部时加大数据起点重新计算
+    start = ALIGN
+    while True:
+        offsets, position = {}, start
+        for name in columns:
+            offsets[name] = position
+            position += _aligned(4 * n_points)
+        header = header_bytes(offsets)
+        needed = _aligned(len(MAGIC) + 4 + len(header))
+        if needed <= start:
+            break
+        start = needed
+
+    buffer = bytearray(position)
+    buffer[:len(MAGIC)] = MAGIC
+    buffer[len(MAGIC):len(MAGIC) + 4] = struct.pack("<I", len(header))
+    buffer[len(MAGIC) + 4:len(MAGIC) + 4 + len(header)] = header
+    for name, values in columns.items():
+        data = values.astype("<f4").tobytes()
+        buffer[offsets[name]:offsets[name] + len(data)] = data
+    return bytes(buffer)
+
+
+def read_header(path: Path) -> Dict[str, Any]:
+    """只读取文件头部（列偏移、点数和元数据）"""
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + 4)
+        if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+            raise CurveFormatError(f"Not a light-curve file: {path.name}")
+        (length,) = struct.unpack("<I", prefix[len(MAGIC):])
+        try:
+            return json.loads(f.read(length))
+        except ValueError as e:
+            raise CurveFormatError(f"Corrupt light-curve header: {path.name}") from e
+
+
+def _check_columns(header: Dict[str, Any], size: int):
+    """校验头部的列偏移都在 size 字节的文件范围内"""
+    try:
+        n_points = int(header["n_points"])
+        offsets = header["columns"]
+    except (KeyError, TypeError, ValueError) as e:
+        raise CurveFormatError("Corrupt light-curve header") from e
+    if "time" not in offsets or "flux" not in offsets:
+        raise CurveFormatError("Light-curve file needs time and flux columns")
+    for name, offset in offsets.items():
+        if name not in COLUMNS or offset % 4 or offset + 4 * n_points > size:
+            raise CurveFormatError(f"Column {name} is out of bounds")
+
+
+def parse_curve(data: bytes) -> Dict[str, Any]:
+    """校验上传的二进制曲线文件，返回头部（列都在文件范围内）"""
+    if len(data) < len(MAGIC) + 4 or data[:len(MAGIC)] != MAGIC:
+        raise CurveFormatError("Not a light-curve file")
+    (length,) = struct.unpack("<I", data[len(MAGIC):len(MAGIC) + 4])
+    try:
+        header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+    except ValueError as e:
+        raise CurveFormatError("Corrupt light-curve header") from e
+    _check_columns(header, len(data))
+    return header
+
+
+class CurveStore:
+    """二进制光变曲线存储 - 每个目标一个 float32 列式文件，存放在MinIO并缓存到本地，读取时 np.memmap 零拷贝映射
+
+    文件不可变：写入时先落到临时文件再原子改名，缓存中已有的文件直接映射，不再访问MinIO。
+    """
+
+    def __init__(self, cache_dir: str, client=None, bucket: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.client = client
+        self.bucket = bucket
+        self._headers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, curve_id: str) -> Path:
+        return self.cache_dir / f"{validate_curve_id(curve_id)}.lcb"
+
+    def _write_local(self, curve_id: str, data: bytes) -> Path:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self._path(curve_id)
+        fd, tmp = tempfile.mkstemp(prefix=f".{curve_id}-", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._headers.pop(curve_id, None)
+        return target
+
+    def put(self, curve_id: str, data: bytes) -> Dict[str, Any]:
+        """保存已编码的曲线文件（本地缓存 + MinIO），返回头部"""
+        header = parse_curve(data)
+        path = self._write_local(curve_id, data)
+        if self.client is not None:
+            self.client.fput_object(self.bucket, f"{CURVES_PREFIX}{curve_id}.lcb", str(path),
+                                    content_type=CURVE_CONTENT_TYPE)
+        logger.info(f"Stored light curve {curve_id} ({header['n_points']} points, {len(data)} bytes)")
+        return header
+
+    def staging_file(self, curve_id: str) -> Tuple[int, str]:
+        """在缓存目录中创建上传用的临时文件，返回 (fd, 路径)，之后由 put_file 原子改名"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return tempfile.mkstemp(prefix=f".{validate_curve_id(curve_id)}-upload-", dir=self.cache_dir)
+
+    def put_file(self, curve_id: str, path: str) -> Dict[str, Any]:
+        """保存已落盘的曲线文件（staging_file 创建，流式写入的上传），校验后移入缓存并上传MinIO"""
+        source = Path(path)
+        header = read_header(source)
+        size = source.stat().st_size
+        _check_columns(header, size)
+        target = self._path(curve_id)
+        os.replace(source, target)
+        with self._lock:
+            self._headers.pop(curve_id, None)
+        if self.client is not None:
+            self.client.fput_object(self.bucket, f"{CURVES_PREFIX}{curve_id}.lcb", str(target),
+                                    content_type=CURVE_CONTENT_TYPE)
+        logger.info(f"Stored light curve {curve_id} ({header['n_points']} points, {size} bytes)")
+        return header
+
+    def put_arrays(self, curve_id: str, time, flux, flux_err=None, metadata=None) -> Dict[str, Any]:
+        """编码并保存一条曲线"""
+        return self.put(curve_id, encode_curve(time, flux, flux_err, metadata))
+
+    def ensure_local(self, curve_id: str) -> Path:
+        """返回曲线的本地文件，缓存中没有时从MinIO下载；不存在时抛出 CurveNotFoundError"""
+        path = self._path(curve_id)
+        if path.exists():
+            return path
+        if self.client is None:
+            raise CurveNotFoundError(f"Light curve not found: {curve_id}")
+        from minio.error import S3Error
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{curve_id}-", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            self.client.fget_object(self.bucket, f"{CURVES_PREFIX}{curve_id}.lcb", tmp)
+            os.replace(tmp, path)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchBucket"):
+                raise CurveNotFoundError(f"Light curve not found: {curve_id}") from e
+            raise
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        logger.info(f"Downloaded light curve {curve_id} to {path}")
+        return path
+
+    def header(self, curve_id: str) -> Dict[str, Any]:
+        """曲线头部（点数、列偏移、元数据），按ID缓存"""
+        with self._lock:
+            header = self._headers.get(curve_id)
+        if header is None:
+            header = read_header(self.ensure_local(curve_id))
+            with self._lock:
+                self._headers[curve_id] = header
+        return header
+
+    def open(self, curve_id: str) -> Dict[str, Any]:
+        """把各列映射为只读 np.memmap（不读取、不解析数据），time 为相对 time_offset 的值"""
+        header = self.header(curve_id)
+        path = self._path(curve_id)
+        n_points = header["n_points"]
+        columns = {
+            name: np.memmap(path, dtype=header["dtype"], mode="r", offset=offset, shape=(n_points,))
+            if n_points else np.zeros(0, dtype=np.float32)
+            for name, offset in header["columns"].items()
+        }
+        return {"time_offset": header["time_offset"], "metadata": header["metadata"], **columns}
+
+
+# 进程级曲线存储（API进程和推理工作进程各自一个，共享同一个本地缓存目录）
+_store: Optional[CurveStore] = None
+_store_lock = threading.Lock()
+
+
+def get_curve_store() -> CurveStore:
+    """获取本进程的光变曲线存储（单例，按配置创建）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                client = None
+                if settings.curve_store_source == "minio":
+                    from ml.model_registry import create_minio_client
+                    client = create_minio_client()
+                _store = CurveStore(settings.curve_cache_dir, client=client, bucket=settings.minio_bucket_curves)
+    return _store
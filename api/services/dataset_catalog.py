@@ -0,0 +1,138 @@
+import json
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 数据集元数据列；schema_json 为 [{"name": ..., "dtype": ...}] 的JSON
+CATALOG_COLUMNS = (
+    "dataset_id", "object_key", "filename", "size", "content_type",
+    "row_count", "schema_json", "checksum", "uploaded_at", "columnar_key"
+)
+
+
+class DatasetCatalog:
+    """数据集元数据索引（嵌入式SQLite）- 上传时写入，按dataset_id主键O(1)查找并支持分页列出"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """首次访问时才创建数据库文件和表（导入模块时不触碰磁盘）；调用方已持有 self._lock"""
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS datasets (
+                    dataset_id TEXT PRIMARY KEY,
+                    object_key TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_type TEXT,
+                    row_count INTEGER,
+                    schema_json TEXT,
+                    checksum TEXT,
+                    uploaded_at TEXT NOT NULL,
+                    columnar_key TEXT
+                )
+                """
+            )
+            # 早期创建的索引库没有 columnar_key 列
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(datasets)")}
+            if "columnar_key" not in existing:
+                conn.execute("ALTER TABLE datasets ADD COLUMN columnar_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_datasets_uploaded_at ON datasets (uploaded_at)")
+            # 行偏移索引：offsets[k] 为第 k*stride 个数据行在文件中的字节偏移（int64数组）
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS row_index (
+                    dataset_id TEXT PRIMARY KEY,
+                    stride INTEGER NOT NULL,
+                    header TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    offsets BLOB NOT NULL
+                )
+                """
+            )
+        return conn
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        schema_json = record.pop("schema_json")
+        record["columns"] = json.loads(schema_json) if schema_json else None
+        return record
+
+    def add(self, record: Dict[str, Any]):
+        """写入（或覆盖）一个数据集的元数据"""
+        values = dict(record)
+        values["schema_json"] = json.dumps(values.pop("columns")) if values.get("columns") is not None else None
+        values["uploaded_at"] = str(values["uploaded_at"])
+        placeholders = ", ".join("?" for _ in CATALOG_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO datasets ({', '.join(CATALOG_COLUMNS)}) VALUES ({placeholders})",
+                [values.get(column) for column in CATALOG_COLUMNS]
+            )
+
+    def get(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM datasets WHERE dataset_id = ?", (dataset_id,)).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def list(self, offset: int = 0, limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """按上传时间倒序分页，返回 (当前页记录, 总数)"""
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT * FROM datasets ORDER BY uploaded_at DESC, dataset_id LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [self._to_record(row) for row in rows], total
+
+    def set_row_index(self, dataset_id: str, index: Dict[str, Any]):
+        """写入数据集的行偏移索引（DatasetProfiler.finish() 的 row_index）"""
+        offsets = array("q", index["offsets"]).tobytes()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO row_index (dataset_id, stride, header, row_count, size, offsets) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (dataset_id, index["stride"], index["header"], index["row_count"], index["size"], offsets)
+            )
+
+    def get_row_index(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM row_index WHERE dataset_id = ?", (dataset_id,)).fetchone()
+        if row is None:
+            return None
+        index = dict(row)
+        offsets = array("q")
+        offsets.frombytes(index["offsets"])
+        index["offsets"] = offsets
+        return index
+
+    def delete(self, dataset_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM datasets WHERE dataset_id = ?", (dataset_id,))
+            self._conn.execute("DELETE FROM row_index WHERE dataset_id = ?", (dataset_id,))
+        return cursor.rowcount > 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
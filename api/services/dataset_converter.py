@@ -0,0 +1,191 @@
+import io
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 列式副本在数据集存储桶中的前缀
+COLUMNAR_PREFIX = "columnar/"
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+
+def _arrow_types(columns: List[Dict[str, str]], widen: bool) -> Dict[str, Any]:
+    """由采样推断的pandas类型得到Arrow列类型；widen 时整数放宽为float64、布尔放宽为字符串"""
+    types = {}
+    for column in columns:
+        dtype = column["dtype"]
+        if dtype.startswith("int"):
+            types[column["name"]] = pa.float64() if widen else pa.int64()
+        elif dtype.startswith("float"):
+            types[column["name"]] = pa.float64()
+        elif dtype == "bool":
+            types[column["name"]] = pa.string() if widen else pa.bool_()
+        else:
+            types[column["name"]] = pa.string()
+    return types
+
+
+class _ColumnStats:
+    """跨批次累计的列统计（数值列的min/max/mean，所有列的空值数）"""
+
+    def __init__(self, numeric: bool):
+        self.numeric = numeric
+        self.null_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def update(self, array):
+        self.null_count += array.null_count
+        if not self.numeric or array.null_count == len(array):
+            return
+        bounds = pc.min_max(array)
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.count += len(array) - array.null_count
+        self.total += pc.sum(array).as_py()
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"null_count": self.null_count}
+        if self.numeric:
+            stats.update(min=self.min, max=self.max, mean=self.total / self.count if self.count else None)
+        return stats
+
+
+def _write_parquet(raw, types: Dict[str, Any], dest_path: str, row_group_rows: int,
+                   block_size: int) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    reader = pacsv.open_csv(
+        raw,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(column_types=types, strings_can_be_null=True)
+    )
+    schema = reader.schema
+    stats = {
+        field.name: _ColumnStats(pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+        for field in schema
+    }
+    n_rows = 0
+    pending, pending_rows = [], 0
+    with pq.ParquetWriter(dest_path, schema, compression="zstd") as writer:
+        for batch in reader:
+            for name, array in zip(batch.schema.names, batch.columns):
+                stats[name].update(array)
+            n_rows += batch.num_rows
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            # CSV块很小，攒够一个行组再写，保证压缩率和统计信息粒度
+            if pending_rows >= row_group_rows:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_rows)
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_rows)
+    return n_rows, {name: column.to_dict() for name, column in stats.items()}
+
+
+def convert_csv_to_parquet(raw, header_offset: int, columns: List[Dict[str, str]], dest_path: str,
+                           row_group_rows: int = 65536,
+                           block_size: int = 1 << 20) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """把CSV流式转换为zstd压缩的Parquet，返回 (行数, {列名: 统计})
+
+    raw 为可seek的二进制文件对象，从表头所在的字节偏移开始读取（跳过开头的注释行）；
+    列类型来自上传画像的采样推断，后续块与推断类型冲突时放宽类型重试一次。
+    """
+    if not PARQUET_AVAILABLE:
+        raise ImportError("PyArrow not available. Please install: pip install pyarrow")
+    error = None
+    for widen in (False, True):
+        raw.seek(header_offset)
+        try:
+            return _write_parquet(raw, _arrow_types(columns, widen), dest_path, row_group_rows, block_size)
+        except pa.ArrowInvalid as e:
+            logger.warning(f"Parquet conversion with {'widened' if widen else 'sampled'} types failed: {e}")
+            error = e
+    raise error
+
+
+class MinioObjectFile(io.RawIOBase):
+    """MinIO对象的只读随机访问文件 - 每次read按字节范围请求，供Parquet只读取页脚和所需列块"""
+
+    def __init__(self, client, bucket: str, object_key: str, size: Optional[int] = None):
+        self.client = client
+        self.bucket = bucket
+        self.object_key = object_key
+        self.size = size if size is not None else client.stat_object(bucket, object_key).size
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        response = self.client.get_object(self.bucket, self.object_key, offset=self.position, length=length)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def read_parquet_page(source, offset: int, limit: int,
+                      columns: Optional[List[str]] = None) -> Tuple[List[str], List[list], int]:
+    """只读取与 [offset, offset+limit) 相交的行组中的投影列，返回 (列名, 行值列表, 总行数)"""
+    parquet_file = pq.ParquetFile(source)
+    if columns is not None:
+        unknown = [column for column in columns if column not in parquet_file.schema_arrow.names]
+        if unknown:
+            raise KeyError(", ".join(unknown))
+    metadata = parquet_file.metadata
+    tables = []
+    start = 0
+    for i in range(metadata.num_row_groups):
+        n_rows = metadata.row_group(i).num_rows
+        if start + n_rows > offset and start < offset + limit:
+            table = parquet_file.read_row_group(i, columns=columns)
+            skip = max(0, offset - start)
+            tables.append(table.slice(skip, offset + limit - start - skip))
+        start += n_rows
+    if tables:
+        table = pa.concat_tables(tables)
+    else:
+        schema = parquet_file.schema_arrow
+        table = schema.empty_table().select(columns) if columns is not None else schema.empty_table()
+    names = table.column_names
+    values = [table.column(name).to_pylist() for name in names]
+    return names, [list(row) for row in zip(*values)], metadata.num_rows
+
+
+def read_parquet_columns(source, columns: Optional[List[str]] = None):
+    """按列投影读取整个Parquet为DataFrame"""
+    return pq.read_table(source, columns=columns).to_pandas()
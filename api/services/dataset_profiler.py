@@ -0,0 +1,167 @@
+import csv
+import hashlib
+import io
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DELIMITED_EXTENSIONS = (".csv", ".txt")
+# 空白字节（只含这些字节的行是空行，不计为数据行）
+_BLANK_BYTES = np.frombuffer(b" \t\r\n\x0b\x0c", dtype=np.uint8)
+_QUOTE = ord('"')
+
+
+class DatasetProfiler:
+    """增量数据集画像 - 按块喂入原始字节，计算校验和、行数、列类型和稀疏行偏移索引，不需要整个文件在内存中
+
+    数据行定义为表头之后的每个非空物理行，与按行分页读取时的定义一致。
+    引号字段中含换行符（一条记录跨多个物理行）时无法按物理行计数，此时不提供行数和行索引。
+    """
+
+    def __init__(self, filename: str, sample_rows: int = 1000, index_stride: int = 1000):
+        self.filename = filename
+        self.delimited = filename.lower().endswith(DELIMITED_EXTENSIONS)
+        self.sample_rows = sample_rows
+        self.index_stride = index_stride
+        self.size = 0
+        self.row_count = 0
+        self.row_offsets: List[int] = []  # 第 k*index_stride 个数据行的起始字节偏移
+        self._sha256 = hashlib.sha256()
+        self._buffer = b""  # 尚未遇到换行符的不完整行
+        self._buffer_offset = 0  # 缓冲区首字节在文件中的偏移
+        self._header: Optional[bytes] = None
+        self.header_offset = 0  # 表头行的字节偏移（跳过开头的注释行）
+        self._sample: List[bytes] = []
+        self._fast = False
+        self._line_start = 0  # 快速路径中当前（未结束）行的起始偏移
+        self._line_content = False  # 当前行是否已出现非空白字节
+        self._line_quotes = 0  # 当前行中引号个数的奇偶
+        self.multiline_records = False
+
+    def update(self, chunk: bytes):
+        if not chunk:
+            return
+        base = self.size
+        self.size += len(chunk)
+        self._sha256.update(chunk)
+        if not self.delimited:
+            return
+        if self._fast:
+            self._count_lines(chunk, base)
+            return
+
+        pos = self._buffer_offset
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        for line in lines:
+            self._feed_line(line, pos)
+            pos += len(line) + 1
+        self._buffer_offset = pos
+        if self._header is not None and len(self._sample) >= self.sample_rows:
+            # 表头和类型推断样本都已就绪，之后只需向量化地数非空行；
+            # 缓冲区中的半行作为快速路径的当前行，在下一块里遇到它的换行符时被计入
+            self._line_start = pos
+            self._line_content = bool(self._buffer.strip())
+            self._line_quotes = self._buffer.count(b'"') % 2
+            self._fast = True
+            self._buffer = b""
+
+    def _count_lines(self, chunk: bytes, base: int):
+        """快速路径：按换行符切分出的各行中只统计非空行，记录行号为步长整数倍的行的偏移"""
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        newlines = np.flatnonzero(data == ord("\n"))
+        # 前缀和：任意字节区间内的非空白字节数和引号数
+        content = np.r_[0, np.cumsum(~np.isin(data, _BLANK_BYTES))]
+        quotes = np.r_[0, np.cumsum(data == _QUOTE)]
+        if len(newlines):
+            starts = np.r_[0, newlines[:-1] + 1]
+            has_content = content[newlines] - content[starts] > 0
+            odd_quotes = (quotes[newlines] - quotes[starts]) % 2 == 1
+            # 第一行从上一块开始
+            has_content[0] |= self._line_content
+            odd_quotes[0] ^= bool(self._line_quotes)
+            line_starts = base + starts
+            line_starts[0] = self._line_start
+            if odd_quotes[has_content].any():
+                self.multiline_records = True
+
+            row_numbers = self.row_count + np.cumsum(has_content) - 1
+            marked = has_content & (row_numbers % self.index_stride == 0)
+            self.row_offsets.extend(line_starts[marked].tolist())
+            self.row_count += int(has_content.sum())
+
+            tail = newlines[-1] + 1
+            self._line_start = base + tail
+            self._line_content = bool(content[-1] - content[tail] > 0)
+            self._line_quotes = int(quotes[-1] - quotes[tail]) % 2
+        else:
+            self._line_content |= bool(content[-1] > 0)
+            self._line_quotes = (self._line_quotes + int(quotes[-1])) % 2
+
+    def _feed_line(self, line: bytes, offset: int):
+        if not line.strip():
+            return
+        if self._header is not None and line.count(b'"') % 2:
+            self.multiline_records = True
+        if self._header is None:
+            # NASA导出文件开头有几十行 # 注释
+            if not line.lstrip().startswith(b"#"):
+                self._header = line.rstrip(b"\r")
+                self.header_offset = offset
+            return
+        if self.row_count % self.index_stride == 0:
+            self.row_offsets.append(offset)
+        self.row_count += 1
+        if len(self._sample) < self.sample_rows:
+            self._sample.append(line)
+
+    @property
+    def checksum(self) -> str:
+        return self._sha256.hexdigest()
+
+    def _columns(self) -> Optional[List[Dict[str, str]]]:
+        """根据表头和前若干行推断列类型"""
+        if self._header is None:
+            return None
+        sample = b"\n".join([self._header] + self._sample).decode("utf-8-sig", errors="replace")
+        try:
+            df = pd.read_csv(io.StringIO(sample), low_memory=False)
+        except Exception:
+            names = next(csv.reader([self._header.decode("utf-8-sig", errors="replace")]))
+            return [{"name": name, "dtype": "object"} for name in names]
+        return [{"name": str(name), "dtype": str(dtype)} for name, dtype in df.dtypes.items()]
+
+    def finish(self) -> Dict[str, Any]:
+        """返回 {size, checksum, row_count, columns, header_offset, row_index}（非分隔文本文件的表格信息为None）"""
+        if self.delimited:
+            if self._fast:
+                if self._line_content:
+                    # 最后一行没有换行符
+                    if self._line_quotes:
+                        self.multiline_records = True
+                    if self.row_count % self.index_stride == 0:
+                        self.row_offsets.append(self._line_start)
+                    self.row_count += 1
+            elif self._buffer:
+                self._feed_line(self._buffer, self._buffer_offset)
+                self._buffer = b""
+        has_table = self.delimited and self._header is not None
+        # 跨行记录会使物理行号与记录号错位，不提供行数和行索引
+        indexable = has_table and not self.multiline_records
+        row_index = None
+        if indexable:
+            row_index = {
+                "stride": self.index_stride,
+                "header": self._header.decode("utf-8-sig", errors="replace"),
+                "row_count": self.row_count,
+                "size": self.size,
+                "offsets": self.row_offsets,
+            }
+        return {
+            "size": self.size,
+            "checksum": self.checksum,
+            "row_count": self.row_count if indexable else None,
+            "columns": self._columns() if has_table else None,
+            "header_offset": self.header_offset if has_table else None,
+            "row_index": row_index,
+        }
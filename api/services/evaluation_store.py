@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+from ml.evaluation import PLOT_NAMES
+
+logger = logging.getLogger(__name__)
+
+# MinIO中每个模型版本的评估结果放在 evaluations/<版本>/ 前缀下
+EVALUATIONS_PREFIX = "evaluations/"
+REPORT_FILE = "report.json"
+
+
+class EvaluationStore:
+    """模型评估结果存储 - 每个版本一个目录（report.json + 各图表PNG），保存在本地并（可选）上传到MinIO
+
+    模型版本不可变，评估结果写入后不再更新；本地没有时从MinIO下载，其他API实例无需重新评估。
+    """
+
+    def __init__(self, cache_dir: str, client=None, bucket: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.client = client
+        self.bucket = bucket
+        self._lock = threading.Lock()
+
+    def _dir(self, version: str) -> Path:
+        if not version or "/" in version or version.startswith("."):
+            raise ValueError(f"Invalid model version: {version!r}")
+        return self.cache_dir / version
+
+    def _write_local(self, version: str, name: str, data: bytes) -> Path:
+        target_dir = self._dir(version)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{name}-", dir=target_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target_dir / name)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return target_dir / name
+
+    def save(self, version: str, report: Dict[str, Any], plots: Dict[str, bytes]):
+        """保存评估报告和图表；报告最后写入，本地存在报告即表示该版本的结果完整"""
+        files = {f"{name}.png": data for name, data in plots.items()}
+        files[REPORT_FILE] = json.dumps(report, ensure_ascii=False).encode()
+        for name, data in files.items():
+            path = self._write_local(version, name, data)
+            if self.client is not None:
+                content_type = "application/json" if name == REPORT_FILE else "image/png"
+                self.client.fput_object(self.bucket, f"{EVALUATIONS_PREFIX}{version}/{name}", str(path),
+                                        content_type=content_type)
+        logger.info(f"Stored evaluation of model {version} ({len(plots)} plots)")
+
+    def _ensure_local(self, version: str, name: str) -> Optional[Path]:
+        """本地文件路径，缓存中没有时从MinIO下载；两处都没有时返回None"""
+        path = self._dir(version) / name
+        if path.exists():
+            return path
+        if self.client is None:
+            return None
+        from minio.error import S3Error
+
+        try:
+            response = self.client.get_object(self.bucket, f"{EVALUATIONS_PREFIX}{version}/{name}")
+            try:
+                data = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchBucket"):
+                return None
+            raise
+        return self._write_local(version, name, data)
+
+    def load_report(self, version: str) -> Optional[Dict[str, Any]]:
+        """读取已保存的评估报告，不存在时返回None"""
+        with self._lock:
+            path = self._ensure_local(version, REPORT_FILE)
+        if path is None:
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def plot_path(self, version: str, name: str) -> Optional[Path]:
+        """图表PNG的本地路径，不存在时返回None"""
+        if name not in PLOT_NAMES:
+            return None
+        with self._lock:
+            return self._ensure_local(version, f"{name}.png")
+
+
+_store: Optional[EvaluationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_evaluation_store() -> EvaluationStore:
+    """获取本进程的评估结果存储（单例，按配置创建）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                client = None
+                if settings.evaluation_store_source == "minio":
+                    from ml.model_registry import create_minio_client
+                    client = create_minio_client()
+                _store = EvaluationStore(settings.evaluation_cache_dir, client=client,
+                                         bucket=settings.minio_bucket_models)
+    return _store
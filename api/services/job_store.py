@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """任务状态存储基类 - API进程与训练工作进程共享，记录为可JSON序列化的字典"""
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _put(self, job_id: str, record: Dict[str, Any]):
+        raise NotImplementedError
+
+    def create(self, job_id: str, **fields) -> Dict[str, Any]:
+        """创建任务记录"""
+        now = datetime.utcnow().isoformat()
+        record = {"job_id": job_id, "created_at": now, "updated_at": now, **fields}
+        self._put(job_id, record)
+        return record
+
+    def update(self, job_id: str, **fields) -> Dict[str, Any]:
+        """合并更新任务记录（每个任务只有一个写入方，不需要加锁）"""
+        record = self.get(job_id) or {"job_id": job_id, "created_at": datetime.utcnow().isoformat()}
+        record.update(fields)
+        record["updated_at"] = datetime.utcnow().isoformat()
+        self._put(job_id, record)
+        return record
+
+
+class FileJobStore(JobStore):
+    """本地文件任务存储 - 每个任务一个JSON文件，原子替换写入"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _put(self, job_id: str, record: Dict[str, Any]):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(job_id))
+
+
+class RedisJobStore(JobStore):
+    """Redis任务存储 - 使用同步客户端，工作进程中按需重新连接"""
+
+    def __init__(self, url: str, ttl_seconds: int = 7 * 24 * 3600):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self._client = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, socket_connect_timeout=2)
+        return self._client
+
+    def __getstate__(self):
+        # 连接不能跨进程传递
+        state = self.__dict__.copy()
+        state["_client"] = None
+        return state
+
+    def _key(self, job_id: str) -> str:
+        return f"exoquest:job:{job_id}"
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    def _put(self, job_id: str, record: Dict[str, Any]):
+        self.client.set(self._key(job_id), json.dumps(record, ensure_ascii=False), ex=self.ttl_seconds)
+
+
+def create_job_store() -> JobStore:
+    """根据配置创建任务存储，auto 模式下Redis不可用时退化为本地文件"""
+    backend = settings.job_store_backend
+    if backend not in ("auto", "redis", "file"):
+        raise ValueError(f"Unsupported job store backend: {backend}")
+
+    if backend in ("auto", "redis"):
+        store = RedisJobStore(settings.redis_url, ttl_seconds=settings.job_ttl_seconds)
+        try:
+            store.client.ping()
+            logger.info("Using Redis job store")
+            return store
+        except Exception as e:
+            if backend == "redis":
+                raise
+            logger.warning(f"Redis unavailable, using local job store at {settings.job_store_dir}: {e}")
+
+    return FileJobStore(settings.job_store_dir)
@@ -1,22 +1,78 @@
+import csv
+import io
 import uuid
 import aiofiles
+import asyncio
 import logging
+import tempfile
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
 from minio import Minio
 from minio.error import S3Error
 from fastapi import UploadFile, HTTPException
 
 from config import settings
 from models import Dataset
+from services.dataset_catalog import DatasetCatalog
+from services.dataset_converter import (
+    COLUMNAR_PREFIX, PARQUET_AVAILABLE, PARQUET_CONTENT_TYPE,
+    MinioObjectFile, convert_csv_to_parquet, read_parquet_page
+)
+from services.dataset_profiler import DatasetProfiler
 
 logger = logging.getLogger(__name__)
 
+# MinIO不可用时返回的模拟数据集
+MOCK_DATASET_CSV = """target_name,koi_period,koi_duration,koi_depth,koi_model_snr,koi_steff,koi_slogg,koi_kepmag,koi_impact,koi_prad,koi_teq,koi_insol,koi_tce_plnt_num,koi_srad,ra,dec,crowding
+KIC-10000001,10.0,0.5,1000,15.0,5778,4.44,12.0,0.01,1.0,300.0,1000.0,1,1.0,180.0,0.0,0.9
+KIC-10000002,15.2,0.8,850,12.5,5500,4.2,14.1,0.015,0.8,280.0,750.0,1,0.9,185.0,5.0,0.85
+KIC-10000003,8.5,0.3,1200,18.2,6000,4.5,11.8,0.008,1.2,320.0,1200.0,1,1.1,175.0,-2.0,0.92"""
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过 max_file_size"""
+
+
+class _ProfilingReader:
+    """上传流包装 - MinIO按分片读取时顺带计算画像，并增量检查大小限制"""
+
+    def __init__(self, raw, profiler: DatasetProfiler, max_size: int):
+        self.raw = raw
+        self.profiler = profiler
+        self.max_size = max_size
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        if self.profiler.size + len(chunk) > self.max_size:
+            # 在MinIO完成分片上传之前抛出，put_object 会中止未完成的分片上传
+            raise UploadTooLargeError(f"Upload exceeds {self.max_size} bytes")
+        self.profiler.update(chunk)
+        return chunk
+
+
+def _parse_rows(header: str, lines: List[bytes], columns: Optional[List[str]]) -> Tuple[List[str], List[list]]:
+    """把表头和若干原始数据行解析为 (列名, 行值列表)，可选列投影"""
+    if columns is not None:
+        names = next(csv.reader([header]))
+        unknown = [column for column in columns if column not in names]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知的列: {', '.join(unknown)}")
+    body = header.encode("utf-8") + b"\n" + b"\n".join(lines)
+    df = pd.read_csv(io.BytesIO(body), usecols=columns, low_memory=False)
+    if columns is not None:
+        df = df[columns]
+    df = df.astype(object).where(df.notna(), None)
+    return [str(column) for column in df.columns], df.values.tolist()
+
 
 class MinIOService:
     """MinIO对象存储服务"""
     
     def __init__(self):
+        # 数据集元数据索引，避免按dataset_id查找时扫描整个存储桶
+        self.catalog = DatasetCatalog(settings.dataset_catalog_path)
         try:
             self.client = Minio(
                 settings.minio_endpoint,
@@ -24,14 +80,14 @@ class MinIOService:
                 secret_key=settings.minio_secret_key,
                 secure=settings.minio_secure
             )
-            self._ensure_buckets()
+            # 存储桶检查需要网络往返（MinIO不可达时会重试数秒），由启动钩子在后台执行
             self.available = True
         except Exception as e:
             print(f"MinIO service unavailable, running in mock mode: {e}")
             self.client = None
             self.available = False
     
-    def _ensure_buckets(self):
+    def ensure_buckets(self):
         """确保必要的存储桶存在"""
         if not self.client:
             return
@@ -39,7 +95,9 @@ class MinIOService:
         buckets = [
             settings.minio_bucket_datasets,
             settings.minio_bucket_reports,
-            settings.minio_bucket_feedback
+            settings.minio_bucket_feedback,
+            settings.minio_bucket_curves,
+            settings.minio_bucket_models
         ]
         
         for bucket in buckets:
@@ -72,75 +130,89 @@ class MinIOService:
                 detail=f"不支持的文件类型。允许的类型: {', '.join(settings.allowed_file_types)}"
             )
         
-        # 读取文件内容
-        content = await file.read()
-        file_size = len(content)
-        
-        # 检查文件大小
-        if file_size > settings.max_file_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"文件大小超过限制 ({settings.max_file_size / 1024 / 1024:.1f}MB)"
-            )
+        # 客户端声明的大小已超限时直接拒绝，不开始上传
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"文件大小超过限制 ({settings.max_file_size / 1024 / 1024:.1f}MB)"
+        )
+        if file.size is not None and file.size > settings.max_file_size:
+            raise too_large
         
         # 生成唯一的数据集ID和对象键
         dataset_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'txt'
         object_key = f"datasets/{timestamp}_{dataset_id}.{file_extension}"
+        content_type = file.content_type or 'application/octet-stream'
         
         try:
-            # 上传文件到MinIO
-            from io import BytesIO
-            self.client.put_object(
-                settings.minio_bucket_datasets,
-                object_key,
-                BytesIO(content),
-                length=file_size,
-                content_type=file.content_type or 'application/octet-stream'
-            )
-            
-            return Dataset(
-                dataset_id=dataset_id,
-                object_key=object_key,
-                size=file_size,
-                filename=file.filename,
-                uploaded_at=datetime.utcnow()
-            )
-            
+            # 阻塞的分片上传放到工作线程，边读边传，内存中最多保留一个分片
+            profiler = DatasetProfiler(file.filename, index_stride=settings.dataset_index_stride)
+            await asyncio.to_thread(self._stream_upload, file.file, object_key, content_type, profiler)
+        except UploadTooLargeError:
+            raise too_large
         except S3Error as e:
             raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
+        
+        profile = profiler.finish()
+        columns, columnar_key = profile["columns"], None
+        if settings.dataset_columnar and PARQUET_AVAILABLE and profile["row_index"] is not None:
+            # 列式副本只是读取加速，转换失败时保留原始CSV继续
+            try:
+                columnar_key, columns = await asyncio.to_thread(self._ingest_columnar, file.file, dataset_id, profile)
+            except Exception as e:
+                logger.warning(f"Columnar conversion failed for dataset {dataset_id}: {e}")
+        dataset = Dataset(
+            dataset_id=dataset_id,
+            object_key=object_key,
+            size=profile["size"],
+            filename=file.filename,
+            uploaded_at=datetime.utcnow(),
+            content_type=content_type,
+            row_count=profile["row_count"],
+            columns=columns,
+            checksum=profile["checksum"],
+            columnar_key=columnar_key
+        )
+        # SQLite写入是同步的（含 fsync），放到线程中避免阻塞事件循环
+        await asyncio.to_thread(self.catalog.add, dataset.model_dump())
+        if profile["row_index"] is not None:
+            await asyncio.to_thread(self.catalog.set_row_index, dataset_id, profile["row_index"])
+        logger.info(f"Streamed {profile['size']} bytes to {object_key}")
+        return dataset
+    
+    def _stream_upload(self, raw, object_key: str, content_type: str, profiler: DatasetProfiler):
+        """以未知长度的分片上传写入MinIO，同时计算校验和、行数和列类型"""
+        self.client.put_object(
+            settings.minio_bucket_datasets,
+            object_key,
+            _ProfilingReader(raw, profiler, settings.max_file_size),
+            length=-1,
+            part_size=settings.upload_part_size,
+            content_type=content_type
+        )
     
     async def get_dataset_content(self, dataset_id: str) -> str:
         """获取数据集内容"""
         # 如果MinIO不可用，返回模拟数据
         if not self.available:
             # 返回模拟的CSV数据
-            mock_csv = """target_name,koi_period,koi_duration,koi_depth,koi_model_snr,koi_steff,koi_slogg,koi_kepmag,koi_impact,koi_prad,koi_teq,koi_insol,koi_tce_plnt_num,koi_srad,ra,dec,crowding
-KIC-10000001,10.0,0.5,1000,15.0,5778,4.44,12.0,0.01,1.0,300.0,1000.0,1,1.0,180.0,0.0,0.9
-KIC-10000002,15.2,0.8,850,12.5,5500,4.2,14.1,0.015,0.8,280.0,750.0,1,0.9,185.0,5.0,0.85
-KIC-10000003,8.5,0.3,1200,18.2,6000,4.5,11.8,0.008,1.2,320.0,1200.0,1,1.1,175.0,-2.0,0.92"""
-            return mock_csv
+            return MOCK_DATASET_CSV
         
-        # 尝试通过dataset_id查找文件
-        # 由于没有数据库，我们需要搜索所有文件来找到匹配的
         try:
-            # 列出所有对象
-            objects = self.client.list_objects(settings.minio_bucket_datasets, recursive=True)
-            for obj in objects:
-                # 如果object key包含dataset_id，就使用这个文件
-                if dataset_id in obj.object_name:
-                    response = self.client.get_object(settings.minio_bucket_datasets, obj.object_name)
-                    content = response.read().decode('utf-8')
-                    response.close()
-                    response.release_conn()
-                    return content
-            
-            # 如果没找到，抛出异常
-            raise HTTPException(
-                status_code=404,
-                detail=f"Dataset not found: {dataset_id}"
-            )
+            object_key = self.find_dataset_key(dataset_id)
+            if object_key is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Dataset not found: {dataset_id}"
+                )
+            response = self.client.get_object(settings.minio_bucket_datasets, object_key)
+            content = response.read().decode('utf-8')
+            response.close()
+            response.release_conn()
+            return content
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to get dataset content from MinIO: {e}")
             raise HTTPException(
@@ -148,6 +220,165 @@ KIC-10000003,8.5,0.3,1200,18.2,6000,4.5,11.8,0.008,1.2,320.0,1200.0,1,1.1,175.0,
                 detail=f"Dataset not found: {dataset_id}"
             )
     
+    def _ingest_columnar(self, raw, dataset_id: str, profile: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """把已上传的CSV转换为Parquet副本并上传，返回 (对象键, 带统计信息的列)"""
+        with tempfile.TemporaryDirectory() as workdir:
+            local_path = f"{workdir}/{dataset_id}.parquet"
+            n_rows, stats = convert_csv_to_parquet(
+                raw, profile["header_offset"], profile["columns"], local_path,
+                row_group_rows=settings.dataset_row_group_rows
+            )
+            if n_rows != profile["row_count"]:
+                logger.warning(f"Dataset {dataset_id}: Parquet has {n_rows} rows, CSV profile counted {profile['row_count']}")
+            columnar_key = f"{COLUMNAR_PREFIX}{dataset_id}.parquet"
+            self.client.fput_object(
+                settings.minio_bucket_datasets, columnar_key, local_path,
+                content_type=PARQUET_CONTENT_TYPE, part_size=settings.upload_part_size
+            )
+        columns = [{**column, **stats.get(column["name"], {})} for column in profile["columns"]]
+        return columnar_key, columns
+    
+    def _find_key_or_404(self, dataset_id: str) -> str:
+        object_key = self.find_dataset_key(dataset_id)
+        if object_key is None:
+            raise HTTPException(status_code=404, detail=f"Dataset not found: {dataset_id}")
+        return object_key
+    
+    def _read_object_range(self, object_key: str, start: int, length: int) -> bytes:
+        """按字节范围读取数据集对象"""
+        response = self.client.get_object(settings.minio_bucket_datasets, object_key, offset=start, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    
+    def _get_row_index(self, dataset_id: str, object_key: str) -> Dict[str, Any]:
+        """获取行偏移索引；建立索引之前上传的数据集流式扫描一次并补建"""
+        index = self.catalog.get_row_index(dataset_id)
+        if index is not None:
+            return index
+        logger.info(f"Building row index for dataset {dataset_id}")
+        profiler = DatasetProfiler(object_key, index_stride=settings.dataset_index_stride)
+        response = self.client.get_object(settings.minio_bucket_datasets, object_key)
+        try:
+            for chunk in response.stream(settings.upload_part_size):
+                profiler.update(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+        index = profiler.finish()["row_index"]
+        if index is None:
+            raise HTTPException(status_code=400, detail="该数据集不是分隔文本文件或含有跨行的引号字段，不支持按行分页")
+        self.catalog.set_row_index(dataset_id, index)
+        return index
+    
+    def get_dataset_page(self, dataset_id: str, offset: int = 0, limit: int = 100,
+                         columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """按行分页读取数据集，只从MinIO读取覆盖该页的字节范围"""
+        if not self.available:
+            header, _, body = MOCK_DATASET_CSV.partition("\n")
+            lines = [line for line in body.encode("utf-8").split(b"\n") if line.strip()]
+            total_rows = len(lines)
+            selected = lines[offset:offset + limit]
+        else:
+            object_key = self._find_key_or_404(dataset_id)
+            record = self.catalog.get(dataset_id)
+            if columns is not None and record is not None and record.get("columnar_key"):
+                return self._get_columnar_page(dataset_id, record["columnar_key"], offset, limit, columns)
+            index = self._get_row_index(dataset_id, object_key)
+            header, total_rows = index["header"], index["row_count"]
+            selected = []
+            if offset < total_rows:
+                # 索引每 stride 行记录一个偏移，向外取整到相邻的两个索引点
+                stride, offsets = index["stride"], index["offsets"]
+                first = offset // stride
+                last = -(-(offset + limit) // stride)
+                start = offsets[first]
+                end = offsets[last] if last < len(offsets) else index["size"]
+                body = self._read_object_range(object_key, start, end - start)
+                # 与 DatasetProfiler 的行定义一致：每个非空物理行是一个数据行
+                lines = [line for line in body.split(b"\n") if line.strip()]
+                skip = offset - first * stride
+                selected = lines[skip:skip + limit]
+        names, rows = _parse_rows(header, selected, columns)
+        return {
+            "dataset_id": dataset_id,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": total_rows,
+            "columns": names,
+            "rows": rows
+        }
+    
+    def _get_columnar_page(self, dataset_id: str, columnar_key: str, offset: int, limit: int,
+                           columns: List[str]) -> Dict[str, Any]:
+        """列投影时从Parquet副本读取：只请求页脚和相交行组中的所需列块"""
+        source = MinioObjectFile(self.client, settings.minio_bucket_datasets, columnar_key)
+        try:
+            names, rows, total_rows = read_parquet_page(source, offset, limit, columns)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"未知的列: {e.args[0]}")
+        return {
+            "dataset_id": dataset_id,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": total_rows,
+            "columns": names,
+            "rows": rows
+        }
+    
+    def get_dataset_columnar_key(self, dataset_id: str) -> Optional[str]:
+        """数据集的Parquet副本对象键，没有副本时返回None"""
+        record = self.catalog.get(dataset_id)
+        return record.get("columnar_key") if record is not None else None
+    
+    def get_dataset_range(self, dataset_id: str, start: Optional[int], end: Optional[int]) -> Tuple[bytes, int, int, int]:
+        """按HTTP Range语义读取原始字节，start为None时读取末尾 end 个字节；返回 (内容, 起始, 结束, 总大小)"""
+        if not self.available:
+            object_key, content = None, MOCK_DATASET_CSV.encode("utf-8")
+            size = len(content)
+        else:
+            object_key = self._find_key_or_404(dataset_id)
+            record = self.catalog.get(dataset_id)
+            if record is not None:
+                size = record["size"]
+            else:
+                size = self.client.stat_object(settings.minio_bucket_datasets, object_key).size
+        if start is None:
+            start, end = max(0, size - (end or 0)), size - 1
+        elif end is None or end >= size:
+            end = size - 1
+        if start >= size or start > end:
+            raise HTTPException(status_code=416, detail=f"请求的字节范围无效（文件大小 {size}）")
+        if object_key is None:
+            return content[start:end + 1], start, end, size
+        return self._read_object_range(object_key, start, end - start + 1), start, end, size
+    
+    def get_dataset(self, dataset_id: str) -> Optional[Dataset]:
+        """从元数据索引获取数据集信息"""
+        record = self.catalog.get(dataset_id)
+        return Dataset(**record) if record is not None else None
+    
+    def list_datasets(self, offset: int = 0, limit: int = 50) -> Tuple[List[Dataset], int]:
+        """分页列出数据集，返回 (当前页, 总数)"""
+        records, total = self.catalog.list(offset, limit)
+        return [Dataset(**record) for record in records], total
+    
+    def find_dataset_key(self, dataset_id: str) -> Optional[str]:
+        """按dataset_id查找数据集对象键，找不到时返回None"""
+        record = self.catalog.get(dataset_id)
+        if record is not None:
+            return record["object_key"]
+        if not self.available:
+            return None
+        # 建立索引之前上传的数据集不在索引中，退化为扫描存储桶
+        logger.warning(f"Dataset {dataset_id} not in catalog, scanning bucket")
+        for obj in self.client.list_objects(settings.minio_bucket_datasets, recursive=True):
+            if dataset_id in obj.object_name and not obj.object_name.startswith(COLUMNAR_PREFIX):
+                return obj.object_name
+        return None
+
     def get_presigned_url(self, bucket: str, object_key: str, expires: timedelta = timedelta(hours=1)) -> str:
         """生成预签名URL"""
         try:
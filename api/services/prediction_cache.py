@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TwoTierCache:
+    """两级缓存 - 进程内LRU在前，Redis在后，均带TTL和容量上限"""
+
+    def __init__(self, namespace: str, ttl_seconds: int = 3600, max_local_entries: int = 10000,
+                 max_redis_entries: int = 100000, redis_client=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_local_entries = max_local_entries
+        self.max_redis_entries = max_redis_entries
+        self.redis = redis_client
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_retry_at = 0.0
+        self.counters = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "local_evictions": 0,
+            "redis_evictions": 0,
+            "redis_errors": 0,
+        }
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.namespace}:index"
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _redis_usable(self) -> bool:
+        return self.redis is not None and time.time() >= self._redis_retry_at
+
+    def _redis_failed(self, e: Exception):
+        """Redis不可用时退化为仅本地缓存，30秒后再重试"""
+        self.counters["redis_errors"] += 1
+        self._redis_retry_at = time.time() + 30
+        logger.warning(f"Redis cache unavailable, using local tier only: {e}")
+
+    def _local_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: Any):
+        with self._lock:
+            self._local[key] = (time.time() + self.ttl_seconds, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+                self.counters["local_evictions"] += 1
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """批量查询，先查本地LRU，未命中的再查Redis（命中后回填本地）"""
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self._local_get(key)
+            if value is not None:
+                found[key] = value
+                self.counters["local_hits"] += 1
+            else:
+                remote_keys.append(key)
+
+        if remote_keys and self._redis_usable():
+            try:
+                raw_values = await self.redis.mget([self._redis_key(k) for k in remote_keys])
+                for key, raw in zip(remote_keys, raw_values):
+                    if raw is not None:
+                        value = json.loads(raw)
+                        found[key] = value
+                        self._local_set(key, value)
+                        self.counters["redis_hits"] += 1
+            except Exception as e:
+                self._redis_failed(e)
+
+        self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    async def set_many(self, items: Dict[str, Any]):
+        """批量写入两级缓存，Redis按写入时间淘汰超出上限的条目"""
+        if not items:
+            return
+        for key, value in items.items():
+            self._local_set(key, value)
+        self.counters["sets"] += len(items)
+
+        if not self._redis_usable():
+            return
+        try:
+            now = time.time()
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(self._redis_key(key), json.dumps(value), ex=self.ttl_seconds)
+            pipe.zadd(self._index_key, {key: now for key in items})
+            pipe.zcard(self._index_key)
+            results = await pipe.execute()
+
+            overflow = results[-1] - self.max_redis_entries
+            if overflow > 0:
+                evicted = await self.redis.zpopmin(self._index_key, overflow)
+                if evicted:
+                    await self.redis.delete(*[self._redis_key(
+                        k.decode() if isinstance(k, bytes) else k) for k, _ in evicted])
+                    self.counters["redis_evictions"] += len(evicted)
+        except Exception as e:
+            self._redis_failed(e)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        total = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "local_entries": len(self._local),
+            "redis_enabled": self.redis is not None,
+        }
+
+
+class PredictionCache:
+    """预测结果缓存 - 键为 (模型版本, 阈值, 规范化特征向量哈希)"""
+
+    def __init__(self, redis_client=None, ttl_seconds: int = 3600,
+                 max_local_entries: int = 10000, max_redis_entries: int = 100000):
+        self.store = TwoTierCache(
+            "exoquest:pred",
+            ttl_seconds=ttl_seconds,
+            max_local_entries=max_local_entries,
+            max_redis_entries=max_redis_entries,
+            redis_client=redis_client
+        )
+
+    @staticmethod
+    def make_key(version: str, threshold: float, features: Sequence[str], row: Dict[str, Any]) -> str:
+        """规范化特征向量（按模型特征顺序，缺失/NaN视为0，与特征准备一致）后计算哈希"""
+        vector = np.array([row.get(f) for f in features], dtype=np.float64)
+        vector[np.isnan(vector)] = 0.0
+        vector += 0.0  # -0.0 与 0.0 视为相同
+        digest = hashlib.blake2b(vector.tobytes(), digest_size=16)
+        digest.update(f"|{version}|{round(float(threshold), 6)}".encode())
+        return digest.hexdigest()
+
+    async def lookup(self, rows: List[Dict[str, Any]], threshold: float, version: str,
+                     features: Sequence[str]) -> Tuple[List[str], Dict[int, Dict[str, Any]]]:
+        """返回 (每行的缓存键, 命中行索引 -> 缓存的预测)"""
+        keys = [self.make_key(version, threshold, features, row) for row in rows]
+        found = await self.store.get_many(list(dict.fromkeys(keys)))
+        return keys, {i: found[key] for i, key in enumerate(keys) if key in found}
+
+    async def save(self, keys: List[str], predictions: List[Dict[str, Any]]):
+        """缓存预测结果（object_id与请求相关，不写入缓存）"""
+        await self.store.set_many({
+            key: {k: v for k, v in prediction.items() if k != "object_id"}
+            for key, prediction in zip(keys, predictions)
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
@@ -168,3 +168,1162 @@ async def test_model_adapter_real():
     except Exception as e:
         # 如果模型文件不存在或加载失败，跳过测试
         pytest.skip(f"Real model not available: {str(e)}")
+
+
+def test_batch_shap_matches_per_sample():
+    """测试批量SHAP引擎与逐样本计算结果一致"""
+    import numpy as np
+    from ml.model_service import get_model_service
+
+    try:
+        service = get_model_service()
+    except Exception as e:
+        pytest.skip(f"Real model not available: {str(e)}")
+
+    rng = np.random.default_rng(0)
+    rows = [{f: float(rng.normal()) for f in service.features} for _ in range(20)]
+    feature_data = service._prepare_features(rows)
+
+    batch_shap = service._get_batch_shap_values(feature_data)
+    assert len(batch_shap) == len(rows)
+    for i in (0, 7, 19):
+        single = service.explainer.top_k(service.explainer.shap_matrix(feature_data[i:i + 1]), 5)[0]
+        assert batch_shap[i] == single
+        magnitudes = [abs(v) for _, v in batch_shap[i]]
+        assert magnitudes == sorted(magnitudes, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_inference_executor_backpressure():
+    """测试推理执行器在队列满时拒绝请求并记录耗时"""
+    import asyncio
+    import time
+    from ml.executor import InferenceExecutor, InferenceQueueFullError
+
+    executor = InferenceExecutor(kind="thread", max_workers=1, queue_size=0)
+    try:
+        first = asyncio.ensure_future(executor.run(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceQueueFullError):
+            await executor.run(time.sleep, 0)
+
+        _, timing = await first
+        assert timing["compute_ms"] >= 150
+        stats = executor.stats()
+        assert stats["rejected"] == 1
+        assert stats["compute"]["count"] == 1
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_merges_concurrent_requests():
+    """测试微批处理合并窗口期内的并发请求并按请求分发结果"""
+    import asyncio
+    from ml.batcher import MicroBatcher
+    from ml.executor import InferenceExecutor
+
+    calls = []
+
+    def predict_many(requests, version=None):
+        calls.append(len(requests))
+        return [{"rows": len(rows), "threshold": threshold} for rows, threshold in requests]
+
+    executor = InferenceExecutor(kind="thread", max_workers=1, queue_size=4)
+    batcher = MicroBatcher(executor, predict_many, window_ms=50, max_rows=8)
+    try:
+        results = await asyncio.gather(*[
+            batcher.submit([{}] * (i + 1), 0.1 * i) for i in range(4)
+        ])
+        # 1+2+3 行合并为一批，第4个请求超过行数上限进入下一批
+        assert calls == [3, 1]
+        assert [r["rows"] for r, _ in results] == [1, 2, 3, 4]
+        assert results[0][1]["batch_requests"] == 3
+
+        stats = batcher.stats()
+        assert stats["batches"] == 2
+        assert stats["batch_rows_histogram"] == {"le_4": 1, "le_8": 1}
+    finally:
+        await batcher.close()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_prediction_cache_local_tier():
+    """测试预测缓存的键规范化、命中统计与LRU淘汰"""
+    from services.prediction_cache import PredictionCache
+
+    cache = PredictionCache(redis_client=None, max_local_entries=2)
+    features = ["a", "b"]
+    rows = [{"a": 1.0, "b": None}, {"a": 1.0, "b": 0.0, "extra": "x"}, {"a": 2.0, "b": -0.0}]
+
+    keys, cached = await cache.lookup(rows, 0.5, "v1", features)
+    assert cached == {}
+    assert keys[0] == keys[1]  # 缺失值与0等价，非特征字段不影响键
+    assert keys[0] != PredictionCache.make_key("v1", 0.6, features, rows[0])
+    assert keys[0] != PredictionCache.make_key("v2", 0.5, features, rows[0])
+
+    await cache.save(keys, [{"object_id": "A", "conf": 0.9}, {"object_id": "B", "conf": 0.9}, {"conf": 0.1}])
+    _, cached = await cache.lookup(rows, 0.5, "v1", features)
+    assert cached[0] == {"conf": 0.9} and cached[2] == {"conf": 0.1}
+
+    await cache.save([PredictionCache.make_key("v1", 0.5, features, {"a": 3.0})], [{"conf": 0.3}])
+    stats = cache.stats()
+    assert stats["local_entries"] == 2
+    assert stats["local_evictions"] == 1
+    assert stats["local_hits"] == 2
+
+
+def test_feature_layout_matches_dataframe_path():
+    """测试预编译特征布局与旧DataFrame路径结果一致"""
+    import numpy as np
+    from ml.features import FeatureLayout
+
+    features = ["a", "b", "c"]
+    mean = np.array([1.0, 2.0, 3.0])
+    scale = np.array([2.0, 4.0, 0.5])
+    layout = FeatureLayout(features, mean=mean, scale=scale)
+
+    rows = [{"a": 1.0, "b": None, "extra": 5.0}, {"c": 4.0}, {"a": -1.0, "b": 2.0, "c": float("nan")}]
+    expected = (np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 4.0], [-1.0, 2.0, 0.0]]) - mean) / scale
+    assert np.allclose(layout.from_rows(rows), expected)
+
+    columns = {"a": [1.0, 0.0, -1.0], "b": [None, 0.0, 2.0], "c": [0.0, 4.0, float("nan")]}
+    assert np.allclose(layout.from_columns(columns), expected)
+
+    with pytest.raises(ValueError):
+        layout.from_columns({"a": [1.0], "b": [1.0, 2.0]})
+
+
+def test_predict_tabular_bulk_json_and_arrow():
+    """测试列式批量预测接口（JSON与Arrow IPC）与逐行预测结果一致"""
+    import numpy as np
+    from ml.model_service import get_model_service
+
+    try:
+        service = get_model_service()
+    except Exception as e:
+        pytest.skip(f"Real model not available: {str(e)}")
+
+    rng = np.random.default_rng(1)
+    fields = list(TabularRow.model_fields)
+    rows = [{f: float(rng.normal()) for f in fields} for _ in range(5)]
+    expected = service.predict_tabular(rows, 0.4)["predictions"]
+    columns = {f: [row[f] for row in rows] for f in fields}
+    columns["kepoi_name"] = [f"K{i:05d}.01" for i in range(5)]
+
+    response = client.post("/api/predict/tabular/bulk", json={"columns": columns, "threshold": 0.4})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["object_id"] == columns["kepoi_name"]
+    assert np.allclose(data["conf"], [p["conf"] for p in expected])
+    assert np.allclose(data["probs"]["CONF"], [p["probs"]["CONF"] for p in expected])
+
+    missing = {k: v for k, v in columns.items() if k != "koi_period"}
+    response = client.post("/api/predict/tabular/bulk", json={"columns": missing})
+    assert response.status_code == 422
+
+    pa = pytest.importorskip("pyarrow")
+    sink = pa.BufferOutputStream()
+    table = pa.table(columns)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post(
+        "/api/predict/tabular/bulk?threshold=0.4",
+        content=sink.getvalue().to_pybytes(),
+        headers={"Content-Type": "application/vnd.apache.arrow.stream"}
+    )
+    assert response.status_code == 200
+    result = pa.ipc.open_stream(response.content).read_all()
+    assert result.column("object_id").to_pylist() == columns["kepoi_name"]
+    assert np.allclose(result.column("conf").to_numpy(), data["conf"])
+    assert result.schema.metadata[b"version"] == data["version"].encode()
+
+
+def test_predict_tabular_stream_ndjson():
+    """测试NDJSON流式预测按块产出与整批预测一致的记录"""
+    import json
+    import numpy as np
+    from config import settings
+    from ml.model_service import get_model_service
+
+    try:
+        service = get_model_service()
+    except Exception as e:
+        pytest.skip(f"Real model not available: {str(e)}")
+
+    rng = np.random.default_rng(2)
+    fields = list(TabularRow.model_fields)
+    rows = [{f: float(rng.normal()) for f in fields} for _ in range(7)]
+    rows[3]["kepoi_name"] = "K00003.01"
+    expected = service.predict_tabular(rows, 0.5)["predictions"]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n"
+
+    with patch.object(settings, "stream_chunk_rows", 3):
+        response = client.post("/api/predict/tabular/stream", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == len(rows)
+    assert records[3]["object_id"] == "K00003.01"
+    assert records[4]["object_id"] == "TARGET-5"
+    assert np.allclose([r["conf"] for r in records], [p["conf"] for p in expected])
+
+    response = client.post("/api/predict/tabular/stream", content=body + "{\"koi_period\": 1.0}\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == len(rows) + 1
+    assert records[-1]["line"] == len(rows) + 1 and "error" in records[-1]
+
+    # 请求体以任意切分的块到达，行跨块时也能正确解析
+    data = body.encode()
+    chunked = client.post("/api/predict/tabular/stream", content=(data[i:i + 50] for i in range(0, len(data), 50)),
+                          headers={"Content-Type": "application/x-ndjson"})
+    assert [json.loads(line)["conf"] for line in chunked.text.splitlines()] == [r["conf"] for r in records[:-1]]
+
+    # 解析是增量的：第一行在后续请求体到达之前就已产出
+    import asyncio
+    from main import _iter_ndjson_rows
+    received = []
+
+    async def body_chunks():
+        for i in range(0, len(data), 50):
+            received.append(i)
+            yield data[i:i + 50]
+
+    async def first_row():
+        return await _iter_ndjson_rows(body_chunks()).__anext__()
+
+    assert asyncio.run(first_row())["koi_period"] == rows[0]["koi_period"]
+    assert len(received) < len(data) // 50
+
+    with patch.object(settings, "stream_max_json_bytes", 100):
+        response = client.post("/api/predict/tabular/stream", json={"rows": rows})
+    assert response.status_code == 413
+
+
+def test_training_job_writes_progress_and_artifacts(tmp_path):
+    """测试训练任务：预处理、训练、进度写入任务存储，产物可被ModelService加载"""
+    import numpy as np
+    import pandas as pd
+    from ml.model_service import ModelService
+    from ml.training import TrainingConfigError, run_training_job, validate_training_config
+    from services.job_store import FileJobStore
+
+    rng = np.random.default_rng(3)
+    n_rows = 300
+    df = pd.DataFrame({
+        "kepid": np.arange(n_rows),
+        "kepoi_name": [f"K{i:05d}.01" for i in range(n_rows)],
+        "koi_disposition": rng.choice(["CANDIDATE", "CONFIRMED", "FALSE POSITIVE"], n_rows),
+        "koi_period": rng.lognormal(2, 1, n_rows),
+        "koi_depth": rng.lognormal(6, 1, n_rows),
+        "koi_model_snr": rng.lognormal(3, 1, n_rows),
+        "koi_tce_delivname": "q1_q17_dr25_tce",
+    })
+    df["koi_depth"] += np.where(df["koi_disposition"] == "CANDIDATE", 500.0, 0.0)
+    df.loc[::10, "koi_period"] = np.nan
+    csv_path = tmp_path / "koi.csv"
+    with open(csv_path, "w") as f:
+        f.write("# This file was produced by the NASA Exoplanet Archive\n#\n")
+        df.to_csv(f, index=False)
+
+    with pytest.raises(TrainingConfigError):
+        validate_training_config({"n_estimators": 10})
+    config = validate_training_config({"iterations": "50", "depth": 3})
+
+    store = FileJobStore(str(tmp_path / "jobs"))
+    store.create("job-1", status="pending", progress=0)
+    metrics = run_training_job("job-1", {"path": str(csv_path)}, config, store, str(tmp_path / "model"))
+
+    record = store.get("job-1")
+    assert record["status"] == "completed" and record["progress"] == 100
+    assert record["metrics"] == metrics and 0.0 <= metrics["pr_auc"] <= 1.0
+
+    service = ModelService(str(tmp_path / "model"))
+    assert service.features == ["koi_period", "koi_depth", "koi_model_snr"]
+    result = service.predict_tabular([{"koi_period": 3.0, "koi_depth": 900.0, "koi_model_snr": 20.0}])
+    assert len(result["predictions"]) == 1
+
+    df.drop(columns=["koi_disposition"]).to_csv(tmp_path / "unlabeled.csv", index=False)
+    with pytest.raises(ValueError):
+        run_training_job("job-2", {"path": str(tmp_path / "unlabeled.csv")}, config, store, str(tmp_path / "other"))
+    assert store.get("job-2")["status"] == "failed"
+
+
+def test_parallel_search_resumes_shared_study(tmp_path):
+    """测试并行超参数搜索：共享SQLite研究、剪枝上报以及中断后续跑"""
+    import numpy as np
+    import time
+    optuna = pytest.importorskip("optuna")
+    from ml.search import make_storage, run_search
+
+    rng = np.random.default_rng(4)
+    X = rng.normal(size=(240, 5))
+    y = (X[:, 0] + 0.5 * rng.normal(size=240) > 0).astype(int)
+    storage = f"sqlite:///{tmp_path / 'search.db'}"
+    options = dict(model_type="catboost", storage=storage, study_name="t", n_folds=3,
+                   fixed_params={"iterations": 20})
+
+    result = run_search(X, y, n_trials=3, n_workers=2, **options)
+    assert result["n_complete"] + result["n_pruned"] >= 3
+    assert 0.0 < result["best_value"] <= 1.0
+    assert result["best_params"]["iterations"] == 20
+
+    # 模拟中断：留下一个已采样参数、仍处于RUNNING状态且写过心跳的试验
+    study = optuna.load_study(study_name="t", storage=make_storage(storage))
+    finished = [t for t in study.get_trials() if t.state.name in ("COMPLETE", "PRUNED")][0]
+    interrupted = study.ask(finished.distributions)
+    study._storage.record_heartbeat(interrupted._trial_id)
+    assert interrupted.params
+
+    # 心跳未过期时视为其他启动器中仍在运行的试验，不做处理
+    live = run_search(X, y, n_trials=3, n_workers=1, **options)
+    assert live["recovered_trials"] == 0
+    assert study.get_trials()[interrupted.number].state.name == "RUNNING"
+
+    time.sleep(2.5)  # 心跳时间戳精度为秒
+    resumed = run_search(X, y, n_trials=5, n_workers=1, heartbeat_interval=1, grace_period=1, **options)
+    assert resumed["resumed_trials"] == result["n_complete"] + result["n_pruned"]
+    assert resumed["recovered_trials"] == 1
+    assert resumed["n_complete"] + resumed["n_pruned"] >= 5
+    trials = optuna.load_study(study_name="t", storage=storage).get_trials()
+    assert all(len(t.intermediate_values) >= 1 for t in trials if t.state.name == "COMPLETE")
+    # 中断的参数组合重新排队并被执行
+    assert trials[interrupted.number].state.name == "FAIL"
+    rerun = [t for t in trials if t.number > interrupted.number and t.params == interrupted.params]
+    assert len(rerun) == 1 and rerun[0].state.name in ("COMPLETE", "PRUNED")
+    assert not [t for t in trials if t.state.name == "WAITING"]
+
+
+def test_dataset_catalog_profile_and_pagination(tmp_path):
+    """测试上传画像（分块计算校验和/行数/列类型）与数据集索引的分页查询"""
+    import hashlib
+    from services.dataset_catalog import DatasetCatalog
+    from services.dataset_profiler import DatasetProfiler
+
+    lines = ["# NASA Exoplanet Archive", "# columns below", "kepoi_name,koi_period,koi_disposition"]
+    lines += [f"K{i:05d}.01,{1.5 * i},CANDIDATE" for i in range(2500)]
+    content = ("\n".join(lines) + "\n").encode()
+
+    expected = None
+    for chunk_size in (len(content), 4096, 7):
+        profiler = DatasetProfiler("koi.csv", sample_rows=100)
+        for start in range(0, len(content), chunk_size):
+            profiler.update(content[start:start + chunk_size])
+        profile = profiler.finish()
+        assert profile["row_count"] == 2500
+        assert profile["checksum"] == hashlib.sha256(content).hexdigest()
+        assert profile["columns"] == [
+            {"name": "kepoi_name", "dtype": "object"},
+            {"name": "koi_period", "dtype": "float64"},
+            {"name": "koi_disposition", "dtype": "object"},
+        ]
+        expected = expected or profile
+        assert profile == expected
+
+    # 空行不计为数据行，行索引偏移指向非空行（与分页读取的行定义一致）；跨行的引号字段不提供行索引
+    gappy = "\n".join(lines[:203] + [""] * 3 + lines[203:1500] + ["  \r"] + lines[1500:]) + "\n\n"
+    for chunk_size in (4096, 7):
+        profiler = DatasetProfiler("koi.csv", sample_rows=100, index_stride=100)
+        for start in range(0, len(gappy), chunk_size):
+            profiler.update(gappy.encode()[start:start + chunk_size])
+        index = profiler.finish()["row_index"]
+        assert index["row_count"] == 2500
+        for k in (2, 15, 24):
+            row = gappy.encode()[index["offsets"][k]:].split(b"\n", 1)[0]
+            assert row.decode() == lines[3 + 100 * k]
+    multiline = ("\n".join(lines[2:200]) + '\nK99999.01,1.0,"FALSE\nPOSITIVE"\n').encode()
+    for chunk_size in (len(multiline), 64):
+        profiler = DatasetProfiler("koi.csv", sample_rows=100)
+        for start in range(0, len(multiline), chunk_size):
+            profiler.update(multiline[start:start + chunk_size])
+        assert profiler.finish()["row_index"] is None
+
+    catalog = DatasetCatalog(str(tmp_path / "catalog.db"))
+    for i in range(5):
+        catalog.add({
+            "dataset_id": f"ds-{i}", "object_key": f"datasets/ds-{i}.csv", "filename": f"{i}.csv",
+            "size": 10 * i, "uploaded_at": f"2025-01-0{i + 1}T00:00:00", **profile
+        })
+
+    with patch("main.minio_service.catalog", catalog):
+        response = client.get("/api/datasets", params={"offset": 1, "limit": 2})
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "5"
+        assert [d["dataset_id"] for d in response.json()] == ["ds-3", "ds-2"]
+
+        response = client.get("/api/datasets/ds-4")
+        assert response.status_code == 200
+        assert response.json()["row_count"] == 2500
+        assert response.json()["columns"][1] == {
+            "name": "koi_period", "dtype": "float64", "null_count": None, "min": None, "max": None, "mean": None
+        }
+        assert client.get("/api/datasets/missing").status_code == 404
+
+
+def test_streaming_upload_enforces_size_and_profiles(tmp_path):
+    """测试流式分片上传：按分片读取、边传边计算画像，超限时中止且不写入索引"""
+    import hashlib
+    import io
+    from config import settings
+    from services.dataset_catalog import DatasetCatalog
+    from services.dataset_profiler import DatasetProfiler
+    from services.minio_service import UploadTooLargeError, _ProfilingReader
+
+    class FakeMinio:
+        def __init__(self):
+            self.objects = {}
+
+        def put_object(self, bucket, object_key, data, length, part_size=0, content_type=None):
+            assert length == -1 and part_size == 64
+            parts = []
+            while True:
+                part = data.read(part_size)
+                if not part:
+                    break
+                parts.append(part)
+            self.objects[object_key] = b"".join(parts)
+
+    lines = ["kepoi_name,koi_period"] + [f"K{i:05d}.01,{i}.5" for i in range(40)]
+    content = ("\n".join(lines) + "\n").encode()
+    fake = FakeMinio()
+    catalog = DatasetCatalog(str(tmp_path / "catalog.db"))
+    with patch("main.minio_service.client", fake), \
+            patch("main.minio_service.available", True), \
+            patch("main.minio_service.catalog", catalog), \
+            patch.object(settings, "upload_part_size", 64):
+        response = client.post("/api/datasets/upload", files={"file": ("koi.csv", content, "text/csv")})
+        assert response.status_code == 200
+        dataset = response.json()
+        assert fake.objects[dataset["object_key"]] == content
+        assert dataset["size"] == len(content)
+        assert dataset["row_count"] == 40
+        assert dataset["checksum"] == hashlib.sha256(content).hexdigest()
+        assert catalog.get(dataset["dataset_id"])["row_count"] == 40
+
+        with patch.object(settings, "max_file_size", 200):
+            response = client.post("/api/datasets/upload", files={"file": ("big.csv", content, "text/csv")})
+        assert response.status_code == 413
+        assert catalog.list()[1] == 1
+
+    # 未声明大小的流在读取过程中超限
+    reader = _ProfilingReader(io.BytesIO(content), DatasetProfiler("big.csv"), max_size=200)
+    assert len(reader.read(128)) == 128
+    with pytest.raises(UploadTooLargeError):
+        reader.read(128)
+
+
+def test_dataset_content_pages_and_byte_ranges(tmp_path):
+    """测试基于行偏移索引的分页读取：只按字节范围读取所需部分，支持列投影和Range请求"""
+    from services.dataset_catalog import DatasetCatalog
+    from services.dataset_profiler import DatasetProfiler
+
+    lines = ["# KOI export", "kepoi_name,koi_period,koi_depth"]
+    lines += [f"K{i:05d}.01,{i}.5,{'' if i % 7 == 0 else i * 10}" for i in range(1234)]
+    content = ("\n".join(lines) + "\n").encode()
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def read(self):
+            return self.data
+
+        def close(self):
+            pass
+
+        def release_conn(self):
+            pass
+
+    class FakeMinio:
+        def __init__(self):
+            self.reads = []
+
+        def get_object(self, bucket, object_key, offset=0, length=0):
+            self.reads.append(length)
+            return FakeResponse(content[offset:offset + length] if length else content)
+
+    profiler = DatasetProfiler("koi.csv", sample_rows=50, index_stride=100)
+    for start in range(0, len(content), 999):
+        profiler.update(content[start:start + 999])
+    profile = profiler.finish()
+    catalog = DatasetCatalog(str(tmp_path / "catalog.db"))
+    catalog.add({"dataset_id": "koi", "object_key": "datasets/koi.csv", "filename": "koi.csv",
+                 "uploaded_at": "2025-01-01T00:00:00", **profile})
+    catalog.set_row_index("koi", profile["row_index"])
+
+    fake = FakeMinio()
+    with patch("main.minio_service.client", fake), \
+            patch("main.minio_service.available", True), \
+            patch("main.minio_service.catalog", catalog):
+        response = client.get("/api/datasets/koi/content", params={"offset": 250, "limit": 3,
+                                                                     "columns": "koi_depth,kepoi_name"})
+        assert response.status_code == 200
+        page = response.json()
+        assert page["total_rows"] == 1234
+        assert page["columns"] == ["koi_depth", "kepoi_name"]
+        assert page["rows"] == [[2500.0, "K00250.01"], [2510.0, "K00251.01"], [None, "K00252.01"]]
+        assert fake.reads[-1] < len(content) / 10
+
+        response = client.get("/api/datasets/koi/content", params={"offset": 1230, "limit": 10})
+        assert [row[0] for row in response.json()["rows"]] == [f"K{i:05d}.01" for i in range(1230, 1234)]
+        assert client.get("/api/datasets/koi/content", params={"columns": "nope"}).status_code == 400
+
+        response = client.get("/api/datasets/koi/content", headers={"Range": "bytes=0-11"})
+        assert response.status_code == 206
+        assert response.content == content[:12]
+        assert response.headers["Content-Range"] == f"bytes 0-11/{len(content)}"
+        assert client.get("/api/datasets/koi/content", headers={"Range": f"bytes={len(content)}-"}).status_code == 416
+
+        # 不带分页参数时保持旧的整文件响应
+        assert client.get("/api/datasets/koi/content").json() == {"content": content.decode()}
+
+
+def test_upload_converts_to_parquet_with_column_stats(tmp_path):
+    """测试上传时生成Parquet列式副本（含列统计），列投影分页从副本读取"""
+    from types import SimpleNamespace
+    from config import settings
+    from services.dataset_catalog import DatasetCatalog
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def read(self):
+            return self.data
+
+        def close(self):
+            pass
+
+        def release_conn(self):
+            pass
+
+    class FakeMinio:
+        def __init__(self):
+            self.objects = {}
+            self.ranges = []
+
+        def put_object(self, bucket, object_key, data, length, part_size=0, content_type=None):
+            self.objects[object_key] = b"".join(iter(lambda: data.read(part_size), b""))
+
+        def fput_object(self, bucket, object_key, file_path, content_type=None, part_size=0):
+            with open(file_path, "rb") as f:
+                self.objects[object_key] = f.read()
+
+        def stat_object(self, bucket, object_key):
+            return SimpleNamespace(size=len(self.objects[object_key]))
+
+        def get_object(self, bucket, object_key, offset=0, length=0):
+            self.ranges.append((object_key, offset, length))
+            data = self.objects[object_key]
+            return FakeResponse(data[offset:offset + length] if length else data)
+
+    lines = ["# KOI export", "# generated", "kepoi_name,koi_period,koi_tce_plnt_num,koi_disposition"]
+    lines += [f"K{i:05d}.01,{'' if i % 10 == 0 else i + 0.5},{i % 3 + 1},CANDIDATE" for i in range(300)]
+    content = ("\n".join(lines) + "\n").encode()
+
+    fake = FakeMinio()
+    catalog = DatasetCatalog(str(tmp_path / "catalog.db"))
+    with patch("main.minio_service.client", fake), \
+            patch("main.minio_service.available", True), \
+            patch("main.minio_service.catalog", catalog), \
+            patch.object(settings, "dataset_row_group_rows", 100):
+        dataset = client.post("/api/datasets/upload", files={"file": ("koi.csv", content, "text/csv")}).json()
+        assert dataset["columnar_key"] == f"columnar/{dataset['dataset_id']}.parquet"
+        period = dataset["columns"][1]
+        assert period["name"] == "koi_period" and period["null_count"] == 30
+        assert period["min"] == 1.5 and period["max"] == 299.5
+        assert dataset["columns"][0]["null_count"] == 0 and dataset["columns"][0]["min"] is None
+
+        fake.ranges.clear()
+        response = client.get(f"/api/datasets/{dataset['dataset_id']}/content",
+                              params={"offset": 98, "limit": 4, "columns": "koi_tce_plnt_num,koi_period"})
+        page = response.json()
+        assert page["total_rows"] == 300
+        assert page["rows"] == [[3, 98.5], [1, 99.5], [2, None], [3, 101.5]]
+        assert {key for key, _, _ in fake.ranges} == {dataset["columnar_key"]}
+
+    from ml.training import read_koi_table
+    local_path = tmp_path / "koi.parquet"
+    local_path.write_bytes(fake.objects[dataset["columnar_key"]])
+    assert list(read_koi_table(str(local_path)).columns) == ["koi_period", "koi_tce_plnt_num", "koi_disposition"]
+
+
+@pytest.mark.asyncio
+async def test_score_dataset_job_writes_report(tmp_path):
+    """测试数据集批量评分：按块读取、推理、按原顺序写入报告并记录进度和吞吐量"""
+    import io
+    import numpy as np
+    import pandas as pd
+    import pyarrow.parquet as pq
+    from types import SimpleNamespace
+    from main import model_adapter
+    from ml.scoring import ScoringInputError
+    from models import ScoringRequest
+    from services.dataset_catalog import DatasetCatalog
+    from services.job_store import FileJobStore
+
+    class FakeResponse(io.BytesIO):
+        def release_conn(self):
+            pass
+
+    class FakeMinio:
+        def __init__(self):
+            self.objects = {}
+
+        def fput_object(self, bucket, object_key, file_path, content_type=None, part_size=0):
+            with open(file_path, "rb") as f:
+                self.objects[object_key] = f.read()
+
+        def stat_object(self, bucket, object_key):
+            return SimpleNamespace(size=len(self.objects[object_key]))
+
+        def get_object(self, bucket, object_key, offset=0, length=0):
+            data = self.objects[object_key]
+            return FakeResponse(data[offset:offset + length] if length else data)
+
+    rng = np.random.default_rng(0)
+    n_rows = 250
+    df = pd.DataFrame({name: rng.uniform(0.5, 50.0, n_rows) for name in TabularRow.model_fields})
+    df.insert(0, "kepoi_name", [f"K{i:05d}.01" for i in range(n_rows)])
+    fake = FakeMinio()
+    fake.objects["datasets/koi.csv"] = ("# KOI export\n" + df.to_csv(index=False)).encode()
+    catalog = DatasetCatalog(str(tmp_path / "catalog.db"))
+    catalog.add({
+        "dataset_id": "koi", "object_key": "datasets/koi.csv", "filename": "koi.csv", "size": 1,
+        "uploaded_at": "2025-01-01T00:00:00", "row_count": n_rows,
+        "columns": [{"name": name, "dtype": "float64"} for name in df.columns]
+    })
+    catalog.add({
+        "dataset_id": "bad", "object_key": "datasets/bad.csv", "filename": "bad.csv", "size": 1,
+        "uploaded_at": "2025-01-01T00:00:00", "columns": [{"name": "koi_period", "dtype": "float64"}]
+    })
+
+    with patch("main.minio_service.client", fake), \
+            patch("main.minio_service.available", True), \
+            patch("main.minio_service.catalog", catalog), \
+            patch.object(model_adapter, "job_store", FileJobStore(str(tmp_path / "jobs"))):
+        for fmt in ("parquet", "csv"):
+            request = ScoringRequest(threshold=0.5, top_k=3, format=fmt, chunk_rows=64)
+            job_id = (await model_adapter.start_scoring("koi", request))["job_id"]
+            await model_adapter.scoring_tasks[job_id]
+
+            job = await model_adapter.get_job_status(job_id)
+            assert job.status == "completed" and job.kind == "scoring"
+            assert job.rows_done == n_rows and job.rows_per_sec > 0
+            data = fake.objects[job.report_key]
+            report = pq.read_table(io.BytesIO(data)).to_pandas() if fmt == "parquet" else pd.read_csv(io.BytesIO(data))
+            assert report["object_id"].tolist() == df["kepoi_name"].tolist()
+            assert {"prob_positive", "conf", "shap_feature_3", "shap_value_3"} <= set(report.columns)
+            assert "shap_feature_4" not in report.columns
+
+        with pytest.raises(ScoringInputError):
+            await model_adapter.start_scoring("bad", ScoringRequest())
+
+
+@pytest.mark.asyncio
+async def test_lazy_imports_and_readiness():
+    """测试启动时不导入重量级ML库；/health 立即可用，/ready 在模型加载完成后才返回200"""
+    import subprocess
+    import sys
+    from main import model_adapter
+
+    probe = "import sys, main; print(sorted(m for m in ('catboost', 'lightgbm', 'shap') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == "[]"
+
+    with patch.object(model_adapter, "model_state", {"status": "loading"}):
+        assert client.get("/health").status_code == 200
+        response = client.get("/api/ready")
+        assert response.status_code == 503 and response.json()["status"] == "loading"
+
+    with patch.object(model_adapter, "model_state", {}):
+        await model_adapter.load_model()
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["model_type"] == "catboost" and response.json()["load_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_shared_model_service_and_warm_up():
+    """测试所有接口共用同一个模型服务实例，启动预热记录 predict/explain 耗时"""
+    import model_adapter as adapter_module
+    from config import settings
+    from main import model_adapter
+    from ml.model_service import get_model_service
+
+    service = get_model_service()
+    assert adapter_module.get_model_service() is service
+
+    warmup = service.warm_up(8)
+    assert warmup["rows"] == 8 and warmup["predict_ms"] >= 0 and warmup["explain_ms"] >= 0
+
+    with patch.object(model_adapter, "model_state", {}):
+        await model_adapter.load_model()
+        state = model_adapter.readiness()
+        assert state["status"] == "ready" and state["warmup"]["rows"] == settings.model_warmup_rows
+        assert state["warmup_ms"] >= 0
+
+    response = client.get("/api/features")
+    assert response.status_code == 200
+    assert response.json()["features"] == service.get_feature_names()
+
+
+@pytest.mark.asyncio
+async def test_model_registry_versions_and_hot_swap(tmp_path):
+    """测试多版本注册表：按版本路由、MinIO版本下载、后台预热后原子切换，旧请求仍使用旧模型"""
+    import json
+    import shutil
+    from types import SimpleNamespace
+    import ml.model_registry as registry_module
+    from main import model_adapter
+    from ml.model_registry import ModelRegistry, ModelVersionNotFoundError, publish_model_version
+
+    base = tmp_path / "models"
+    shutil.copytree("models", base)
+    shutil.copytree("models", tmp_path / "versions" / "job-a")
+    (tmp_path / "versions" / "job-a" / "metadata.json").write_text(json.dumps({"job_id": "job-a"}))
+
+    class FakeMinio:
+        def __init__(self):
+            self.objects = {}
+
+        def fput_object(self, bucket, key, path, **kwargs):
+            with open(path, "rb") as f:
+                self.objects[key] = f.read()
+
+        def list_objects(self, bucket, prefix=""):
+            names = sorted(key for key in self.objects if key.startswith(prefix))
+            prefixes = sorted({prefix + key[len(prefix):].split("/")[0] + "/" for key in names
+                               if "/" in key[len(prefix):]})
+            return [SimpleNamespace(object_name=p, is_dir=True) for p in prefixes] + [
+                SimpleNamespace(object_name=key, is_dir=False) for key in names if "/" not in key[len(prefix):]
+            ]
+
+        def fget_object(self, bucket, key, path):
+            with open(path, "wb") as f:
+                f.write(self.objects[key])
+
+    minio = FakeMinio()
+    assert publish_model_version(minio, "artifacts", "models", "job-b") == 4
+
+    registry = ModelRegistry(
+        str(base), versions_dir=str(tmp_path / "versions"), source="minio", client=minio,
+        bucket="artifacts", cache_dir=str(tmp_path / "cache"), max_loaded=2
+    )
+    assert registry.default_version == "v1.0.0"
+    assert registry.describe()["available"] == ["job-a", "job-b", "v1.0.0"]
+    with pytest.raises(ModelVersionNotFoundError):
+        registry.resolve("missing")
+
+    old = registry.get()
+    assert registry.get("job-b").version == "job-b" and (tmp_path / "cache" / "job-b" / "best_model.cbm").exists()
+    assert registry.activate("job-a", warm_up_rows=4).version == "job-a"
+    assert registry.get().version == "job-a"
+    # 超出 max_loaded 时释放最久未使用的非默认版本（job-b），切换前的默认版本保留以便回滚
+    assert set(registry.describe()["loaded"]) == {"job-a", "v1.0.0"}
+    assert old.predict_tabular([{"koi_period": 3.0}])["predictions"][0]["version"] == "v1.0.0"
+
+    row = {name: 1.0 for name, field in TabularRow.model_fields.items() if field.is_required()}
+    with patch.object(registry_module, "_registry", registry), \
+            patch.object(model_adapter, "activations", {}), patch.object(model_adapter, "model_state", {}):
+        response = client.post("/api/predict/tabular", json={"rows": [row], "model_version": "job-b"})
+        assert response.status_code == 200 and response.json()["predictions"][0]["version"] == "job-b"
+        response = client.post("/api/predict/tabular", json={"rows": [row], "model_version": "missing"})
+        assert response.status_code == 404
+        assert client.post("/api/models/missing/activate").status_code == 404
+
+        accepted = await model_adapter.activate_model("v1.0.0")
+        assert accepted == {"version": "v1.0.0", "status": "loading"}
+        await model_adapter.activation_tasks["v1.0.0"]
+        assert registry.default_version == "v1.0.0"
+        models = client.get("/api/models").json()
+        assert models["default"] == "v1.0.0" and models["activations"]["v1.0.0"]["status"] == "active"
+
+
+def test_compiled_oblivious_backend_matches_catboost():
+    """测试编译后的对称树评估器与 CatBoost predict_proba 一致（二分类、多分类、NaN按Max处理）"""
+    import numpy as np
+    catboost = pytest.importorskip("catboost")
+    from ml.model_service import get_model_service
+    from ml.oblivious import ObliviousTreeEnsemble
+
+    service = get_model_service()
+    assert service.backend == "compiled"
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(2000, service.layout.n_features)) * 2
+    assert np.allclose(service.predictor.predict_proba(X), service.model.predict_proba(X), atol=1e-9)
+    assert np.allclose(service.predictor.predict_proba(X[:1]), service.model.predict_proba(X[:1]), atol=1e-9)
+
+    X_train = rng.normal(size=(300, 4))
+    y_train = (X_train[:, 0] > 0).astype(int) + (X_train[:, 1] > 0.5).astype(int)
+    X_train[::9, 2] = np.nan
+    model = catboost.CatBoostClassifier(
+        iterations=20, depth=3, nan_mode="Max", loss_function="MultiClass", verbose=False, thread_count=1,
+        allow_writing_files=False
+    )
+    model.fit(X_train, y_train)
+    compiled = ObliviousTreeEnsemble.from_catboost(model)
+    X_test = rng.normal(size=(500, 4))
+    X_test[::3, 2] = np.nan
+    assert compiled.dimension == 3
+    assert np.allclose(compiled.predict_proba(X_test), model.predict_proba(X_test), atol=1e-9)
+
+
+def test_oblivious_tree_shap_matches_shap():
+    """测试对称树精确TreeSHAP与 shap.TreeExplainer 一致，分块 top-k 与整矩阵结果相同"""
+    import numpy as np
+    shap = pytest.importorskip("shap")
+    from ml.model_service import get_model_service
+
+    service = get_model_service()
+    tree_shap = service.explainer.tree_shap
+    assert tree_shap is not None
+    rng = np.random.default_rng(11)
+    X = rng.normal(size=(300, service.layout.n_features)) * 1.5
+
+    expected = np.asarray(shap.TreeExplainer(service.model).shap_values(X))
+    values = tree_shap.shap_values(X)[:, :, 0]
+    assert np.allclose(values, expected, atol=1e-9)
+    # 局部准确性：SHAP值之和 + 期望值 = 原始预测值
+    raw = service.model.predict(X, prediction_type="RawFormulaVal")
+    assert np.allclose(values.sum(axis=1) + tree_shap.expected_value[0], raw, atol=1e-9)
+
+    with patch.object(tree_shap, "block_rows", 64):
+        idx, top = service.explainer.top_k_for(X, 5)
+    full_idx, full_top = service.explainer.top_k_indices(expected, 5)
+    assert idx.shape == (300, 5) and np.allclose(top, full_top, atol=1e-9)
+    assert (idx == full_idx).mean() > 0.99  # 绝对值相同的特征可能顺序不同
+
+
+def test_rethreshold_reuses_raw_probabilities():
+    """测试预测返回prediction_id，按新阈值重算只用缓存的原始概率，结果与向量化阈值函数一致"""
+    import numpy as np
+    from main import model_adapter
+    from ml.postprocess import apply_threshold
+
+    rng = np.random.default_rng(3)
+    rows = [{f: float(rng.normal()) for f in TabularRow.model_fields} for _ in range(3)]
+    with patch.object(model_adapter.raw_probs_cache, "redis", None):
+        data = client.post("/api/predict/tabular", json={"rows": rows, "threshold": 0.5}).json()
+        prediction_id = data["prediction_id"]
+        assert prediction_id and len(data["predictions"]) == 3
+
+        entry = model_adapter.raw_probs_cache._local_get(prediction_id)
+        raw = np.asarray(entry["raw_probs"])
+        with patch.object(model_adapter.executor, "run", side_effect=AssertionError("model called")):
+            response = client.post("/api/predict/rethreshold",
+                                   json={"prediction_id": prediction_id, "threshold": 0.8})
+        assert response.status_code == 200
+        rethresholded = response.json()
+        assert rethresholded["prediction_id"] == prediction_id
+        expected = apply_threshold(raw, 0.8)
+        for i, prediction in enumerate(rethresholded["predictions"]):
+            assert prediction["object_id"] == data["predictions"][i]["object_id"]
+            assert prediction["explain"] == data["predictions"][i]["explain"]
+            for name, column in expected.items():
+                assert prediction["probs"][name] == pytest.approx(column[i])
+
+    missing = client.post("/api/predict/rethreshold", json={"prediction_id": "missing", "threshold": 0.5})
+    assert missing.status_code == 404
+
+
+def test_predict_curve_batch_detects_transits():
+    """测试光变曲线批量检测：含凌星的曲线概率高，逐点重要性峰值落在凌星上，折叠后SNR更高"""
+    import numpy as np
+    from scripts.seed_data import generate_lightcurve_sample
+
+    sample = generate_lightcurve_sample()
+    rng = np.random.default_rng(2)
+    noise = (1 + rng.normal(0, 0.001, len(sample["time"]))).tolist()
+    curves = [
+        {"curve": sample["flux"], "time": sample["time"], "object_id": "TRANSIT"},
+        {"curve": noise, "time": sample["time"]},
+        {"curve": sample["flux"], "time": sample["time"], "period": sample["period"], "epoch": sample["epoch"]},
+    ]
+    response = client.post("/api/predict/curve/batch", json={"curves": curves})
+    assert response.status_code == 200
+    transit, flat, folded = response.json()["predictions"]
+    assert transit["object_id"] == "TRANSIT" and flat["object_id"] == "CURVE-2"
+    assert transit["probs"]["POSITIVE"] > 0.9 > 0.5 > flat["probs"]["POSITIVE"]
+    assert folded["detection"]["folded"] and folded["detection"]["snr"] > transit["detection"]["snr"]
+    assert abs(transit["detection"]["depth"] - sample["depth"]) < 0.002
+
+    importance = np.asarray(transit["importance"])
+    time = np.asarray(sample["time"])
+    assert importance.shape == time.shape and importance.max() == 1.0
+    peak_phase = ((time[importance > 0.9] - sample["epoch"]) / sample["period"] + 0.5) % 1.0 - 0.5
+    assert np.all(np.abs(peak_phase) * sample["period"] < sample["duration"] / 24)
+
+    single = client.post("/api/predict/curve", json={"curve": noise, "time": sample["time"][:10]})
+    assert single.status_code == 422
+
+    # 按字节预算分批（长短曲线分开补齐）与整批处理结果一致
+    from ml.lightcurve import BYTES_PER_POINT, CurvePipeline
+    n = len(sample["time"])
+    batch_curves = [sample["flux"], noise[:n // 4], sample["flux"][:n // 2], noise]
+    batch_times = [sample["time"], sample["time"][:n // 4], sample["time"][:n // 2], sample["time"]]
+    whole = CurvePipeline().run(batch_curves, batch_times)
+    pipeline = CurvePipeline(batch_bytes=n * BYTES_PER_POINT)
+    batches = pipeline._batches([len(curve) for curve in batch_curves])
+    assert sorted(len(rows) for rows in batches) == [1, 1, 2]
+    split = pipeline.run(batch_curves, batch_times)
+    assert np.allclose(split["probs_array"], whole["probs_array"]) and np.allclose(split["snr"], whole["snr"])
+    assert all(np.allclose(a, b) for a, b in zip(split["importance"], whole["importance"]))
+
+
+def test_bls_period_search():
+    """测试BLS向量化功率谱与朴素实现一致，分块/进程池结果相同，并能找回注入的凌星周期"""
+    import numpy as np
+    from ml.bls import _duration_bins, bls_naive, bls_search, evaluate_periods, prepare
+
+    rng = np.random.default_rng(4)
+    time = np.sort(rng.uniform(0, 27, 20000))
+    flux = 1 + rng.normal(0, 0.002, time.size) + 0.001 * np.sin(2 * np.pi * time / 6)
+    flux[np.abs(((time - 1.3) / 3.1 + 0.5) % 1 - 0.5) * 3.1 < 0.06] -= 0.002
+
+    state = prepare(time, flux)
+    periods = np.linspace(1.0, 6.0, 12)
+    duration_bins = _duration_bins(np.array([1.0, 3.0, 4.0]) / 24, state["bin_days"])
+    assert np.allclose(evaluate_periods(state, periods, duration_bins)["power"],
+                       bls_naive(state, periods, duration_bins), rtol=1e-9, atol=1e-18)
+
+    result = bls_search(time, flux, max_periods=5000)
+    assert abs(result["period"] - 3.1) < 0.005 and result["snr"] > 10
+    assert abs(result["duration"] - 0.12) < 0.05 and abs(result["depth"] - 0.002) < 0.0005
+    assert abs(((result["epoch"] - 1.3) / 3.1 + 0.5) % 1 - 0.5) * 3.1 < 0.03
+
+    chunked = bls_search(time, flux, max_periods=500, chunk_bytes=2 ** 20, workers=2)
+    single = bls_search(time, flux, max_periods=500)
+    assert np.allclose(chunked["power"], single["power"]) and chunked["period"] == single["period"]
+
+    # 检测引擎的长期进程池由多次搜索共用，不为每条曲线创建新池
+    from ml.lightcurve import CurvePipeline
+    pipeline = CurvePipeline(bls_workers=2)
+    try:
+        pool = pipeline.bls_pool
+        for _ in range(2):
+            shared = bls_search(time, flux, max_periods=500, chunk_bytes=2 ** 20, pool=pipeline.bls_pool)
+            assert np.allclose(shared["power"], single["power"]) and shared["period"] == single["period"]
+        assert pipeline.bls_pool is pool and len(pool._processes) <= 2
+    finally:
+        pipeline.close()
+
+    response = client.post("/api/predict/curve", json={
+        "curve": flux[::4].tolist(), "time": time[::4].tolist(), "search_period": True
+    })
+    assert response.status_code == 200
+    detection = response.json()["predictions"][0]["detection"]
+    assert detection["folded"] and abs(detection["koi_period"] - 3.1) < 0.01
+    assert 500 < detection["koi_depth"] < 3000
+
+
+def test_predict_fuse_batch_runs_modalities_concurrently():
+    """测试融合预测按 alpha 混合两种模态的原始概率，两种模态并行执行并分别计时"""
+    import asyncio
+    import time
+    import numpy as np
+    import model_adapter as adapter_module
+    from config import settings
+    from main import model_adapter
+    from ml import lightcurve
+    from scripts.seed_data import generate_lightcurve_sample
+
+    sample = generate_lightcurve_sample()
+    rng = np.random.default_rng(6)
+    rows = [{f: float(rng.normal()) for f in TabularRow.model_fields} for _ in range(2)]
+    pairs = [
+        {"tabular_data": row, "curve_data": sample["flux"], "curve_time": sample["time"], "alpha": alpha}
+        for row, alpha in zip(rows, (0.7, 0.0))
+    ]
+    response = client.post("/api/predict/fuse/batch", json={"pairs": pairs})
+    assert response.status_code == 200
+    data = response.json()
+    fused, curve_only = data["predictions"]
+    assert {"tabular_ms", "curve_ms", "blend_ms", "total_ms"} <= set(data["timing"])
+    assert fused["version"].endswith("+" + lightcurve.CurvePipeline.version)
+    assert fused["explain"]["tabular"]["shap"] and len(fused["importance"]) == len(sample["flux"])
+
+    tabular = client.post("/api/predict/tabular", json={"rows": rows[:1]}).json()["predictions"][0]
+    curve = client.post("/api/predict/curve", json={"curve": sample["flux"], "time": sample["time"]}).json()
+    curve = curve["predictions"][0]
+    expected = 0.7 * tabular["probs"]["POSITIVE"] + 0.3 * curve["probs"]["POSITIVE"]
+    assert fused["probs"]["POSITIVE"] == pytest.approx(expected)
+    assert curve_only["probs"]["POSITIVE"] == pytest.approx(curve["probs"]["POSITIVE"])
+
+    # 两种模态各耗时约0.3秒，并行时总耗时接近较慢的一方
+    slow_curves = lightcurve.predict_curves
+
+    def slow_predict_curves(*args, **kwargs):
+        time.sleep(0.3)
+        return slow_curves(*args, **kwargs)
+
+    slow_rows = model_adapter._run_tabular
+
+    async def slow_run_tabular(*args, **kwargs):
+        await asyncio.sleep(0.3)
+        return await slow_rows(*args, **kwargs)
+
+    with patch.object(adapter_module, "predict_curves", slow_predict_curves), \
+            patch.object(model_adapter, "_run_tabular", slow_run_tabular), \
+            patch.object(settings, "prediction_cache_enabled", False):
+        timing = client.post("/api/predict/fuse/batch", json={"pairs": pairs}).json()["timing"]
+    assert timing["tabular_ms"] >= 300 and timing["curve_ms"] >= 300
+    assert timing["total_ms"] < timing["tabular_ms"] + timing["curve_ms"] - 150
+
+
+def test_curve_store_memmap_and_curve_id_requests(tmp_path):
+    """测试二进制光变曲线存储：上传、np.memmap 读取、MinIO下载到本地缓存，以及按 curve_id 预测"""
+    import json
+    import shutil
+    import numpy as np
+    from config import settings
+    from services import curve_store
+    from services.curve_store import CurveStore, encode_curve
+    from scripts.seed_data import generate_lightcurve_sample
+
+    class FakeMinio:
+        def __init__(self):
+            self.objects = {}
+
+        def fput_object(self, bucket, name, path, content_type=None):
+            self.objects[name] = open(path, "rb").read()
+
+        def fget_object(self, bucket, name, path):
+            from minio.error import S3Error
+            if name not in self.objects:
+                raise S3Error("NoSuchKey", "missing", name, "", "", None)
+            with open(path, "wb") as f:
+                f.write(self.objects[name])
+
+    sample = generate_lightcurve_sample()
+    time = np.asarray(sample["time"]) + 2454833.0  # BKJD基准，float32直接存储会丢失精度
+    minio = FakeMinio()
+    store = CurveStore(str(tmp_path / "cache"), client=minio, bucket="curves")
+    with patch.object(curve_store, "_store", store):
+        response = client.post("/api/curves", json={
+            "curve_id": "kic-1", "time": time.tolist(), "flux": sample["flux"], "metadata": {"sector": 1}
+        })
+        assert response.status_code == 201
+        info = response.json()
+        assert info["n_points"] == len(time) and info["columns"] == ["time", "flux"]
+        assert info["size"] < len(json.dumps({"time": time.tolist(), "flux": sample["flux"]})) / 3
+
+        # 本地缓存清空后从MinIO重新下载；列映射为只读memmap
+        shutil.rmtree(tmp_path / "cache")
+        store._headers.clear()
+        stored = store.open("kic-1")
+        assert isinstance(stored["flux"], np.memmap) and stored["flux"].dtype == np.float32
+        assert np.allclose(stored["time"] + stored["time_offset"], time, atol=1e-5)
+        assert client.get("/api/curves/kic-1").json()["metadata"] == {"sector": 1}
+
+        data = encode_curve(time, sample["flux"], sample["flux_err"])
+        response = client.post("/api/curves?curve_id=kic-2", content=data,
+                               headers={"Content-Type": "application/x-exoquest-curve"})
+        assert response.status_code == 201 and response.json()["columns"] == ["time", "flux", "flux_err"]
+        bad = client.post("/api/curves?curve_id=kic-3", content=data[:100],
+                          headers={"Content-Type": "application/x-exoquest-curve"})
+        assert bad.status_code == 422
+        assert client.post("/api/curves", json={"curve_id": "../x", "time": [0.0], "flux": [1.0]}).status_code == 422
+
+        by_id = client.post("/api/predict/curve/batch", json={"curves": [
+            {"curve_id": "kic-1"}, {"curve": sample["flux"], "time": time.tolist()}
+        ]}).json()["predictions"]
+        assert by_id[0]["object_id"] == "kic-1"
+        assert by_id[0]["probs"]["POSITIVE"] == pytest.approx(by_id[1]["probs"]["POSITIVE"], abs=1e-4)
+        assert by_id[0]["detection"]["snr"] == pytest.approx(by_id[1]["detection"]["snr"], rel=1e-3)
+
+        row = {f: 0.5 for f in TabularRow.model_fields}
+        fused = client.post("/api/predict/fuse", json={"tabular_data": row, "curve_id": "kic-2"})
+        assert fused.status_code == 200 and len(fused.json()["predictions"][0]["importance"]) == len(time)
+
+        assert client.post("/api/predict/curve", json={"curve_id": "missing"}).status_code == 404
+        assert client.get("/api/curves/missing").status_code == 404
+        assert client.post("/api/predict/curve", json={"curve_id": "kic-1", "curve": [1.0]}).status_code == 422
+
+        # 存储曲线的时间为相对值，历元仍按绝对时间传入，折叠结果与内联曲线一致
+        epoch = sample["epoch"] + 2454833.0
+        folded = client.post("/api/predict/curve/batch", json={"curves": [
+            {"curve_id": "kic-1", "period": sample["period"], "epoch": epoch},
+            {"curve": sample["flux"], "time": time.tolist(), "period": sample["period"], "epoch": epoch}
+        ]}).json()["predictions"]
+        assert folded[0]["detection"]["folded"]
+        assert folded[0]["detection"]["snr"] == pytest.approx(folded[1]["detection"]["snr"], rel=1e-3)
+
+        # 超过上限的二进制上传返回413（声明长度和分块传输两种情况），不留下临时文件
+        with patch.object(settings, "max_curve_upload_bytes", 1024):
+            headers = {"Content-Type": "application/x-exoquest-curve"}
+            assert client.post("/api/curves?curve_id=kic-4", content=data, headers=headers).status_code == 413
+            chunked = client.post("/api/curves?curve_id=kic-4", headers=headers,
+                                  content=iter([data[i:i + 512] for i in range(0, len(data), 512)]))
+            assert chunked.status_code == 413
+        assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["kic-1.lcb", "kic-2.lcb"]
+
+
+def test_model_metrics_from_holdout_evaluation(tmp_path):
+    """测试模型评估：向量化的阈值扫描与 sklearn 一致，每个版本只评估一次，指标、阈值曲线和图表读取缓存"""
+    import numpy as np
+    from sklearn.metrics import average_precision_score, confusion_matrix, matthews_corrcoef
+    from main import model_adapter
+    from ml.evaluation import evaluate_scores
+    from ml.postprocess import POSITIVE_COLUMN
+    from ml.training import evaluate_binary
+    from services import evaluation_store
+    from services.evaluation_store import EvaluationStore
+    from services.prediction_cache import TwoTierCache
+
+    rng = np.random.default_rng(0)
+    y = rng.random(2000) < 0.3
+    scores = np.round(np.clip(0.3 * y + 0.7 * rng.random(2000), 0, 1), 2)  # 含大量相同分数
+    report = evaluate_scores(y, scores)
+    assert report["pr_auc"] == pytest.approx(average_precision_score(y, scores))
+    sweep = report["thresholds"]
+    for i in (0, 37, 50, 88, 100):
+        predicted = scores >= sweep["threshold"][i]
+        tn, fp, fn, tp = confusion_matrix(y, predicted, labels=[False, True]).ravel()
+        assert (sweep["tp"][i], sweep["fp"][i], sweep["tn"][i], sweep["fn"][i]) == (tp, fp, tn, fn)
+        assert sweep["mcc"][i] == pytest.approx(matthews_corrcoef(y, predicted))
+
+    # 训练时的测试集指标与留出评估使用同一个正类列（训练标签0 = 概率列0）
+    class FixedModel:
+        def predict_proba(self, X):
+            return np.column_stack([scores, 1 - scores])
+
+    labels = np.where(y, POSITIVE_COLUMN, 1 - POSITIVE_COLUMN)
+    assert evaluate_binary(FixedModel(), None, labels)["pr_auc"] == pytest.approx(report["pr_auc"])
+
+    store = EvaluationStore(str(tmp_path / "evaluations"))
+    evaluate = patch.object(model_adapter, "_evaluate_version", wraps=model_adapter._evaluate_version)
+    with patch.object(evaluation_store, "_store", store), \
+            patch.object(model_adapter, "evaluation_cache", TwoTierCache("exoquest:eval-test")), \
+            evaluate as evaluate_version:
+        response = client.get("/api/models/latest/metrics")
+        assert response.status_code == 200
+        metrics = response.json()
+        version = metrics["version"]
+        assert metrics["n_samples"] > 0 and 0 < metrics["pr_auc"] <= 1 and 0 <= metrics["ece"] <= 1
+        assert sum(metrics["confusion"].values()) == metrics["n_samples"]
+        assert metrics["plots"]["pr_png"] == f"/api/models/{version}/plots/pr_curve.png"
+
+        strict = client.get(f"/api/models/{version}/metrics", params={"threshold": 0.9}).json()
+        assert strict["threshold"] == pytest.approx(0.9)
+        assert strict["confusion"]["tp"] + strict["confusion"]["fp"] <= metrics["confusion"]["tp"] + metrics["confusion"]["fp"]
+
+        curve = client.get(f"/api/models/{version}/metrics/thresholds").json()
+        assert len(curve["points"]) == 101
+        assert curve["points"][50]["mcc"] == pytest.approx(metrics["mcc"])
+
+        plot = client.get(metrics["plots"]["calib_png"])
+        assert plot.status_code == 200
+        assert plot.content.startswith(b"\x89PNG")
+        assert client.get(f"/api/models/{version}/plots/missing.png").status_code == 404
+        assert evaluate_version.call_count == 1
+        assert (tmp_path / "evaluations" / version / "report.json").exists()
+
+    # 新进程（空的两级缓存）直接读取已保存的评估结果，不再重新评估
+    with patch.object(evaluation_store, "_store", EvaluationStore(str(tmp_path / "evaluations"))), \
+            patch.object(model_adapter, "evaluation_cache", TwoTierCache("exoquest:eval-test")), \
+            patch.object(model_adapter, "_evaluate_version") as evaluate_version:
+        assert client.get(f"/api/models/{version}/metrics").json()["pr_auc"] == metrics["pr_auc"]
+        evaluate_version.assert_not_called()